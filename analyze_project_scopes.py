@@ -1,47 +1,74 @@
-import pickle
 import os
-from collections import Counter
-import re
 from textwrap import fill
-from constants import LOOKUP
+from record_store import load_records, migrate_legacy
+from word_frequency import WordFrequency, count_parallel
+from scope_clusters import assign_clusters, cluster_representatives
+from profiling import enable_profiling, stage
 
 # --- Settings ---
-INPUT_FILE = 'project_scopes.pkl'
-MIN_WORD_LENGTH = 4  # Minimum length for words to count in frequency analysis
+INPUT_FILE = 'project_scopes.records'
 TOP_WORDS = 20  # Number of top frequent words to display
+TOP_COUNTY_WORDS = 5  # Number of top words shown per county
+NGRAM_SIZES = (1, 2)  # Word counts plus two-word phrases
+PARALLEL_THRESHOLD = 50000  # Use a process pool for frequency analysis above this many scopes
+COUNT_CLUSTERS_ONCE = False  # Set to True to count each near-duplicate scope cluster once in word frequencies
+TOP_CLUSTERS = 10  # Number of largest scope clusters to display
 
 
 def load_data():
-    """Load project scopes from pickle file"""
-    if not os.path.exists(INPUT_FILE):
+    """Load project scopes from the record file"""
+    if not os.path.exists(migrate_legacy(INPUT_FILE)):
         print(f"[ERROR] Input file {INPUT_FILE} not found. Please run fetch_project_details.py first.")
         return None
 
     try:
-        with open(INPUT_FILE, 'rb') as f:
-            data = pickle.load(f)
-        return data
+        with stage('load'):
+            return load_records(INPUT_FILE)
     except Exception as e:
         print(f"[ERROR] Failed to load data: {e}")
         return None
 
 
-def analyze_word_frequency(scopes):
-    """Analyze word frequency in all scopes"""
-    all_text = ' '.join([s.lower() for s in scopes])
+def analyze_word_frequency(scopes, ngram_sizes=NGRAM_SIZES, parallel=False):
+    """Analyze word frequency in all scopes.
 
-    # Remove common punctuation
-    all_text = re.sub(r'[.,;:!?\-\'\"()/]', ' ', all_text)
+    `scopes` is any iterable (e.g. a generator over iter_records) of plain scope strings or
+    (scope, county, month) tuples; it is consumed one record at a time, never held as a list.
+    With `parallel`, shards are counted in a process pool. Returns the populated WordFrequency.
+    """
+    items = ((s, None, None) if isinstance(s, str) else s for s in scopes)
+    if parallel:
+        return count_parallel(items, ngram_sizes, by_county=True, by_month=True)
 
-    # Split into words and count
-    words = all_text.split()
+    freq = WordFrequency(ngram_sizes, by_county=True, by_month=True)
+    for text, county, month in items:
+        freq.add(text, county, month)
+    return freq
 
-    # Filter out short words and common stopwords
-    stopwords = {'and', 'the', 'to', 'of', 'in', 'for', 'with', 'on', 'at', 'from', 'by',
-                 'this', 'that', 'will', 'new', 'existing', 'area', 'building', 'include', 'includes'}
-    filtered_words = [w for w in words if len(w) >= MIN_WORD_LENGTH and w not in stopwords]
 
-    return Counter(filtered_words).most_common(TOP_WORDS)
+def iter_frequency_items(records, representatives=None):
+    """Stream (scope, county, month) from records; only `representatives` (project numbers) if given"""
+    for record in records:
+        if not record.scope_of_work:
+            continue
+        if representatives is not None and record.project_number not in representatives:
+            continue
+        yield record.scope_of_work, record.county_name, record.month
+
+
+def print_county_words(freq, top=TOP_COUNTY_WORDS):
+    """Top words per county, busiest county first"""
+    counties = sorted(freq.county_counts, key=lambda county: sum(freq.county_counts[county][1].values()),
+                      reverse=True)
+    if not counties:
+        return
+    print("\n=== Top Words by County ===")
+    print(f"{'County':<20} {'Words':>8}  Top words")
+    print(f"{'-' * 19:<20} {'-' * 8:>8}  {'-' * 40}")
+    for county in counties:
+        total = sum(freq.county_counts[county][1].values())
+        words = ', '.join(f"{word} ({count})" for word, count in freq.most_common_by_county(county, top))
+        print(f"{county[:19]:<20} {total:>8}  {words}")
 
 
 def print_scopes(data):
@@ -49,62 +76,67 @@ def print_scopes(data):
     if not data:
         return
 
-    # Get scopes, project numbers, project names, facility names, date, city, and county
-    scopes = []
-    for item in data:
-        if item.get('success') and item.get('scope_of_work'):
-            project_name = item.get('ProjectName', '')
-            facility_name = item.get('FacilityName', '')
-            project_date = item.get('ProjectCreatedOn', '')
-            city = item.get('City', '')
-            county = item.get('County', '')
-            scopes.append((
-                item['project_number'], project_name, facility_name, project_date, city, county, item['scope_of_work']
-            ))
-
-    # Sort scopes by ProjectCreatedOn (ascending)
-    scopes.sort(key=lambda x: x[3] if x[3] is not None else "")
+    # Keep projects that have a scope, sorted by ProjectCreatedOn (ascending)
+    scopes = [record for record in data if record.scope_of_work]
+    scopes.sort(key=lambda record: record.date_str if record.created_on else "")
 
     # Print basic stats
     print(f"\n=== Project Scope Analysis ===")
     print(f"Total projects with scopes: {len(scopes)}")
 
     # Print scope statistics
-    scope_lengths = [len(s[6]) for s in scopes]
+    scope_lengths = [len(record.scope_of_work) for record in scopes]
     avg_length = sum(scope_lengths) / len(scope_lengths) if scope_lengths else 0
     print(f"Average scope length: {avg_length:.1f} characters")
     print(f"Shortest scope: {min(scope_lengths)} characters")
     print(f"Longest scope: {max(scope_lengths)} characters")
 
-    # Extract just the text for frequency analysis
-    scope_texts = [s[6] for s in scopes]
-    top_words = analyze_word_frequency(scope_texts)
+    # Group near-identical template scopes; older files have no cluster IDs yet, or dense numeric ones
+    if any(record.has_scope and not isinstance(record.cluster_id, str) for record in scopes):
+        with stage('cluster'):
+            assign_clusters(scopes)
+    clusters = cluster_representatives(scopes)
+
+    print(f"\n=== Largest Scope Clusters ({len(clusters)} clusters) ===")
+    for representative, size in sorted(clusters.values(), key=lambda x: x[1], reverse=True)[:TOP_CLUSTERS]:
+        print(f"{size:>6}  {representative.scope_of_work[:100]}")
+
+    # Frequencies come from the same records as every other statistic; counts are kept per county too
+    representatives = {record.project_number for record, _ in clusters.values()} if COUNT_CLUSTERS_ONCE else None
+    with stage('frequency'):
+        freq = analyze_word_frequency(iter_frequency_items(scopes, representatives),
+                                      parallel=len(scopes) >= PARALLEL_THRESHOLD)
 
-    # Print top words
+    # Print top words and phrases
     print("\n=== Top Words in Scope Descriptions ===")
-    for word, count in top_words:
+    for word, count in freq.most_common(TOP_WORDS):
         print(f"{word}: {count}")
 
+    if 2 in freq.ngram_sizes:
+        print("\n=== Top Phrases in Scope Descriptions ===")
+        for phrase, count in freq.most_common(TOP_WORDS, n=2):
+            print(f"{phrase}: {count}")
+
+    print_county_words(freq)
+
     # Print all scopes with project/facility names, date, city, county
     print("\n=== All Project Scopes ===")
     print(f"{'Project Number':<20} {'Project Name':<30} {'Facility Name':<30} {'Date':<12} {'City':<20} {'County':<20} {'Scope of Work':<60}")
     print(f"{'-'*19:<20} {'-'*29:<30} {'-'*29:<30} {'-'*11:<12} {'-'*19:<20} {'-'*19:<20} {'-'*59:<60}")
 
-    for project_number, project_name, facility_name, project_date, city, county, scope in scopes:
-        # Convert city and county to string before slicing
-        city_str = str(city) if city is not None else ""
-        county_str = str(county) if county is not None else ""
-
-
-        city_str = LOOKUP["CITIES"][city_str]
-        county_str = LOOKUP["COUNTIES"][county_str]
+    for record in scopes:
+        project_name = record.project_name or ''
+        facility_name = record.facility_name or ''
+        project_date = record.date_str if record.created_on else ''
+        city_str = record.city_name
+        county_str = record.county_name
 
         # Wrap text to make it more readable
-        wrapped_scope = fill(scope, width=60)
+        wrapped_scope = fill(record.scope_of_work, width=60)
         lines = wrapped_scope.split('\n')
 
         # Print first line with all columns
-        print(f"{project_number:<20} {project_name[:29]:<30} {facility_name[:29]:<30} {project_date[:11]:<12} {city_str[:19]:<20} {county_str[:19]:<20} {lines[0]:<60}")
+        print(f"{record.project_number:<20} {project_name[:29]:<30} {facility_name[:29]:<30} {project_date[:11]:<12} {city_str[:19]:<20} {county_str[:19]:<20} {lines[0]:<60}")
 
         # Print remaining scope lines indented under "Scope of Work"
         for line in lines[1:]:
@@ -117,10 +149,12 @@ def main():
     """Main function to analyze project scopes"""
     data = load_data()
     if data:
-        print_scopes(data)
+        with stage('output'):
+            print_scopes(data)
     else:
         print("[ERROR] No data to analyze.")
 
 
 if __name__ == "__main__":
+    enable_profiling('analyze_project_scopes')
     main()
\ No newline at end of file
@@ -1,23 +1,18 @@
-import pickle
-from datetime import datetime
+from record_store import iter_records, migrate_legacy
+from profiling import enable_profiling, stage
 
 # File to load
-PICKLE_FILE = 'tabs_projects_9001.pkl'
+INPUT_FILE = 'tabs_projects_9001.records'
 
-# Load the data
-with open(PICKLE_FILE, 'rb') as f:
-    projects = pickle.load(f)
+enable_profiling('analyze_tabs_projects')
 
-# Extract (name, date) tuples
+# Stream the records chunk by chunk (older pickles of raw listing rows are converted too)
+# and keep only (name, date) tuples
 name_date_pairs = []
-for project in projects:
-    name = project.get('ProjectName', 'Unnamed')
-    date_raw = project.get('ProjectCreatedOn', '')
-    try:
-        date = datetime.fromisoformat(date_raw).date()
-    except Exception:
-        date = "Unknown"
-    name_date_pairs.append((name, date))
+with stage('load'):
+    for project in iter_records(migrate_legacy(INPUT_FILE)):
+        name = project.project_name or 'Unnamed'
+        name_date_pairs.append((name, project.created_on if project.created_on else "Unknown"))
 
 # Sort alphabetically by name
 name_date_pairs.sort(key=lambda x: x[0].lower())
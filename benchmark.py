@@ -0,0 +1,354 @@
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from constants import LOOKUP
+from project_record import records_from_listing_page
+
+# --- Settings ---
+DATASET_SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+DEFAULT_SIZES = ['10k']
+BENCH_FOLDER = os.path.join('output_data', 'benchmarks')
+SAMPLE_FOLDER = os.path.join(BENCH_FOLDER, 'samples')  # Saved detail-page HTML, reused by every run
+BASELINE_FILE = os.getenv('TX_PERMIT_BENCH_BASELINE', os.path.join(BENCH_FOLDER, 'baseline.json'))
+REGRESSION_THRESHOLD = float(os.getenv('TX_PERMIT_BENCH_THRESHOLD', '0.15'))  # Allowed ops/sec drop vs. baseline
+MEMORY_THRESHOLD = 0.25  # Allowed peak-memory growth vs. baseline
+REPEAT = 5  # Timed samples per benchmark; the fastest counts
+MIN_SAMPLE_SECONDS = 0.2  # Shortest timed sample; quicker benchmarks are looped
+HTML_SAMPLES = 20  # Detail pages kept in SAMPLE_FOLDER
+HTML_PAGES_MAX = 2000  # Pages parsed per run at any dataset size (parsing is ~1000x slower than the rest)
+FORMAT_ROWS_MAX = 100_000  # Rows formatted per run at any dataset size
+SEARCH_TERMS = ['charging', 'restroom', 'parking']
+SEED = 7
+
+_STATUSES = ['Project Registered', 'Review Complete', 'Inspection Complete', 'Project Closed', 'Pending Review']
+_TYPES = ['Additions/Alterations', 'New Construction', 'Tenant Finish-Out', 'Parking Lot', 'Site Work']
+_WORDS = ('renovation of existing restroom accessible route parking spaces ev charging station tenant '
+          'finish out new retail building sidewalk curb ramp entrance door hardware drinking fountain').split()
+
+
+# --- Synthetic data ---
+def synthetic_rows(count, seed=SEED):
+    """Listing rows shaped like SearchProjects results"""
+    rng = random.Random(seed)
+    city_ids = list(LOOKUP['CITIES'])
+    county_ids = list(LOOKUP['COUNTIES'])
+    start_ms = int(datetime(2023, 1, 1).timestamp() * 1000)
+    for i in range(count):
+        yield {
+            'ProjectId': 100000 + i,
+            'ProjectNumber': f"TABS{2023000000 + i}",
+            'ProjectName': ' '.join(rng.choices(_WORDS, k=4)).title(),
+            'ProjectCreatedOn': f"/Date({start_ms + rng.randrange(3 * 365 * 86400) * 1000})/",
+            'ProjectStatus': rng.choice(_STATUSES),
+            'FacilityName': f"{rng.choice(_WORDS).title()} Center {i % 997}",
+            'City': rng.choice(city_ids),
+            'County': rng.choice(county_ids),
+            'TypeOfWork': rng.choice(_TYPES),
+            'EstimatedCost': f"${rng.randrange(10, 5000) * 1000:,}.00",
+            'DataVersionId': 1,
+        }
+
+
+def synthetic_records(count, seed=SEED, page_size=1000):
+    rows = list(synthetic_rows(count, seed))
+    records = []
+    for start in range(0, count, page_size):
+        records.extend(records_from_listing_page(rows[start:start + page_size]))
+    rng = random.Random(seed)
+    for record in records:
+        record.scope_of_work = ' '.join(rng.choices(_WORDS, k=rng.randrange(8, 40)))
+    return rows, records
+
+
+def _synthetic_page(rng, number):
+    fields = [
+        ('Project Number', f"TABS{2023000000 + number}"),
+        ('Project Name', ' '.join(rng.choices(_WORDS, k=4)).title()),
+        ('Project Status', rng.choice(_STATUSES)),
+        ('Facility Name', f"{rng.choice(_WORDS).title()} Center"),
+        ('Location Address', f"{rng.randrange(100, 9999)} Main St, Austin, TX 78701"),
+        ('Type of Work', rng.choice(_TYPES)),
+        ('Estimated Cost', f"${rng.randrange(10, 5000) * 1000:,}.00"),
+        ('Square Footage', f"{rng.randrange(500, 90000):,}"),
+        ('Estimated Start Date', f"{rng.randrange(1, 13)}/{rng.randrange(1, 28)}/2025"),
+        ('Estimated Completion Date', f"{rng.randrange(1, 13)}/{rng.randrange(1, 28)}/2026"),
+        ('Owner Name', 'Example Holdings LLC'),
+        ('Design Firm', 'Example Architects'),
+        ('Scope of Work', '\n'.join(' '.join(rng.choices(_WORDS, k=12)) for _ in range(rng.randrange(1, 6)))),
+    ]
+    items = ''.join(f"<dt>{label}:</dt>\n<dd>{value}</dd>\n" for label, value in fields)
+    rows = ''.join(f"<tr><td>{rng.randrange(1, 13)}/{rng.randrange(1, 28)}/2025</td><td>{rng.choice(_STATUSES)}</td>"
+                   f"<td>RAS {rng.randrange(100, 999)}</td></tr>\n" for _ in range(rng.randrange(0, 6)))
+    navigation = ''.join(f'<li><a href="/TABS/Search/{word}">{word.title()}</a></li>' for word in _WORDS)
+    return (f"<!DOCTYPE html>\n<html><head><title>Project Details</title></head><body>\n"
+            f"<nav><ul>{navigation}</ul></nav>\n<div class=\"container\"><h2>Project Details</h2>\n"
+            f"<dl class=\"dl-horizontal\">\n{items}</dl>\n<h3>Inspections</h3>\n"
+            f"<table class=\"table\"><tr><th>Date</th><th>Status</th><th>Inspector</th></tr>\n{rows}</table>\n"
+            f"</div><footer>Texas Department of Licensing and Regulation</footer></body></html>\n")
+
+
+def html_samples(folder=SAMPLE_FOLDER, count=HTML_SAMPLES):
+    """Saved detail pages; created on first use from the page archive if it has pages, else synthesized"""
+    paths = sorted(os.path.join(folder, name) for name in os.listdir(folder)) if os.path.isdir(folder) else []
+    if not paths:
+        os.makedirs(folder, exist_ok=True)
+        pages = []
+        try:
+            from page_archive import PAGE_ARCHIVE_DB, PageArchive
+            if os.path.exists(PAGE_ARCHIVE_DB):
+                archive = PageArchive()
+                numbers = [number for number, in archive.conn.execute(
+                    'SELECT project_number FROM pages ORDER BY RANDOM() LIMIT ?', (count,))]
+                pages = [archive.page(number) for number in numbers]
+                archive.close()
+        except Exception as e:
+            print(f"[WARNING] Could not sample the page archive ({e}); using synthetic pages")
+        if not pages:
+            rng = random.Random(SEED)
+            pages = [_synthetic_page(rng, i) for i in range(count)]
+        for i, page in enumerate(pages):
+            path = os.path.join(folder, f"detail_{i:02d}.html")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(page)
+            paths.append(path)
+        print(f"[INFO] Saved {len(paths)} HTML samples to {folder}")
+    pages = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            pages.append(f.read())
+    return pages
+
+
+# --- Benchmarks ---
+# Each benchmark takes the dataset and returns (operation count, callable). The callable is run
+# REPEAT times; setup that should not be timed happens before it is returned.
+def bench_parse_dates(data):
+    import tdlr_dates
+    values = [row['ProjectCreatedOn'] for row in data['rows']]
+
+    def run():
+        tdlr_dates._date_cache.clear()  # Measure decoding, not the memo hits
+        for value in values:
+            tdlr_dates.parse_tdlr_date_str(value)
+    return len(values), run
+
+
+def bench_build_form_data(data):
+    from by_date import PAGE_SIZE, build_form_data
+    count = len(data['records'])
+
+    def run():
+        for i in range(count):
+            build_form_data(i * PAGE_SIZE)
+    return count, run
+
+
+def bench_county_name(data):
+    from by_date import get_county_name_from_id
+    ids = [record.county_id for record in data['records']]
+
+    def run():
+        for county_id in ids:
+            get_county_name_from_id(county_id)
+    return len(ids), run
+
+
+def bench_scope_extraction(data):
+    from detail_extractor import extract_details
+    pages = data['html']
+    count = min(len(data['records']), HTML_PAGES_MAX)
+
+    def run():
+        for i in range(count):
+            extract_details(pages[i % len(pages)])
+    return count, run
+
+
+def bench_matches_terms(data):
+    from print_out import matches_terms
+    records = data['records']
+
+    def run():
+        for record in records:
+            matches_terms(record, SEARCH_TERMS)
+    return len(records), run
+
+
+def bench_print_statistics(data):
+    from print_out import print_statistics
+    records = data['records']
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            print_statistics(records)
+    return len(records), run
+
+
+def bench_format_output(data):
+    from print_out import format_output
+    records = data['records'][:FORMAT_ROWS_MAX]
+
+    def run():
+        format_output(records, 'jsonl')
+        format_output(records, 'simple')
+    return len(records) * 2, run
+
+
+BENCHMARKS = {
+    'parse_tdlr_date_str': bench_parse_dates,
+    'build_form_data': bench_build_form_data,
+    'get_county_name_from_id': bench_county_name,
+    'scope_extraction': bench_scope_extraction,
+    'matches_terms': bench_matches_terms,
+    'print_statistics': bench_print_statistics,
+    'format_output': bench_format_output,
+}
+
+
+def measure(factory, data, repeat=REPEAT):
+    """ops/sec (best of `repeat`), plus peak traced memory and net allocated blocks of one extra run"""
+    count, run = factory(data)
+    # Like timeit: short runs are looped until a sample lasts MIN_SAMPLE_SECONDS, to keep timer noise out
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            run()
+        if time.perf_counter() - start >= MIN_SAMPLE_SECONDS:
+            break
+        loops *= 2
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()  # As timeit does: collector pauses depend on heap history, not on the code measured
+        try:
+            start = time.perf_counter()
+            for _ in range(loops):
+                run()
+            elapsed = (time.perf_counter() - start) / loops
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+
+    # Allocations are measured separately: tracing slows the code down several times
+    gc.collect()
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sys.getallocatedblocks() - blocks_before
+    return {
+        'ops': count,
+        'seconds': best,
+        'ops_per_sec': count / best if best else 0.0,
+        'peak_kb': peak / 1024,
+        'bytes_per_op': peak / count if count else 0.0,
+        'net_blocks': blocks,
+    }
+
+
+def run_suite(size_name, names=None):
+    count = DATASET_SIZES[size_name]
+    print(f"[INFO] Building the {size_name} dataset ({count} records)...")
+    rows, records = synthetic_records(count)
+    data = {'rows': rows, 'records': records, 'html': html_samples()}
+    results = {}
+    for name, factory in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        try:
+            results[name] = measure(factory, data)
+        except ImportError as e:
+            print(f"[WARNING] Skipping {name}: {e}")
+            continue
+        result = results[name]
+        print(f"  {name:26} {result['ops_per_sec']:14,.0f} ops/s  {result['seconds'] * 1000:9.1f} ms "
+              f"for {result['ops']:>9,}  peak {result['peak_kb']:10,.0f} KB  {result['bytes_per_op']:8.1f} B/op")
+    return results
+
+
+# --- Baselines ---
+def load_baseline(path=BASELINE_FILE):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_baseline(results_by_size, path=BASELINE_FILE):
+    baseline = load_baseline(path) or {}
+    baseline.setdefault('sizes', {}).update(results_by_size)
+    baseline['python'] = platform.python_version()
+    baseline['machine'] = platform.node()
+    baseline['saved'] = datetime.now().isoformat(timespec='seconds')
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=2)
+    print(f"[SUCCESS] Baseline saved to {path}")
+
+
+def compare(results_by_size, baseline):
+    """Regression messages for every benchmark slower (or hungrier) than the baseline allows"""
+    regressions = []
+    for size_name, results in results_by_size.items():
+        expected = baseline.get('sizes', {}).get(size_name, {})
+        for name, result in results.items():
+            before = expected.get(name)
+            if not before:
+                continue
+            speed = result['ops_per_sec'] / before['ops_per_sec'] if before['ops_per_sec'] else 1.0
+            print(f"  {size_name:5} {name:26} {speed:6.2f}x baseline throughput")
+            if speed < 1 - REGRESSION_THRESHOLD:
+                regressions.append(f"{size_name} {name}: {result['ops_per_sec']:,.0f} ops/s vs "
+                                   f"{before['ops_per_sec']:,.0f} baseline ({(1 - speed) * 100:.0f}% slower)")
+            if before.get('peak_kb') and result['peak_kb'] > before['peak_kb'] * (1 + MEMORY_THRESHOLD) \
+                    and result['peak_kb'] - before['peak_kb'] > 64:
+                regressions.append(f"{size_name} {name}: peak {result['peak_kb']:,.0f} KB vs "
+                                   f"{before['peak_kb']:,.0f} KB baseline")
+    return regressions
+
+
+def main(argv):
+    save = '--save' in argv
+    names = {arg.split('=', 1)[1] for arg in argv if arg.startswith('--only=')}
+    sizes = [arg for arg in argv if not arg.startswith('--')] or DEFAULT_SIZES
+    unknown = [size for size in sizes if size not in DATASET_SIZES]
+    if unknown:
+        print(f"[ERROR] Unknown dataset size {unknown}; expected {', '.join(DATASET_SIZES)}")
+        return 2
+
+    results_by_size = {size: run_suite(size, names) for size in sizes}
+    if save:
+        save_baseline(results_by_size)
+        return 0
+
+    baseline = load_baseline()
+    if baseline is None:
+        print(f"[INFO] No baseline at {BASELINE_FILE}; run with --save to create one")
+        return 0
+    print(f"\n[INFO] Compared with the baseline from {baseline.get('saved')} (Python {baseline.get('python')})")
+    regressions = compare(results_by_size, baseline)
+    if regressions:
+        print(f"[ERROR] {len(regressions)} regression(s) beyond the threshold:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    print("[SUCCESS] No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    # Usage: python benchmark.py [10k] [100k] [1m] [--only=<benchmark>] [--save]
+    # Exits with 1 when a benchmark is more than TX_PERMIT_BENCH_THRESHOLD slower than the baseline.
+    sys.exit(main(sys.argv[1:]))
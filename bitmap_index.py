@@ -0,0 +1,147 @@
+from array import array
+from collections import defaultdict
+
+try:
+    from pyroaring import BitMap
+except ImportError:  # pyroaring is optional; Python ints serve as bitsets
+    BitMap = None
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; set bits are then found byte by byte
+    np = None
+
+# --- Settings ---
+SPARSE_DENSITY = 1 / 32  # Values on fewer rows than this share are kept as position arrays, not bitsets
+
+INDEXED_FIELDS = {
+    'county': lambda record: record.county_name,
+    'city': lambda record: record.city_name,
+    'type_of_work': lambda record: record.type_of_work or '',
+    'status': lambda record: record.project_status or '',
+}
+
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+
+def _normalize(value):
+    return str(value).strip().lower()
+
+
+def bitmap_from_positions(positions):
+    """Python-int bitset with the given row IDs set"""
+    positions = list(positions)
+    if not positions:
+        return 0
+    bits = bytearray(max(positions) // 8 + 1)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def iter_positions(bitmap):
+    """Row IDs set in a bitmap (Python int or pyroaring BitMap), ascending"""
+    if not isinstance(bitmap, int):
+        yield from bitmap
+        return
+    if not bitmap:
+        return
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+    if np is not None:
+        bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), bitorder='little')
+        yield from bits.nonzero()[0].tolist()
+        return
+    for byte_index, value in enumerate(data):
+        if value:
+            base = byte_index << 3
+            for bit in _BYTE_BITS[value]:
+                yield base + bit
+
+
+def bitmap_count(bitmap):
+    return bitmap.bit_count() if isinstance(bitmap, int) else len(bitmap)
+
+
+class BitmapIndex:
+    """Bitmap indexes over the low-cardinality record fields (county, city, type of work, status).
+
+    Row IDs are positions in the list the index was built from. Each field value maps to a
+    bitmap of the rows holding it: a pyroaring BitMap when pyroaring is installed, otherwise a
+    Python int used as a bitset (rare values stay as compact position arrays until queried).
+    Filters combine with OR within a field, AND across fields and NOT for exclusions.
+    """
+
+    def __init__(self, records, fields=INDEXED_FIELDS):
+        self.fields = fields
+        positions = {field: defaultdict(lambda: array('I')) for field in fields}
+        size = 0
+        for row_id, record in enumerate(records):
+            for field, key_of in fields.items():
+                positions[field][_normalize(key_of(record))].append(row_id)
+            size = row_id + 1
+        self.size = size
+        self._all_rows = (1 << size) - 1 if BitMap is None else None
+
+        sparse_limit = size * SPARSE_DENSITY
+        self.bitmaps = {}
+        for field, by_value in positions.items():
+            bitmaps = {}
+            for value, rows in by_value.items():
+                if BitMap is not None:
+                    bitmaps[value] = BitMap(rows)
+                elif len(rows) >= sparse_limit:
+                    bitmaps[value] = bitmap_from_positions(rows)
+                else:
+                    bitmaps[value] = rows
+            self.bitmaps[field] = bitmaps
+
+    def all_rows(self):
+        if BitMap is not None:
+            return BitMap(range(self.size))
+        return self._all_rows
+
+    def empty(self):
+        return BitMap() if BitMap is not None else 0
+
+    def range_bitmap(self, start, stop):
+        """Rows start..stop-1 (for indexes built over date-sorted records)"""
+        if BitMap is not None:
+            return BitMap(range(start, stop))
+        return ((1 << stop) - 1) ^ ((1 << start) - 1) if stop > start else 0
+
+    def bitmap(self, field, value):
+        """Rows where `field` equals `value` (case-insensitive)"""
+        bitmap = self.bitmaps[field].get(_normalize(value))
+        if bitmap is None:
+            return self.empty()
+        if isinstance(bitmap, array):
+            # Rare value: materialize the bitset on demand and keep it
+            bitmap = self.bitmaps[field][_normalize(value)] = bitmap_from_positions(bitmap)
+        return bitmap
+
+    def any_of(self, field, values):
+        result = self.empty()
+        for value in values:
+            result = result | self.bitmap(field, value)
+        return result
+
+    def query(self, include=None, exclude=None, base=None):
+        """Rows matching every `include` field (any of its values) and no `exclude` value.
+
+        `include` and `exclude` map field names to lists of values; `base` limits the result to
+        an existing bitmap. Returns a bitmap (use iter_positions() for the row IDs).
+        """
+        result = self.all_rows() if base is None else base
+        for field, values in (include or {}).items():
+            if values:
+                result = result & self.any_of(field, values)
+        for field, values in (exclude or {}).items():
+            if values:
+                excluded = self.any_of(field, values)
+                result = result - excluded if BitMap is not None else result & ~excluded
+        return result
+
+    def values(self, field):
+        """Indexed values of a field with their row counts"""
+        return {value: bitmap_count(bitmap) if not isinstance(bitmap, array) else len(bitmap)
+                for value, bitmap in self.bitmaps[field].items()}
@@ -1,13 +1,28 @@
+import copy
 import os
-import re
 import requests
 from http.cookiejar import MozillaCookieJar
 from datetime import datetime, date
 from constants import LOOKUP  # Import the LOOKUP dictionary
+from project_record import coerce_records, records_from_listing_page
+from record_store import RecordStore, append_records, load_records, migrate_legacy, write_records
+from rollups import ingest_records
+from refresh_planner import observe_records
+from snapshot_diff import change_log_path, diff_snapshot, filter_delta
+from llm_corpus import build_corpus
+from scope_clusters import assign_clusters
+from fetch_scheduler import FetchScheduler
+from detail_extractor import extract_details
+from page_archive import archive_page
+from http_fixtures import install_fixtures
+from listing_cache import install_listing_cache
+from single_flight import DETAIL_FLIGHTS
+import metrics
+from profiling import enable_profiling, stage
 import pickle
-from bs4 import BeautifulSoup
 from tabulate import tabulate
 import json
+import time
 
 # --- Settings ---
 CUTOFF_DATE_STR = '2025-11-25'
@@ -15,8 +30,9 @@ COOKIE_FILE = 'cookies.txt'
 SEARCH_URL = 'https://www.tdlr.texas.gov/TABS/Search/SearchProjects'
 PAGE_SIZE = 100
 TYPE_OF_WORK = ''
-OUTPUT_DATA_FOLDER = 'output_data'  # Folder to store pickle files
+OUTPUT_DATA_FOLDER = 'output_data'  # Folder to store record files and checkpoints
 CHECKPOINT_INTERVAL = 100  # Save progress every 100 records
+LLM_DELTA_ONLY = True  # Only send projects added/changed since the previous snapshot to the LLM file (all of them if there is none)
 
 
 # --- Global headers for requests ---
@@ -25,17 +41,27 @@ REQUEST_HEADERS = {
 }
 
 
+def snapshot_window():
+    """Listing parameters a snapshot must share with an earlier one to be diffed against it"""
+    return {'cutoff': CUTOFF_DATE_STR, 'type_of_work': TYPE_OF_WORK}
+
+
 def get_checkpoint_files(base_name):
     """Generate checkpoint file names"""
     return {
         'progress': f"{base_name}_progress.json",
-        'processed_data': f"{base_name}_processed.pkl",
+        'processed_data': f"{base_name}_processed.records",
         'remaining_ids': f"{base_name}_remaining_ids.pkl"
     }
 
 
 def save_checkpoint(checkpoint_files, processed_data, remaining_project_ids, current_index, total_count):
     """Save current progress to checkpoint files"""
+    with stage('checkpoint'), metrics.CHECKPOINT_SECONDS.time():
+        return _save_checkpoint(checkpoint_files, processed_data, remaining_project_ids, current_index, total_count)
+
+
+def _save_checkpoint(checkpoint_files, processed_data, remaining_project_ids, current_index, total_count):
     try:
         # Save progress metadata
         progress_data = {
@@ -49,9 +75,13 @@ def save_checkpoint(checkpoint_files, processed_data, remaining_project_ids, cur
         with open(checkpoint_files['progress'], 'w') as f:
             json.dump(progress_data, f, indent=2)
 
-        # Save processed data
-        with open(checkpoint_files['processed_data'], 'wb') as f:
-            pickle.dump(processed_data, f)
+        # Append records processed since the last checkpoint (earlier chunks are not rewritten)
+        saved_count = len(RecordStore(checkpoint_files['processed_data'])) \
+            if os.path.exists(checkpoint_files['processed_data']) else 0
+        if saved_count > len(processed_data):
+            write_records(checkpoint_files['processed_data'], processed_data)
+        else:
+            append_records(checkpoint_files['processed_data'], processed_data[saved_count:])
 
         # Save remaining project IDs
         with open(checkpoint_files['remaining_ids'], 'wb') as f:
@@ -73,11 +103,11 @@ def load_checkpoint(checkpoint_files):
         with open(checkpoint_files['progress'], 'r') as f:
             progress_data = json.load(f)
 
-        with open(checkpoint_files['processed_data'], 'rb') as f:
-            processed_data = pickle.load(f)
+        # Older checkpoints hold plain dicts; normalize them to ProjectRecords
+        processed_data = load_records(migrate_legacy(checkpoint_files['processed_data']))
 
         with open(checkpoint_files['remaining_ids'], 'rb') as f:
-            remaining_project_ids = pickle.load(f)
+            remaining_project_ids = list(coerce_records(pickle.load(f)))
 
         current_index = progress_data['current_index']
         total_count = progress_data['total_count']
@@ -102,25 +132,6 @@ def cleanup_checkpoint_files(checkpoint_files):
         print(f"[WARNING] Failed to cleanup some checkpoint files: {e}")
 
 
-# --- Date Parsing Function ---
-def parse_tdlr_date_str(date_str_from_json):
-    if not date_str_from_json:
-        return None
-    match = re.search(r'/Date\((\d+)(?:[-+]\d{4})?\)/', date_str_from_json)
-    if match:
-        timestamp_ms = int(match.group(1))
-        try:
-            return datetime.fromtimestamp(timestamp_ms / 1000).date()
-        except ValueError:
-            print(f"[WARNING] Could not convert timestamp: {timestamp_ms}")
-            return None
-    try:
-        return datetime.strptime(date_str_from_json.split('T')[0], '%Y-%m-%d').date()
-    except ValueError:
-        print(f"[WARNING] Could not parse date string: {date_str_from_json} with common formats.")
-        return None
-
-
 # --- Function to build form data ---
 def build_form_data(start):
     return {
@@ -158,27 +169,50 @@ def build_form_data(start):
 
 
 # --- Function to fetch Scope of Work ---
-def fetch_scope_of_work(http_session, project_number):
+def fetch_scope_of_work(http_session, project_number, record=None):
+    """Fetch a project's detail page and return its scope of work.
+
+    Every other field on the page is extracted in the same pass and stored on `record.details`
+    when a record is given. Concurrent calls for the same project in this process share one
+    request (see single_flight.py); on failure the error marker is returned instead.
+    """
     if not project_number:
         return "N/A"
+    details, error = DETAIL_FLIGHTS.do(project_number, _fetch_details, http_session, project_number)
+    if error is not None:
+        return error
+    if record is not None:
+        # Coalesced callers receive the same dict; each record gets its own copy
+        record.details = copy.deepcopy(details)
+    return details.get('scope_of_work') or "Not found"
+
+
+def _fetch_details(http_session, project_number):
+    """(details dict, None) on success, (None, error marker) otherwise"""
     url = f"https://www.tdlr.texas.gov/TABS/Search/Project/{project_number}"
     try:
-        response = http_session.get(url, headers=REQUEST_HEADERS, timeout=30)
+        with stage('fetch'), metrics.HTTP_IN_FLIGHT.track_inprogress(endpoint='detail'), \
+                metrics.HTTP_LATENCY.time(endpoint='detail'):
+            response = http_session.get(url, headers=REQUEST_HEADERS, timeout=30)
+        metrics.record_response('detail', response.status_code, len(response.content))
         response.raise_for_status()
         html_content = response.text
-        soup = BeautifulSoup(html_content, 'lxml')
-        scope_dt = soup.find('dt', string=re.compile(r'Scope of Work:', re.IGNORECASE))
-        if scope_dt:
-            scope_dd = scope_dt.find_next('dd')
-            if scope_dd:
-                return scope_dd.text.strip()
-        return "Not found"
+        details = None
+        try:
+            with stage('parse'), metrics.PARSE_SECONDS.time(stage='detail'):
+                details = extract_details(html_content)
+        finally:
+            # Keep the raw page even if parsing failed, so a fixed parser can be replayed offline
+            archive_page(project_number, html_content, details)
+        return details, None
     except requests.exceptions.RequestException as e:
+        if getattr(e, 'response', None) is None:
+            metrics.record_response('detail', 'error', 0)
         print(f"[WARNING] Could not fetch scope for project {project_number}: {e}")
-        return "Error fetching"
+        return None, "Error fetching"
     except Exception as e:
         print(f"[WARNING] Error parsing scope for project {project_number}: {e}")
-        return "Error parsing"
+        return None, "Error parsing"
 
 
 
@@ -200,9 +234,11 @@ def main():
     # --- Ensure output directory exists ---
     os.makedirs(OUTPUT_DATA_FOLDER, exist_ok=True)
     print(f"[INFO] Output data will be stored in '{OUTPUT_DATA_FOLDER}/' directory.")
+    metrics.start_metrics()
 
     # --- Initialize session ---
-    session = requests.Session()
+    # Listing pages fetched by another report in the last few minutes are reused (see listing_cache.py)
+    session = install_listing_cache(install_fixtures(requests.Session()), SEARCH_URL)
     session.cookies = MozillaCookieJar(COOKIE_FILE)
     if os.path.exists(COOKIE_FILE):
         try:
@@ -218,7 +254,7 @@ def main():
     cutoff_date_filename_part = CUTOFF_DATE_STR.replace('-', '_')
 
     base_filename = f'project_report_data_{today_str}_cutoff_{cutoff_date_filename_part}'
-    pickle_filename = os.path.join(OUTPUT_DATA_FOLDER, f'{base_filename}.pkl')
+    pickle_filename = migrate_legacy(os.path.join(OUTPUT_DATA_FOLDER, f'{base_filename}.records'))
     combined_string_filename = os.path.join(OUTPUT_DATA_FOLDER,
                                             f'combined_projects_for_llm_{today_str}_cutoff_{cutoff_date_filename_part}.txt')
 
@@ -229,15 +265,20 @@ def main():
     if os.path.exists(pickle_filename):
         print(f"[INFO] Found existing complete data file: {pickle_filename}")
         try:
-            with open(pickle_filename, 'rb') as f:
-                report_data = pickle.load(f)
+            report_data = load_records(pickle_filename)
             print(f"[INFO] Successfully loaded {len(report_data)} records from file.")
 
             # Clean up any leftover checkpoint files
             cleanup_checkpoint_files(checkpoint_files)
 
+            # Diff against the previous snapshot unless that was already done for this file
+            change_log = change_log_path(pickle_filename)
+            if not os.path.exists(change_log):
+                change_log = diff_snapshot(report_data, pickle_filename, snapshot_window())
+
             # Skip to display section
-            display_results(report_data, combined_string_filename)
+            with stage('output'):
+                display_results(report_data, combined_string_filename, change_log)
             return
         except Exception as e:
             print(f"[ERROR] Failed to load data from {pickle_filename}: {e}. Will attempt to re-fetch.")
@@ -253,9 +294,12 @@ def main():
             print("[INFO] Starting fresh (checkpoint files will be overwritten)")
             processed_data = None
 
+    fresh_numbers = set()  # Projects new or changed since the last crawl (filled by the refresh planner)
     if processed_data is None:
         # Start fresh - fetch all project IDs first
         print("[INFO] Starting fresh data fetch...")
+        if os.path.exists(checkpoint_files['processed_data']):
+            os.remove(checkpoint_files['processed_data'])  # Checkpoints append, so drop the old run's records
         start = 0
 
         # Parse cutoff date once before fetching
@@ -272,14 +316,21 @@ def main():
         while not reached_cutoff:
             print(f"[INFO] Fetching records {start} to {start + PAGE_SIZE}...")
             try:
-                response = session.post(SEARCH_URL, data=build_form_data(start), headers=REQUEST_HEADERS, timeout=30)
+                with stage('listing'), metrics.HTTP_IN_FLIGHT.track_inprogress(endpoint='listing'), \
+                        metrics.HTTP_LATENCY.time(endpoint='listing'):
+                    response = session.post(SEARCH_URL, data=build_form_data(start), headers=REQUEST_HEADERS,
+                                            timeout=30)
+                metrics.record_response('listing', response.status_code, len(response.content))
                 response.raise_for_status()
             except requests.exceptions.RequestException as e:
+                if getattr(e, 'response', None) is None:
+                    metrics.record_response('listing', 'error', 0)
                 print(f"[ERROR] Request failed during main search: {e}")
                 break
 
             try:
-                payload = response.json()
+                with stage('parse'), metrics.PARSE_SECONDS.time(stage='listing'):
+                    payload = response.json()
             except requests.exceptions.JSONDecodeError:
                 print(
                     f"[ERROR] Failed to decode JSON response. Status: {response.status_code}, Text: {response.text[:200]}")
@@ -290,13 +341,14 @@ def main():
                 print("[INFO] No more data found from the source.")
                 break
 
-            # Add only records on/after cutoff and stop when we reach older ones
-            for record in new_data:
-                project_created_on_str = record.get('ProjectCreatedOn')
-                record_date = parse_tdlr_date_str(project_created_on_str)
-                if record_date is None:
+            # Convert the page to ProjectRecords (dates decoded in one batch), then add only
+            # records on/after cutoff and stop when we reach older ones
+            with stage('lookup'), metrics.PARSE_SECONDS.time(stage='listing_records'):
+                page_records = records_from_listing_page(new_data)
+            for record in page_records:
+                if record.created_on is None:
                     continue
-                if record_date >= cutoff_date_obj:
+                if record.created_on >= cutoff_date_obj:
                     remaining_project_ids.append(record)
                 else:
                     reached_cutoff = True
@@ -312,102 +364,109 @@ def main():
 
             start += PAGE_SIZE
 
+        # Listing rows already carry county, TypeOfWork and EstimatedCost; update the rollups and the refresh schedule now
+        ingest_records(remaining_project_ids)
+        observe_records(remaining_project_ids, fresh=fresh_numbers)
+
         processed_data = []
         current_index = 0
         total_count = len(remaining_project_ids)
 
         print(f"[INFO] Found {total_count} records on/after cutoff date. Starting to process...")
 
-    # Process remaining projects with checkpointing
+    # Process remaining projects with checkpointing, most important first (see fetch_scheduler.py);
+    # projects that are new or changed since the last crawl go ahead of the rest of the backfill
+    scheduler = FetchScheduler(remaining_project_ids)
+    scheduler.push_many([record for record in remaining_project_ids if record.project_number in fresh_numbers],
+                        urgent=True)
+    record = None
+    actual_index = current_index
     try:
-        for i, record in enumerate(remaining_project_ids):
-            actual_index = current_index + i
-            project_number = record.get('ProjectNumber')
+        while len(scheduler):
+            record = scheduler.pop()
+            if record is None:
+                # Only failed projects waiting out their retry delay are left
+                time.sleep(scheduler.wait_time())
+                continue
+            project_number = record.project_number
 
             print(f"[INFO] ({actual_index + 1}/{total_count}) Fetching scope for project: {project_number}")
-
-            scope_of_work = fetch_scope_of_work(session, project_number)
-
-            project_created_on_str = record.get('ProjectCreatedOn')
-            record_date = parse_tdlr_date_str(project_created_on_str)
-
-            city_name = record.get('City')
-            county_name = record.get('County')
-            city_id = LOOKUP.get("CITIES", {}).get(str(city_name)) if city_name else None
-            county_id = LOOKUP.get("COUNTIES", {}).get(str(county_name)) if county_name else None
-
-            processed_item = {
-                'ProjectNumber': project_number if project_number else 'N/A',
-                'ProjectName': record.get('ProjectName', 'N/A'),
-                'Date': record_date.isoformat() if record_date else 'N/A',
-                'FacilityName': record.get('FacilityName', 'N/A'),
-                'City': city_id,
-                'County': county_id,
-                'CountyName': county_name,  # Keep original county name for filtering
-                'ScopeOfWork': scope_of_work
-            }
-
-            processed_data.append(processed_item)
+            metrics.QUEUE_DEPTH.set(len(scheduler), queue='by_date')
+
+            scope = fetch_scope_of_work(session, project_number, record)
+            if scope == "Error fetching" and scheduler.retry(record):
+                # Transient failure; try again after the rest of the higher-priority work
+                record = None
+                continue
+            record.scope_of_work = scope
+            processed_data.append(record)
+            record = None
+            actual_index += 1
 
             # Save checkpoint every CHECKPOINT_INTERVAL records
-            if (i + 1) % CHECKPOINT_INTERVAL == 0:
-                remaining_for_checkpoint = remaining_project_ids[i + 1:]  # Remaining items after current
-                save_checkpoint(checkpoint_files, processed_data, remaining_for_checkpoint, actual_index + 1,
-                                total_count)
+            if (actual_index - current_index) % CHECKPOINT_INTERVAL == 0:
+                save_checkpoint(checkpoint_files, processed_data, scheduler.remaining(), actual_index, total_count)
 
         # Processing completed successfully
         print(f"[SUCCESS] Processing completed! Processed {len(processed_data)} records.")
 
-        # Save final data to main pickle file
-        with open(pickle_filename, 'wb') as f:
-            pickle.dump(processed_data, f)
+        # Tag near-duplicate scopes so analyzers and exporters can work per cluster
+        with stage('cluster'):
+            assign_clusters(processed_data)
+
+        # Save final data to the main record file
+        write_records(pickle_filename, processed_data)
         print(f"[SUCCESS] Report data successfully saved to {pickle_filename}")
 
+        # Fingerprint this snapshot and record what changed since the previous run
+        with stage('diff'):
+            change_log = diff_snapshot(processed_data, pickle_filename, snapshot_window())
+
         # Clean up checkpoint files
         cleanup_checkpoint_files(checkpoint_files)
 
     except KeyboardInterrupt:
         print("\n[INFO] Process interrupted by user. Saving checkpoint...")
-        remaining_for_checkpoint = remaining_project_ids[i:]  # Current item and remaining
+        remaining_for_checkpoint = ([record] if record is not None else []) + scheduler.remaining()  # Current item and remaining
         save_checkpoint(checkpoint_files, processed_data, remaining_for_checkpoint, actual_index, total_count)
         print("[INFO] Checkpoint saved. You can resume later by running the script again.")
         return
     except Exception as e:
         print(f"\n[ERROR] Unexpected error: {e}. Saving checkpoint...")
-        remaining_for_checkpoint = remaining_project_ids[i:]  # Current item and remaining
+        remaining_for_checkpoint = ([record] if record is not None else []) + scheduler.remaining()  # Current item and remaining
         save_checkpoint(checkpoint_files, processed_data, remaining_for_checkpoint, actual_index, total_count)
         print("[ERROR] Checkpoint saved. You can resume later by running the script again.")
         return
 
     # Display results
-    display_results(processed_data, combined_string_filename)
+    with stage('output'):
+        display_results(processed_data, combined_string_filename, change_log)
+
 
+def display_results(report_data, combined_string_filename, change_log=None):
+    """Display and save the final results.
 
-def display_results(report_data, combined_string_filename):
-    """Display and save the final results"""
+    With LLM_DELTA_ONLY and a change log, only added/changed projects go into the LLM file.
+    """
     if report_data:
         print("\n--- Complete Project Report (All Data) ---")
         print(f"Total records in dataset: {len(report_data)}")
 
-        # Build combined strings for ALL records (filtering handled by print_out.py)
-        combined_strings_for_llm = []
-        for item in report_data:
-            project_number = item.get('ProjectNumber', 'N/A')
-            scope_of_work = item.get('ScopeOfWork', 'N/A')
-            combined_strings_for_llm.append(f"Project: {project_number}, Scope: {scope_of_work}")
+        llm_records = filter_delta(report_data, change_log) if LLM_DELTA_ONLY else report_data
 
-        # --- Write the consolidated string to a file (ALL DATA) ---
-        if combined_strings_for_llm:
-            try:
-                with open(combined_string_filename, 'w', encoding='utf-8') as f:
-                    for s in combined_strings_for_llm:
-                        f.write(s + "\n")
-                print(
-                    f"\n[SUCCESS] Combined LLM string (ALL {len(combined_strings_for_llm)} records) successfully saved to {combined_string_filename}")
-            except IOError as e:
-                print(f"\n[ERROR] Failed to save combined LLM string to {combined_string_filename}: {e}")
-        else:
-            print("\n[INFO] No combined LLM strings to save.")
+        # --- Write de-duplicated, token-budgeted chunks for the LLM ---
+        output_prefix = os.path.splitext(combined_string_filename)[0]
+        try:
+            manifest = build_corpus(llm_records, output_prefix)
+            if manifest:
+                total_records = sum(chunk['records'] for chunk in manifest)
+                total_tokens = sum(chunk['tokens'] for chunk in manifest)
+                print(f"\n[SUCCESS] LLM corpus ({total_records} records, ~{total_tokens} tokens) saved as "
+                      f"{len(manifest)} chunks listed in {output_prefix}_manifest.json")
+            else:
+                print("\n[INFO] No combined LLM strings to save.")
+        except IOError as e:
+            print(f"\n[ERROR] Failed to save LLM corpus to {output_prefix}_*: {e}")
     else:
         print("\n[INFO] No records to display.")
 
@@ -415,4 +474,8 @@ def display_results(report_data, combined_string_filename):
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    enable_profiling('by_date')
+    try:
+        main()
+    finally:
+        metrics.flush_metrics()
\ No newline at end of file
@@ -0,0 +1,191 @@
+import glob
+import json
+import os
+import random
+import re
+import zlib
+from collections import Counter
+from datetime import datetime
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional; zlib with a preset dictionary is used instead
+    zstandard = None
+
+# --- Settings ---
+DICTIONARY_FOLDER = os.path.join('output_data', 'dictionaries')
+DICT_SIZE = 32 * 1024  # zlib can only use the last 32 KB of a preset dictionary
+TRAINING_SAMPLES = 2000  # Items sampled to train a dictionary
+MIN_TRAINING_SAMPLES = 50  # Below this, items are stored without a dictionary
+HELD_OUT_EVERY = 5  # Every 5th sample is kept out of training and used to measure the baseline ratio
+RETRAIN_RATIO_DROP = 0.15  # Retrain when the ratio falls this far below the dictionary's baseline
+COMPRESSION_LEVEL = 6
+
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODEC_NAMES = {CODEC_ZLIB: 'zlib', CODEC_ZSTD: 'zstd'}
+DEFAULT_CODEC = CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+
+_SEGMENT_RE = re.compile(rb'[ -/:-~]{4,}')  # Printable runs between digits and binary fields
+
+
+def _train_zlib_dictionary(samples, size):
+    # zlib has no trainer: keep the most frequent segments, most frequent last (closest to the data)
+    counts = Counter()
+    for sample in samples:
+        counts.update(set(_SEGMENT_RE.findall(sample)))
+    chosen = []
+    total = 0
+    for segment, count in counts.most_common():
+        if count < 2 or total + len(segment) > size:
+            continue
+        chosen.append(segment)
+        total += len(segment)
+    return b''.join(reversed(chosen))
+
+
+def split_held_out(samples):
+    """(training, held-out) samples; the baseline ratio is measured on data the dictionary was not trained on"""
+    held_out = samples[::HELD_OUT_EVERY]
+    training = [sample for i, sample in enumerate(samples) if i % HELD_OUT_EVERY]
+    return training, held_out
+
+
+def train_dictionary(samples, size=DICT_SIZE, codec=DEFAULT_CODEC):
+    """Train a compression dictionary from sample items (bytes)"""
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed; pip install zstandard")
+        return zstandard.train_dictionary(size, list(samples)).as_bytes()
+    return _train_zlib_dictionary(samples, size)
+
+
+class Dictionary:
+    """A trained dictionary; compresses and decompresses single items independently"""
+
+    def __init__(self, name, version, codec, data, ratio=None):
+        self.name = name
+        self.version = version
+        self.codec = codec
+        self.data = data
+        self.ratio = ratio  # Baseline compression ratio, measured on held-out samples
+        self._zstd_dict = None
+
+    def _zstd(self):
+        if zstandard is None:
+            raise RuntimeError(f"Dictionary {self.name} v{self.version} needs zstandard; pip install zstandard")
+        if self._zstd_dict is None:
+            self._zstd_dict = zstandard.ZstdCompressionDict(self.data)
+            self._compressor = zstandard.ZstdCompressor(level=COMPRESSION_LEVEL, dict_data=self._zstd_dict)
+            self._decompressor = zstandard.ZstdDecompressor(dict_data=self._zstd_dict)
+        return self._zstd_dict
+
+    def compress(self, data):
+        if self.codec == CODEC_ZSTD:
+            self._zstd()
+            return self._compressor.compress(data)
+        compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, -15, zdict=self.data)
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, data):
+        if self.codec == CODEC_ZSTD:
+            self._zstd()
+            return self._decompressor.decompress(data)
+        decompressor = zlib.decompressobj(-15, zdict=self.data)
+        return decompressor.decompress(data) + decompressor.flush()
+
+    def measure(self, samples):
+        """Compression ratio (raw bytes / compressed bytes) over samples"""
+        raw = compressed = 0
+        for sample in samples:
+            raw += len(sample)
+            compressed += len(self.compress(sample))
+        return raw / compressed if compressed else 0.0
+
+
+class DictionaryRegistry:
+    """Versioned dictionaries for one kind of item (e.g. 'records' or 'pages').
+
+    Every trained version is kept as `{name}_v{version}.dict` plus a JSON sidecar, because
+    stored items name the version they were compressed with. New items use the newest one.
+    """
+
+    def __init__(self, name, folder=DICTIONARY_FOLDER):
+        self.name = name
+        self.folder = folder
+        self._loaded = {}
+
+    def _path(self, version, suffix):
+        return os.path.join(self.folder, f"{self.name}_v{version}{suffix}")
+
+    def versions(self):
+        pattern = re.compile(re.escape(self.name) + r'_v(\d+)\.json$')
+        found = (pattern.search(os.path.basename(path)) for path in glob.glob(self._path('*', '.json')))
+        return sorted(int(match.group(1)) for match in found if match)
+
+    def get(self, version):
+        dictionary = self._loaded.get(version)
+        if dictionary is None:
+            with open(self._path(version, '.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(self._path(version, '.dict'), 'rb') as f:
+                data = f.read()
+            dictionary = Dictionary(self.name, version, meta['codec'], data, meta.get('ratio'))
+            self._loaded[version] = dictionary
+        return dictionary
+
+    def current(self):
+        """Newest dictionary usable here, or None (zstd dictionaries are skipped without zstandard)"""
+        for version in reversed(self.versions()):
+            dictionary = self.get(version)
+            if dictionary.codec != CODEC_ZSTD or zstandard is not None:
+                return dictionary
+        return None
+
+    def train(self, samples, codec=DEFAULT_CODEC):
+        """Train, save and return a new dictionary version"""
+        samples = list(samples)
+        if len(samples) > TRAINING_SAMPLES:
+            samples = random.sample(samples, TRAINING_SAMPLES)
+        training, held_out = split_held_out(samples)
+        data = train_dictionary(training, codec=codec)
+
+        # Claim the next free version with an exclusive create, so concurrent writers never share one
+        os.makedirs(self.folder, exist_ok=True)
+        versions = self.versions()
+        version = versions[-1] + 1 if versions else 1
+        while True:
+            try:
+                with open(self._path(version, '.dict'), 'xb') as f:
+                    f.write(data)
+                break
+            except FileExistsError:
+                version += 1
+        dictionary = Dictionary(self.name, version, codec, data)
+        dictionary.ratio = dictionary.measure(held_out)
+        with open(self._path(version, '.json'), 'w', encoding='utf-8') as f:
+            json.dump({'codec': codec, 'ratio': dictionary.ratio, 'samples': len(training),
+                       'trained': datetime.now().isoformat()}, f, indent=2)
+        self._loaded[version] = dictionary
+        print(f"[INFO] Trained {CODEC_NAMES[codec]} dictionary {self.name} v{version} "
+              f"({len(dictionary.data)} bytes, held-out ratio {dictionary.ratio:.2f})")
+        return dictionary
+
+    def current_or_train(self, samples):
+        """Newest dictionary, training the first one from `samples` if there is none yet"""
+        dictionary = self.current()
+        if dictionary is None and len(samples) >= MIN_TRAINING_SAMPLES:
+            dictionary = self.train(samples)
+        return dictionary
+
+    def observe(self, dictionary, ratio, samples):
+        """Retrain if `ratio` (measured on new data) fell well below the dictionary's baseline.
+
+        Returns the dictionary to use from now on.
+        """
+        if dictionary.ratio and ratio < dictionary.ratio * (1 - RETRAIN_RATIO_DROP) \
+                and len(samples) >= MIN_TRAINING_SAMPLES:
+            print(f"[INFO] Compression ratio for {self.name} dropped to {ratio:.2f} "
+                  f"(baseline {dictionary.ratio:.2f}); retraining")
+            return self.train(samples)
+        return dictionary
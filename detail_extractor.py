@@ -0,0 +1,194 @@
+import re
+from datetime import datetime
+
+from bs4 import BeautifulSoup
+
+from project_record import parse_estimated_cost
+
+# --- Settings ---
+PARSER_VERSION = 2  # Bump whenever the extraction output changes, then run `python page_archive.py reextract`
+
+
+def _text(value):
+    return ' '.join(value.split()) or None
+
+
+def _integer(value):
+    digits = re.sub(r'[^\d]', '', value.split('.')[0])
+    return int(digits) if digits else None
+
+
+def _money(value):
+    return parse_estimated_cost(value)
+
+
+def _date(value):
+    value = value.strip()
+    for fmt in ('%m/%d/%Y', '%m/%d/%Y %I:%M:%S %p', '%Y-%m-%d', '%B %d, %Y'):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return _text(value)
+
+
+def _multiline(value):
+    return value.strip() or None
+
+
+# Column name and type for the detail-page labels we know about, keyed by the normalized
+# label (lower case, no trailing colon). Unknown labels are kept as text under a snake_case
+# column, so new fields on the page are captured without a schema change.
+FIELD_SCHEMA = {
+    'scope of work': ('scope_of_work', _multiline),
+    'project name': ('project_name', _text),
+    'project number': ('project_number', _text),
+    'project status': ('project_status', _text),
+    'status': ('project_status', _text),
+    'facility name': ('facility_name', _text),
+    'location address': ('location_address', _text),
+    'address': ('location_address', _text),
+    'type of work': ('type_of_work', _text),
+    'type of funds': ('type_of_funds', _text),
+    'estimated cost': ('estimated_cost', _money),
+    'square footage': ('square_footage', _integer),
+    'estimated start date': ('estimated_start', _date),
+    'estimated completion date': ('estimated_completion', _date),
+    'owner': ('owner_name', _text),
+    'owner name': ('owner_name', _text),
+    'tenant': ('tenant_name', _text),
+    'tenant name': ('tenant_name', _text),
+    'design firm': ('design_firm', _text),
+    'registered accessibility specialist': ('ras_name', _text),
+    'ras': ('ras_name', _text),
+    'inspection date': ('inspection_date', _date),
+    'inspection status': ('inspection_status', _text),
+    'review date': ('review_date', _date),
+    'review status': ('review_status', _text),
+}
+
+
+# Columns copied onto ProjectRecord fields; these keep their first value instead of becoming lists
+SINGLE_VALUED = {'scope_of_work', 'project_name', 'project_number', 'project_status'}
+SECTION_TAGS = ['h1', 'h2', 'h3', 'h4', 'h5', 'legend']
+SECTION_NOISE = {'information', 'info', 'details', 'detail'}  # Dropped from section headings ("Owner Information" -> owner)
+
+
+def column_name(label):
+    """snake_case column for a label that is not in FIELD_SCHEMA"""
+    return re.sub(r'[^a-z0-9]+', '_', label.lower()).strip('_') or 'field'
+
+
+def _label(tag):
+    return (_text(tag.get_text(' ')) or '').rstrip(':').strip().lower()
+
+
+def _section(tag):
+    """Normalized section heading: lower case, without SECTION_NOISE words"""
+    words = (_text(tag.get_text(' ')) or '').rstrip(':').lower().split()
+    return ' '.join(word for word in words if word not in SECTION_NOISE)
+
+
+def _value_text(dd, multiline):
+    """Text of a dd; for a dd holding its own dl, only the nested values (not their labels)"""
+    if dd.find('dl') is not None:
+        values = [_text(inner.get_text(' ')) for inner in dd.find_all('dd') if inner.find_parent('dd') is dd]
+        return ' '.join(value for value in values if value)
+    return dd.get_text() if multiline else dd.get_text(' ')
+
+
+def _column(label, section, filled_by):
+    """(column, converter) for a label: the section-qualified label if the schema knows it, then the
+    bare label unless another section already filled that column, else the qualified snake_case name"""
+    qualified = f"{section} {label}" if section else label
+    if qualified in FIELD_SCHEMA:
+        return FIELD_SCHEMA[qualified]
+    name, convert = FIELD_SCHEMA.get(label, (column_name(label), _text))
+    if filled_by.get(name, section) != section:
+        return column_name(qualified), convert
+    return name, convert
+
+
+def _add(details, name, value):
+    """Store a value; a column seen again with a different value keeps every value as a list"""
+    if name not in details:
+        details[name] = value
+        return
+    if name in SINGLE_VALUED:
+        return
+    existing = details[name]
+    values = existing if isinstance(existing, list) else [existing]
+    if value not in values:
+        details[name] = values + [value]
+
+
+def _table_name(table, position):
+    caption = table.find('caption')
+    if caption is not None and _text(caption.get_text(' ')):
+        return column_name(caption.get_text(' '))
+    heading = table.find_previous(SECTION_TAGS)
+    if heading is not None and _text(heading.get_text(' ')):
+        return column_name(heading.get_text(' '))
+    return f"table_{position}"
+
+
+def _extract_table(table):
+    """Rows of a table as dicts keyed by its header cells"""
+    rows = table.find_all('tr')
+    if not rows:
+        return []
+    header_cells = rows[0].find_all(['th', 'td'])
+    headers = [column_name(cell.get_text(' ')) for cell in header_cells]
+    body = rows[1:] if rows[0].find('th') is not None else rows
+    if body is rows:
+        headers = [f"column_{i + 1}" for i in range(len(header_cells))]
+    result = []
+    for row in body:
+        cells = [_text(cell.get_text(' ')) for cell in row.find_all(['td', 'th'])]
+        if any(cells):
+            result.append(dict(zip(headers, cells)))
+    return result
+
+
+def extract_details(html):
+    """Every dt/dd field and table on a project detail page, as typed columns.
+
+    The page is walked once in document order. Labels are qualified by their section
+    heading where that tells repeated labels apart ('Name' under "Owner" is owner_name, under
+    "Tenant" tenant_name); known labels are converted per FIELD_SCHEMA, and a column that
+    still repeats with different values keeps them all as a list (SINGLE_VALUED ones keep
+    the first). A dl nested in a dd is
+    part of that dd's value, not separate fields. Tables are stored under 'tables' by
+    caption or heading. Returns a dict (empty if the page has no fields).
+    """
+    soup = BeautifulSoup(html, 'lxml')
+    details = {}
+    tables = {}
+    filled_by = {}  # column -> section whose label filled it
+    label = None
+    section = ''
+    for tag in soup.find_all(SECTION_TAGS + ['dt', 'dd', 'table']):
+        if tag.name in ('dt', 'dd') and tag.find_parent('dd') is not None:
+            continue  # Nested inside another field's value
+        if tag.name == 'dt':
+            label = _label(tag)
+        elif tag.name == 'dd':
+            if not label:
+                continue
+            name, convert = _column(label, section, filled_by)
+            raw = _value_text(tag, convert is _multiline)
+            value = convert(raw) if raw and raw.strip() else None
+            if value is not None:
+                filled_by.setdefault(name, section)
+                _add(details, name, value)
+            label = None
+        elif tag.name != 'table':
+            if tag.find_parent('dd') is None:
+                section = _section(tag)
+        elif tag.find_parent('table') is None:
+            rows = _extract_table(tag)
+            if rows:
+                tables[_table_name(tag, len(tables) + 1)] = rows
+    if tables:
+        details['tables'] = tables
+    return details
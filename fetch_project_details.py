@@ -1,86 +1,147 @@
+import copy
 import os
-import pickle
+import sys
 import asyncio
+import time
 import aiohttp
-from bs4 import BeautifulSoup
-import re
 from tqdm import tqdm
 import lxml
+from project_record import ProjectRecord
+from detail_extractor import extract_details
+from page_archive import archive_page_async
+from http_fixtures import fixture_client_session
+from single_flight import DETAIL_FLIGHTS
+from record_store import load_records, migrate_legacy, write_records
+from scope_clusters import assign_clusters
+import metrics
+from profiling import enable_profiling, stage
+from fetch_scheduler import FetchScheduler
+from work_queue import BATCH_SIZE, HEARTBEAT_INTERVAL, WorkQueue, default_worker_id, print_queue_status
 
 # --- Settings ---
-INPUT_FILE = 'tabs_projects_9001.pkl'
-OUTPUT_FILE = 'project_scopes.pkl'
-MAX_PROJECTS = 500  # Maximum number of projects to process from the input file
+INPUT_FILE = 'tabs_projects_9001.records'
+OUTPUT_FILE = 'project_scopes.records'
+MAX_PROJECTS = None  # Set to a number to fetch only the first N projects of the input file (e.g. for a test run)
 # Experiment with this value, e.g., 50, 75, 100.
 # Be cautious of server limits.
 MAX_CONCURRENT_REQUESTS = 50  # Increased for example
+QUEUE_POLL_INTERVAL = 10  # Seconds an idle queue worker waits for other workers' leases to finish or expire
 
 
 async def fetch_project_details(session, project_number, semaphore, ref=None):
-    """Fetch project details page and extract the scope of work plus project meta info."""
+    """Fetch project details page and extract the scope of work plus project meta info.
+
+    Returns a (ProjectRecord, error) tuple; error is None on success. The listing fields
+    come from `ref` (a ProjectRecord) when given. Concurrent calls for the same project in
+    this process share one request and its parsed result (see single_flight.py).
+    """
+    record = ref if ref is not None else ProjectRecord(project_number=project_number)
+    details, error = await DETAIL_FLIGHTS.do_async(project_number, _fetch_details, session, project_number, semaphore)
+    if error is None:
+        # Coalesced callers receive the same dict; each record gets its own copy
+        record.details = copy.deepcopy(details)
+        record.scope_of_work = details.get('scope_of_work')
+    return record, error
+
+
+async def _fetch_details(session, project_number, semaphore):
+    """(details dict, None) on success, (None, error message) otherwise"""
     url = f"https://www.tdlr.texas.gov/TABS/Search/Project/{project_number}"
 
+    wait_start = time.perf_counter()
     async with semaphore:
+        metrics.CONCURRENCY_WAIT.observe(time.perf_counter() - wait_start, endpoint='detail')
+        metrics.HTTP_IN_FLIGHT.inc(endpoint='detail')
+        request_start = time.perf_counter()
+        recorded = False
         try:
             # Consider adding a timeout to the session.get() call if needed
             # timeout = aiohttp.ClientTimeout(total=60) # 60 seconds total timeout
             # async with session.get(url, timeout=timeout) as response:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    html = await response.text()
-                    # Use lxml parser for better performance
-                    # Ensure you have lxml installed: pip install lxml
-                    soup = BeautifulSoup(html, 'lxml')
-
-                    # Find Scope of Work
-                    scope_dt = soup.find('dt', string=re.compile(r'Scope of Work:', re.IGNORECASE))
-                    scope_text = None
-                    if scope_dt:
-                        scope_dd = scope_dt.find_next('dd')
-                        if scope_dd:
-                            scope_text = scope_dd.text.strip()
-
-                    d = {
-                        "project_number": project_number,
-                        "scope_of_work": scope_text,
-                        "success": True,
-                    }
-
-                    # Add ONLY the requested camelCase keys
-                    if ref:
-                        d["ProjectName"] = ref.get("ProjectName")
-                        d["ProjectCreatedOn"] = ref.get("ProjectCreatedOn")
-                        d["FacilityName"] = ref.get("FacilityName")
-                        d["City"] = ref.get("City")
-                        d["County"] = ref.get("County")
-
-                    return d
-                else:
-                    return {
-                        "project_number": project_number,
-                        "scope_of_work": None,
-                        "success": False,
-                        "error": f"HTTP {response.status}"
-                    }
+            with stage('fetch'):
+                async with session.get(url) as response:
+                    status = response.status
+                    body = await response.read()  # Bytes on the wire; text() below decodes the buffered body
+                    html = await response.text() if status == 200 else None
+            metrics.HTTP_LATENCY.observe(time.perf_counter() - request_start, endpoint='detail')
+            metrics.record_response('detail', status, len(body))
+            recorded = True
+
+            if status != 200:
+                return None, f"HTTP {status}"
+
+            # Extract every field and table on the page in one pass (lxml-backed BeautifulSoup)
+            details = None
+            try:
+                with stage('parse'), metrics.PARSE_SECONDS.time(stage='detail'):
+                    details = extract_details(html)
+            finally:
+                # Keep the raw page even if parsing failed, so a fixed parser can be replayed offline
+                await archive_page_async(project_number, html, details)
+
+            return details, None
         except asyncio.TimeoutError: # Example of handling timeout
-            return {
-                "project_number": project_number,
-                "scope_of_work": None,
-                "success": False,
-                "error": "Request timed out"
-            }
+            if not recorded:
+                metrics.record_response('detail', 'timeout', 0)
+            return None, "Request timed out"
         except Exception as e:
-            return {
-                "project_number": project_number,
-                "scope_of_work": None,
-                "success": False,
-                "error": str(e)
-            }
+            # A page that arrived but failed to parse was already counted with its HTTP status
+            if not recorded:
+                metrics.record_response('detail', 'error', 0)
+            return None, str(e)
+        finally:
+            metrics.HTTP_IN_FLIGHT.dec(endpoint='detail')
+
+async def fetch_scheduled(session, scheduler, semaphore, workers=MAX_CONCURRENT_REQUESTS):
+    """Fetch every project in `scheduler`, highest priority first; returns the successful records.
+
+    Each worker pulls the next project only when it is free, so projects pushed while the
+    run is in progress (urgent ones first) are picked up ahead of the remaining backlog.
+    Failures are re-queued with a lower priority, after a delay, until MAX_FETCH_ATTEMPTS is reached.
+    """
+    results = []
+    progress = tqdm(total=len(scheduler), desc="Fetching project details")
+
+    async def worker():
+        while True:
+            ref = scheduler.pop()
+            if ref is None:
+                if not len(scheduler):
+                    return
+                # Only failed projects waiting out their retry delay are left
+                await asyncio.sleep(scheduler.wait_time())
+                continue
+            metrics.QUEUE_DEPTH.set(len(scheduler), queue='fetch_project_details')
+            record, error = await fetch_project_details(session, ref.project_number, semaphore, ref=ref)
+            if error is None:
+                results.append(record)
+            elif scheduler.retry(record):
+                progress.total += 1
+            else:
+                print(f"[WARN] Failed for {record.project_number}: {error}")
+            progress.update(1)
+
+    await asyncio.gather(*[worker() for _ in range(workers)])
+    progress.close()
+    return results
+
+
+def client_session():
+    # Configure TCPConnector
+    # Set limit to be at least MAX_CONCURRENT_REQUESTS
+    # Set limit_per_host to be at least MAX_CONCURRENT_REQUESTS for a single-site scraper
+    connector = aiohttp.TCPConnector(limit=MAX_CONCURRENT_REQUESTS * 2, limit_per_host=MAX_CONCURRENT_REQUESTS)
+
+    # Define a client timeout (optional, but good practice)
+    timeout = aiohttp.ClientTimeout(total=60) # e.g., 60 seconds for the entire request including connection
+    # Recorded or replayed instead of live when TX_PERMIT_HTTP_MODE is set (see http_fixtures.py)
+    return fixture_client_session(aiohttp.ClientSession(connector=connector, timeout=timeout))
+
 
 async def main():
+    metrics.start_metrics()
     try:
-        with open(INPUT_FILE, 'rb') as f:
-            projects = pickle.load(f)
+        projects = load_records(migrate_legacy(INPUT_FILE))
         print(f"[INFO] Loaded {len(projects)} projects from {INPUT_FILE}")
     except Exception as e:
         print(f"[ERROR] Failed to load projects: {e}")
@@ -90,16 +151,9 @@ async def main():
     print(f"[INFO] Processing {len(projects_to_process)} projects")
 
     project_refs = [
-        {
-            "ProjectNumber": proj.get("ProjectNumber"),
-            "ProjectName": proj.get("ProjectName"),
-            "ProjectCreatedOn": proj.get("ProjectCreatedOn"),
-            "FacilityName": proj.get("FacilityName"),
-            "City": proj.get("City"),
-            "County": proj.get("County"),
-        }
+        proj
         for proj in projects_to_process # Ensure we use the sliced list
-        if proj.get("ProjectNumber")
+        if proj.project_number
     ]
 
     if not project_refs:
@@ -107,31 +161,17 @@ async def main():
         return
 
     semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
-    results = []
+    scheduler = FetchScheduler(project_refs)
 
-    # Configure TCPConnector
-    # Set limit to be at least MAX_CONCURRENT_REQUESTS
-    # Set limit_per_host to be at least MAX_CONCURRENT_REQUESTS for a single-site scraper
-    connector = aiohttp.TCPConnector(limit=MAX_CONCURRENT_REQUESTS * 2, limit_per_host=MAX_CONCURRENT_REQUESTS)
-    
-    # Define a client timeout (optional, but good practice)
-    timeout = aiohttp.ClientTimeout(total=60) # e.g., 60 seconds for the entire request including connection
+    async with client_session() as session:
+        results = await fetch_scheduled(session, scheduler, semaphore)
 
-    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-        tasks = [
-            fetch_project_details(session, ref["ProjectNumber"], semaphore, ref=ref)
-            for ref in project_refs
-        ]
+    # Tag near-duplicate scopes so analyzers and exporters can work per cluster
+    with stage('cluster'):
+        assign_clusters(results)
 
-        for future in tqdm(asyncio.as_completed(tasks), total=len(tasks), desc="Fetching project details"):
-            result = await future
-            if result.get("success"):
-                results.append(result)
-            else:
-                print(f"[WARN] Failed for {result.get('project_number')}: {result.get('error', 'Unknown error')}")
-
-    with open(OUTPUT_FILE, 'wb') as f:
-        pickle.dump(results, f)
+    with stage('output'):
+        write_records(OUTPUT_FILE, results)
 
     print(f"[SUCCESS] Saved {len(results)} project scopes to {OUTPUT_FILE}")
     if len(project_refs) > 0:
@@ -141,5 +181,98 @@ async def main():
         print("No projects were processed to calculate a success rate.")
 
 
+def enqueue_projects(queue):
+    """Queue every project in INPUT_FILE for distributed fetching"""
+    projects = load_records(migrate_legacy(INPUT_FILE))
+    added = queue.enqueue(projects)
+    print(f"[INFO] Queued {added} new projects from {INPUT_FILE} ({len(projects) - added} already queued or without a number)")
+    print_queue_status(queue)
+
+
+async def _heartbeat(queue, lease):
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        held = await asyncio.to_thread(queue.heartbeat, lease)
+        if held < len(lease):
+            print(f"[WARNING] Lease {lease.lease_id[:8]} lost {len(lease) - held} projects to another worker")
+
+
+async def run_queue_worker(queue, worker_id=None, batch_size=BATCH_SIZE):
+    """Lease batches from the work queue, fetch them and commit the results until the queue is drained.
+
+    The lease is renewed while the batch is in flight; if this process dies, the batch is
+    re-delivered to another worker once the lease expires.
+    """
+    metrics.start_metrics()
+    worker_id = worker_id or default_worker_id()
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    committed = failed = 0
+    print(f"[INFO] Queue worker {worker_id} started")
+
+    async with client_session() as session:
+        while True:
+            lease = await asyncio.to_thread(queue.lease, worker_id, batch_size)
+            if lease is None:
+                if await asyncio.to_thread(queue.is_drained):
+                    break
+                # Remaining projects are leased by other workers; wait in case a lease expires
+                await asyncio.sleep(QUEUE_POLL_INTERVAL)
+                continue
+
+            heartbeat = asyncio.create_task(_heartbeat(queue, lease))
+            try:
+                outcomes = await asyncio.gather(*[
+                    fetch_project_details(session, ref.project_number, semaphore, ref=ref)
+                    for ref in lease.records
+                ])
+            finally:
+                heartbeat.cancel()
+
+            done = []
+            for record, error in outcomes:
+                if error is None:
+                    done.append(record)
+                else:
+                    failed += 1
+                    print(f"[WARN] Failed for {record.project_number}: {error}")
+                    await asyncio.to_thread(queue.fail, lease, record.project_number, error)
+            with stage('checkpoint'):
+                committed += await asyncio.to_thread(queue.commit, lease, done)
+            metrics.QUEUE_DEPTH.set(queue.counts()['pending'], queue='work_queue')
+
+    print(f"[SUCCESS] Worker {worker_id} committed {committed} projects ({failed} failed attempts)")
+    print_queue_status(queue)
+
+
+def export_results(queue):
+    """Write every committed result to OUTPUT_FILE, clustered like a local run"""
+    results = list(queue.iter_results())
+    with stage('cluster'):
+        assign_clusters(results)
+    with stage('output'):
+        write_records(OUTPUT_FILE, results)
+    print(f"[SUCCESS] Exported {len(results)} project scopes from the work queue to {OUTPUT_FILE}")
+    print_queue_status(queue)
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    # Usage: python fetch_project_details.py [enqueue | worker | export | status]
+    # Without a command, every project (or the first MAX_PROJECTS) is fetched locally.
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    enable_profiling('fetch_project_details' if command is None else f'fetch_project_details_{command}')
+    try:
+        if command is None:
+            asyncio.run(main())
+        elif command == 'enqueue':
+            enqueue_projects(WorkQueue())
+        elif command == 'worker':
+            asyncio.run(run_queue_worker(WorkQueue()))
+        elif command == 'export':
+            export_results(WorkQueue())
+        elif command == 'status':
+            print_queue_status(WorkQueue())
+        else:
+            print(f"[ERROR] Unknown command '{command}'; expected enqueue, worker, export or status.")
+            sys.exit(1)
+    finally:
+        metrics.flush_metrics()
\ No newline at end of file
@@ -0,0 +1,146 @@
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from collections import deque
+from datetime import date
+
+# --- Settings ---
+PRIORITY_WEIGHTS = {
+    'recency': 1.0,  # Newer projects first (halves every RECENCY_HALF_LIFE_DAYS)
+    'cost': 1.0,  # Higher EstimatedCost first (log scale)
+    'watched': 2.0,  # Bonus for projects in WATCHED_COUNTIES
+    'retry': 0.5,  # Penalty per failed attempt, so one bad project cannot hold up the rest
+}
+RECENCY_HALF_LIFE_DAYS = 30
+COST_SCALE = 1e7  # An EstimatedCost of this size earns the full cost weight
+WATCHED_COUNTIES = {name.strip() for name in os.getenv('TX_PERMIT_WATCHED_COUNTIES', '').split(',') if name.strip()}
+MAX_FETCH_ATTEMPTS = 3  # Attempts per project before giving up
+RETRY_DELAY = 30  # Seconds before a failed project is eligible again; doubles with every further failure
+
+
+def priority_score(record, attempts=0, weights=None, watched_counties=None, today=None):
+    """Higher scores are fetched sooner"""
+    weights = PRIORITY_WEIGHTS if weights is None else weights
+    watched_counties = WATCHED_COUNTIES if watched_counties is None else watched_counties
+    score = 0.0
+    if record.created_on is not None:
+        age_days = max(((today or date.today()) - record.created_on).days, 0)
+        score += weights.get('recency', 0) * 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+    if record.estimated_cost:
+        score += weights.get('cost', 0) * min(math.log1p(record.estimated_cost) / math.log1p(COST_SCALE), 1.0)
+    if watched_counties and record.county_name in watched_counties:
+        score += weights.get('watched', 0)
+    return score - weights.get('retry', 0) * attempts
+
+
+class FetchScheduler:
+    """Priority queue of projects waiting for a detail fetch.
+
+    Projects are popped highest score first. Urgent pushes (by_date.py marks projects that
+    are new or changed since the last crawl) go ahead of everything that is merely queued;
+    fetches already in flight are left to finish. Pushing a project that is already queued
+    updates its priority instead of queueing it twice. A failed project waits RETRY_DELAY
+    (doubling per failure) before it can be popped again. Records without a project number
+    cannot be fetched or deduplicated; they are passed through after everything else.
+    Safe to share between threads.
+    """
+
+    def __init__(self, records=(), weights=None, watched_counties=None, today=None, clock=time.monotonic):
+        self.weights = weights
+        self.watched_counties = watched_counties
+        self.today = today or date.today()
+        self.clock = clock
+        self.attempts = {}  # project number -> failed attempts so far
+        self._heap = []  # (urgent rank, -score, sequence, project number)
+        self._entries = {}  # project number -> (heap entry, record) for the live entry
+        self._delayed = []  # (eligible at, sequence, record) for failed projects waiting to be retried
+        self._unnumbered = deque()  # Records without a project number, in arrival order
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self.push_many(records)
+
+    def __len__(self):
+        return len(self._entries) + len(self._delayed) + len(self._unnumbered)
+
+    def _score(self, record, attempts):
+        return priority_score(record, attempts, self.weights, self.watched_counties, self.today)
+
+    def _push(self, record, urgent):
+        number = record.project_number
+        attempts = self.attempts.get(number, 0)
+        entry = (0 if urgent else 1, -self._score(record, attempts), next(self._counter), number)
+        live = self._entries.get(number)
+        if live is not None and live[0] <= entry:
+            return False  # Already queued at least as early
+        # Any older heap entry for this project becomes stale and is skipped on pop
+        self._entries[number] = (entry, record)
+        heapq.heappush(self._heap, entry)
+        return True
+
+    def _add(self, record, urgent):
+        if not record.project_number:
+            self._unnumbered.append(record)
+            return True
+        return self._push(record, urgent)
+
+    def push(self, record, urgent=False):
+        """Queue a project; returns False if it was already queued at least as early"""
+        with self._lock:
+            return self._add(record, urgent)
+
+    def push_many(self, records, urgent=False):
+        """Queue many projects; returns how many were added or moved ahead"""
+        with self._lock:
+            return sum(1 for record in records if self._add(record, urgent))
+
+    def _release(self):
+        """Move failed projects whose delay has passed back into the priority queue"""
+        now = self.clock()
+        while self._delayed and self._delayed[0][0] <= now:
+            self._push(heapq.heappop(self._delayed)[2], False)
+
+    def pop(self):
+        """Next project to fetch, or None if nothing is eligible yet (see wait_time) or the queue is empty"""
+        with self._lock:
+            self._release()
+            while self._heap:
+                entry = heapq.heappop(self._heap)
+                live = self._entries.get(entry[3])
+                if live is not None and live[0] is entry:
+                    del self._entries[entry[3]]
+                    return live[1]
+            if self._unnumbered and not self._delayed:
+                return self._unnumbered.popleft()
+            return None
+
+    def wait_time(self):
+        """Seconds until a delayed retry becomes eligible (0 if something can be popped now)"""
+        with self._lock:
+            if self._entries or not self._delayed:
+                return 0.0
+            return max(self._delayed[0][0] - self.clock(), 0.0)
+
+    def retry(self, record):
+        """Re-queue a failed project after a delay, with a lower priority.
+
+        Returns False once it has used MAX_FETCH_ATTEMPTS (or has no project number to retry by).
+        """
+        if not record.project_number:
+            return False
+        with self._lock:
+            attempts = self.attempts.get(record.project_number, 0) + 1
+            self.attempts[record.project_number] = attempts
+            if attempts >= MAX_FETCH_ATTEMPTS:
+                return False
+            eligible = self.clock() + RETRY_DELAY * 2 ** (attempts - 1)
+            heapq.heappush(self._delayed, (eligible, next(self._counter), record))
+            return True
+
+    def remaining(self):
+        """Queued records in the order they would be fetched (for checkpoints)"""
+        with self._lock:
+            queued = [record for _, record in sorted(self._entries.values(), key=lambda item: item[0])]
+            return queued + [record for _, _, record in sorted(self._delayed)] + list(self._unnumbered)
@@ -1,18 +1,26 @@
 import os
-import pickle
 import requests
 from http.cookiejar import MozillaCookieJar
+from project_record import records_from_listing_page
+from record_store import write_records
+from rollups import ingest_records
+from refresh_planner import observe_records
+from profiling import enable_profiling, stage
+from http_fixtures import install_fixtures
+from listing_cache import install_listing_cache
 
 # --- Settings ---
 COOKIE_FILE = 'cookies.txt'
 SEARCH_URL = 'https://www.tdlr.texas.gov/TABS/Search/SearchProjects'
-OUTPUT_FILE = 'tabs_projects_9001.pkl'
+OUTPUT_FILE = 'tabs_projects_9001.records'
 RECORD_LIMIT = 5000
 PAGE_SIZE = 100
 TYPE_OF_WORK = ''
 
+enable_profiling('fetch_tabs_projects')
+
 # --- Session Setup ---
-session = requests.Session()
+session = install_listing_cache(install_fixtures(requests.Session()), SEARCH_URL)
 session.cookies = MozillaCookieJar(COOKIE_FILE)
 if os.path.exists(COOKIE_FILE):
     session.cookies.load(ignore_discard=True, ignore_expires=True)
@@ -103,20 +111,23 @@ start = 0
 while len(all_data) < RECORD_LIMIT:
     print(f"[INFO] Fetching records {start} to {start + PAGE_SIZE}...")
 
-    response = session.post(SEARCH_URL, data=build_form_data(start), headers=headers)
+    with stage('listing'):
+        response = session.post(SEARCH_URL, data=build_form_data(start), headers=headers)
 
     if not response.ok:
         print(f"[ERROR] Failed to fetch data at offset {start}")
         break
 
-    payload = response.json()
+    with stage('parse'):
+        payload = response.json()
     new_data = payload.get('data', [])
 
     if not new_data:
         print("[INFO] No more data found.")
         break
 
-    all_data.extend(new_data)
+    with stage('lookup'):
+        all_data.extend(records_from_listing_page(new_data))
 
     if len(new_data) < PAGE_SIZE:
         break  # No more data available
@@ -126,8 +137,12 @@ while len(all_data) < RECORD_LIMIT:
 # Trim to limit (in case of over-fetch)
 all_data = all_data[:RECORD_LIMIT]
 
-# --- Save to pickle ---
-with open(OUTPUT_FILE, 'wb') as f:
-    pickle.dump(all_data, f)
+# --- Save as a chunked record store ---
+with stage('output'):
+    write_records(OUTPUT_FILE, all_data)
+
+print(f"[SUCCESS] Saved {len(all_data)} records to {OUTPUT_FILE}")
 
-print(f"[SUCCESS] Saved {len(all_data)} records to {OUTPUT_FILE}")
\ No newline at end of file
+# --- Update county x month x type-of-work rollups and the refresh schedule ---
+ingest_records(all_data)
+observe_records(all_data)
\ No newline at end of file
@@ -0,0 +1,328 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from datetime import timedelta
+from urllib.parse import parse_qsl, urlencode
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp is optional; only fetch_project_details.py uses it
+    aiohttp = None
+
+# --- Settings ---
+HTTP_MODE = os.getenv('TX_PERMIT_HTTP_MODE', '').lower()  # 'record', 'replay' or empty for live traffic only
+FIXTURE_FILE = os.getenv('TX_PERMIT_HTTP_FIXTURES', os.path.join('output_data', 'fixtures', 'http_fixtures.db'))
+REPLAY_SPEED = float(os.getenv('TX_PERMIT_HTTP_REPLAY_SPEED', '1'))  # 1 = recorded latency, 2 = twice as fast, 0 = no delay
+VOLATILE_PARAMS = {'draw', '_'}  # Form/query parameters that change per request without changing the answer
+DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'set-cookie'}  # Bodies are stored decoded
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS exchanges (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    request_key TEXT NOT NULL,
+    method TEXT NOT NULL,
+    url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    reason TEXT,
+    headers TEXT,
+    body BLOB,
+    elapsed REAL,
+    recorded REAL
+);
+CREATE INDEX IF NOT EXISTS exchanges_key ON exchanges (request_key, id);
+"""
+
+
+def normalize_payload(body):
+    """Canonical form of a form-encoded payload (dict, str or bytes): sorted pairs without VOLATILE_PARAMS"""
+    if body is None:
+        return ''
+    if isinstance(body, dict):
+        pairs = [(str(key), str(value)) for key, value in body.items()]
+    else:
+        if isinstance(body, bytes):
+            body = body.decode('utf-8', 'replace')
+        pairs = parse_qsl(body, keep_blank_values=True)
+    return urlencode(sorted(pair for pair in pairs if pair[0] not in VOLATILE_PARAMS))
+
+
+def request_key(method, url, body=None):
+    """Stable key for an exchange: method, URL and normalized payload"""
+    url, _, query = str(url).partition('?')
+    digest = hashlib.sha1(f"{normalize_payload(query)}\n{normalize_payload(body)}".encode('utf-8')).hexdigest()
+    return f"{method.upper()} {url} {digest}"
+
+
+class Exchange:
+    """One recorded response"""
+
+    __slots__ = ('method', 'url', 'status', 'reason', 'headers', 'body', 'elapsed')
+
+    def __init__(self, method, url, status, reason, headers, body, elapsed):
+        self.method = method
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+        self.elapsed = elapsed
+
+    @property
+    def delay(self):
+        """Seconds to wait before returning this response at REPLAY_SPEED"""
+        return self.elapsed / REPLAY_SPEED if REPLAY_SPEED > 0 and self.elapsed else 0.0
+
+
+class FixtureArchive:
+    """Recorded HTTP exchanges in one SQLite file, bodies zlib-compressed.
+
+    Requests are matched on method, URL and normalized payload. A request made several
+    times during recording (e.g. a page that was retried) is answered with its recordings
+    in order; the last one is repeated after that.
+    """
+
+    def __init__(self, path=FIXTURE_FILE):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._served = {}
+
+    def close(self):
+        self.conn.close()
+
+    def record(self, method, url, body, status, reason, headers, content, elapsed):
+        headers = {name: value for name, value in headers.items() if name.lower() not in DROPPED_HEADERS}
+        with self._lock, self.conn:
+            self.conn.execute(
+                'INSERT INTO exchanges (request_key, method, url, status, reason, headers, body, elapsed, recorded) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (request_key(method, url, body), method.upper(), str(url), status, reason, json.dumps(headers),
+                 zlib.compress(content or b'', 6), elapsed, time.time()))
+
+    def replay(self, method, url, body=None):
+        """Next recorded Exchange for this request, or None if it was never recorded"""
+        key = request_key(method, url, body)
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT method, url, status, reason, headers, body, elapsed FROM exchanges '
+                'WHERE request_key = ? ORDER BY id', (key,)).fetchall()
+            if not rows:
+                return None
+            served = self._served.get(key, 0)
+            self._served[key] = served + 1
+        method, url, status, reason, headers, body, elapsed = rows[min(served, len(rows) - 1)]
+        return Exchange(method, url, status, reason, json.loads(headers or '{}'), zlib.decompress(body), elapsed)
+
+    def summary(self):
+        """[(method, endpoint, exchanges, stored bytes, mean elapsed)] grouped by path without the last segment"""
+        totals = {}
+        for method, url, size, elapsed in self.conn.execute('SELECT method, url, LENGTH(body), elapsed FROM exchanges'):
+            endpoint = url.split('?')[0].rsplit('/', 1)[0] + '/...' if '/Project/' in url else url.split('?')[0]
+            entry = totals.setdefault((method, endpoint), [0, 0, 0.0])
+            entry[0] += 1
+            entry[1] += size or 0
+            entry[2] += elapsed or 0.0
+        return [(method, endpoint, count, size, elapsed / count)
+                for (method, endpoint), (count, size, elapsed) in sorted(totals.items())]
+
+
+_archive = None
+
+
+def fixture_archive():
+    """The process-wide FixtureArchive for FIXTURE_FILE"""
+    global _archive
+    if _archive is None:
+        _archive = FixtureArchive()
+    return _archive
+
+
+def _missing(archive, method, url):
+    return f"No recorded exchange for {method.upper()} {url} in {archive.path}"
+
+
+# --- requests ---
+class RecordingAdapter(HTTPAdapter):
+    """Sends requests to the network and stores every exchange"""
+
+    def __init__(self, archive, **kwargs):
+        super().__init__(**kwargs)
+        self.archive = archive
+
+    def send(self, request, **kwargs):
+        start = time.perf_counter()
+        response = super().send(request, **kwargs)
+        content = response.content
+        self.archive.record(request.method, request.url, request.body, response.status_code, response.reason,
+                            response.headers, content, time.perf_counter() - start)
+        return response
+
+
+def build_response(request, status, reason, headers, body, elapsed=None):
+    """A requests.Response for a stored exchange, as an adapter's send() returns it"""
+    response = requests.Response()
+    response.status_code = status
+    response.reason = reason
+    response.headers = CaseInsensitiveDict(headers)
+    response.encoding = get_encoding_from_headers(response.headers)
+    response._content = body
+    response.url = request.url
+    response.request = request
+    response.elapsed = timedelta(seconds=elapsed or 0)
+    return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """Answers requests from the fixture archive without touching the network"""
+
+    def __init__(self, archive):
+        super().__init__()
+        self.archive = archive
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        exchange = self.archive.replay(request.method, request.url, request.body)
+        if exchange is None:
+            raise requests.exceptions.ConnectionError(_missing(self.archive, request.method, request.url), request=request)
+        if exchange.delay:
+            time.sleep(exchange.delay)
+        return build_response(request, exchange.status, exchange.reason, exchange.headers, exchange.body,
+                              exchange.elapsed)
+
+    def close(self):
+        pass
+
+
+def install_fixtures(session):
+    """Route a requests.Session through the fixture archive when TX_PERMIT_HTTP_MODE is set; returns it"""
+    if HTTP_MODE == 'record':
+        adapter = RecordingAdapter(fixture_archive())
+    elif HTTP_MODE == 'replay':
+        adapter = ReplayAdapter(fixture_archive())
+    else:
+        return session
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    print(f"[INFO] HTTP {HTTP_MODE} mode using {FIXTURE_FILE}")
+    return session
+
+
+# --- aiohttp ---
+class ReplayedResponse:
+    """The parts of aiohttp.ClientResponse the fetchers use, backed by a recorded exchange"""
+
+    def __init__(self, exchange):
+        self.status = exchange.status
+        self.reason = exchange.reason
+        self.headers = CaseInsensitiveDict(exchange.headers)
+        self.url = exchange.url
+        self._body = exchange.body
+
+    async def read(self):
+        return self._body
+
+    async def text(self, encoding=None):
+        return self._body.decode(encoding or get_encoding_from_headers(self.headers) or 'utf-8', 'replace')
+
+    async def json(self, **kwargs):
+        return json.loads(self._body)
+
+    def release(self):
+        pass
+
+
+class _ExchangeContext:
+    """`async with session.get(...)` for FixtureClientSession"""
+
+    def __init__(self, owner, method, url, kwargs):
+        self.owner = owner
+        self.method = method
+        self.url = url
+        self.kwargs = kwargs
+        self._live = None
+
+    async def __aenter__(self):
+        archive = self.owner.archive
+        body = self.kwargs.get('data')
+        if self.owner.mode == 'replay':
+            exchange = archive.replay(self.method, self.url, body)
+            if exchange is None:
+                raise aiohttp.ClientConnectionError(_missing(archive, self.method, self.url))
+            if exchange.delay:
+                await asyncio.sleep(exchange.delay)
+            return ReplayedResponse(exchange)
+
+        start = time.perf_counter()
+        self._live = self.owner.session.request(self.method, self.url, **self.kwargs)
+        response = await self._live.__aenter__()
+        content = await response.read()
+        archive.record(self.method, self.url, body, response.status, response.reason, response.headers,
+                       content, time.perf_counter() - start)
+        return response
+
+    async def __aexit__(self, *exc_info):
+        if self._live is not None:
+            return await self._live.__aexit__(*exc_info)
+        return False
+
+
+class FixtureClientSession:
+    """Wraps an aiohttp.ClientSession so get/post/request are recorded or replayed"""
+
+    def __init__(self, session, mode, archive):
+        self.session = session
+        self.mode = mode
+        self.archive = archive
+
+    def request(self, method, url, **kwargs):
+        return _ExchangeContext(self, method, url, kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    async def close(self):
+        await self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+def fixture_client_session(session):
+    """Wrap an aiohttp.ClientSession for TX_PERMIT_HTTP_MODE; returned unchanged when the mode is not set"""
+    if HTTP_MODE not in ('record', 'replay'):
+        return session
+    print(f"[INFO] HTTP {HTTP_MODE} mode using {FIXTURE_FILE}")
+    return FixtureClientSession(session, HTTP_MODE, fixture_archive())
+
+
+if __name__ == "__main__":
+    # Usage: python http_fixtures.py [fixture file]  - lists the recorded exchanges per endpoint
+    archive = FixtureArchive(sys.argv[1] if len(sys.argv) > 1 else FIXTURE_FILE)
+    rows = archive.summary()
+    if not rows:
+        print(f"[INFO] No exchanges recorded in {archive.path}")
+    for method, endpoint, count, size, elapsed in rows:
+        print(f"{method:6} {endpoint:60} {count:7} exchanges {size / 1e6:8.2f} MB  mean {elapsed * 1000:7.1f} ms")
@@ -0,0 +1,134 @@
+import contextlib
+import hashlib
+import json
+import os
+import time
+import zlib
+
+from requests.adapters import BaseAdapter
+
+import metrics
+from http_fixtures import DROPPED_HEADERS, HTTP_MODE, build_response, request_key
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; entries are then shared without the fetch lock
+    fcntl = None
+
+# --- Settings ---
+LISTING_CACHE_FOLDER = os.getenv('TX_PERMIT_LISTING_CACHE', os.path.join('output_data', 'listing_cache'))
+LISTING_CACHE_TTL = float(os.getenv('TX_PERMIT_LISTING_CACHE_TTL', '300'))  # Seconds a listing page is reused; 0 disables
+PURGE_AFTER = 24 * 3600  # Entry files older than this are deleted when a session installs the cache
+SEARCH_URL = 'https://www.tdlr.texas.gov/TABS/Search/SearchProjects'
+
+
+class ListingCache:
+    """SearchProjects responses shared through files, so scripts running close together list once.
+
+    Entries are keyed by the normalized form payload (which includes the offset and page
+    size; see http_fixtures.request_key) and expire after `ttl` seconds. A per-key file lock
+    is held while the page is fetched, so a second process asking for the same page waits
+    for the first one's response instead of sending its own request.
+    """
+
+    def __init__(self, folder=LISTING_CACHE_FOLDER, ttl=LISTING_CACHE_TTL):
+        self.folder = folder
+        self.ttl = ttl
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, key, suffix):
+        return os.path.join(self.folder, hashlib.sha1(key.encode('utf-8')).hexdigest() + suffix)
+
+    @contextlib.contextmanager
+    def lock(self, key):
+        """Exclusive lock on one entry across processes (a no-op without fcntl)"""
+        if fcntl is None:
+            yield
+            return
+        with open(self._path(key, '.lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def get(self, key):
+        """(status, reason, headers, body) if a fresh entry exists, else None"""
+        path = self._path(key, '.entry')
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, 'rb') as f:
+                meta = json.loads(f.readline())
+                body = zlib.decompress(f.read())
+        except (OSError, ValueError, zlib.error):
+            return None
+        return meta['status'], meta['reason'], meta['headers'], body
+
+    def put(self, key, status, reason, headers, body):
+        headers = {name: value for name, value in headers.items() if name.lower() not in DROPPED_HEADERS}
+        path = self._path(key, '.entry')
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(json.dumps({'key': key, 'status': status, 'reason': reason, 'headers': headers}).encode('utf-8'))
+            f.write(b'\n')
+            f.write(zlib.compress(body, 6))
+        os.replace(tmp_path, path)
+
+    def purge(self, max_age=PURGE_AFTER):
+        """Delete entries (and their lock files) not written for `max_age` seconds; returns the count"""
+        removed = 0
+        cutoff = time.time() - max_age
+        for name in os.listdir(self.folder):
+            path = os.path.join(self.folder, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+
+class ListingCacheAdapter(BaseAdapter):
+    """Answers SearchProjects POSTs from the ListingCache, sending misses through the wrapped adapter"""
+
+    def __init__(self, inner, cache):
+        super().__init__()
+        self.inner = inner
+        self.cache = cache
+
+    def send(self, request, **kwargs):
+        if request.method != 'POST':
+            return self.inner.send(request, **kwargs)
+        key = request_key(request.method, request.url, request.body)
+        with self.cache.lock(key):
+            entry = self.cache.get(key)
+            if entry is not None:
+                metrics.LISTING_CACHE.inc(result='hit')
+                return build_response(request, *entry)
+            metrics.LISTING_CACHE.inc(result='miss')
+            response = self.inner.send(request, **kwargs)
+            if response.status_code == 200:
+                self.cache.put(key, response.status_code, response.reason, response.headers, response.content)
+            return response
+
+    def close(self):
+        self.inner.close()
+
+
+def install_listing_cache(session, url=SEARCH_URL, ttl=LISTING_CACHE_TTL):
+    """Serve a requests.Session's listing POSTs from the shared cache; returns the session.
+
+    Not installed while TX_PERMIT_HTTP_MODE is set: a cache hit would never reach the fixture
+    adapter, so the page would be missing from a recording and a replay would skip its timing.
+    """
+    if ttl <= 0:
+        return session
+    if HTTP_MODE in ('record', 'replay'):
+        print(f"[INFO] Listing cache disabled in HTTP {HTTP_MODE} mode")
+        return session
+    cache = ListingCache(ttl=ttl)
+    cache.purge()
+    session.mount(url, ListingCacheAdapter(session.get_adapter(url), cache))
+    return session
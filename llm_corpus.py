@@ -0,0 +1,155 @@
+import hashlib
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Settings ---
+TOKEN_BUDGET = 8000  # Maximum estimated tokens per chunk file
+CHARS_PER_TOKEN = 4  # Rough token estimate for English prose
+GROUP_BY = 'county'  # 'county', 'month', 'date' or None for a single group
+COLLAPSE_CLUSTERS = False  # Set to True to refer near-duplicate scopes (same cluster_id) back to the first one in a chunk; lossy, as clusters are approximate
+WRITE_WORKERS = 4  # Threads writing finished chunks
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (about CHARS_PER_TOKEN characters per token)"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _scope_key(scope):
+    normalized = ' '.join(scope.split()).lower()
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).digest()
+
+
+def _group_key(record, group_by):
+    if group_by == 'county':
+        return record.county_name
+    if group_by == 'month':
+        return record.month or 'unknown'
+    if group_by == 'date':
+        return record.date_str
+    return 'all'
+
+
+def _safe_name(value):
+    return re.sub(r'[^A-Za-z0-9_-]+', '_', str(value)).strip('_') or 'unknown'
+
+
+class _ChunkBuilder:
+    """Accumulates lines for one group until the token budget is reached.
+
+    Identical scopes inside a chunk are written once with a tag ([S1], [S2], ...) and later
+    occurrences refer back to it, so every chunk stays self-contained. With collapse_clusters,
+    scopes in the same near-duplicate cluster are referred back the same way.
+    """
+
+    def __init__(self, group, header, collapse_clusters=False):
+        self.group = group
+        self.header = header
+        self.collapse_clusters = collapse_clusters
+        self.index = 0
+        self._reset()
+
+    def _reset(self):
+        self.lines = [self.header]
+        self.tokens = estimate_tokens(self.header)
+        self.scope_tags = {}
+        self.cluster_tags = {}
+        self.records = 0
+
+    def add(self, project_number, scope, token_budget, cluster_id=None):
+        """Add a record; returns a finished (group, index, lines, stats) chunk if one was closed"""
+        finished = None
+        line, tag = self._format(project_number, scope, cluster_id)
+        line_tokens = estimate_tokens(line)
+        if self.records and self.tokens + line_tokens > token_budget:
+            finished = self.close()
+            line, tag = self._format(project_number, scope, cluster_id)
+            line_tokens = estimate_tokens(line)
+        if tag is not None:
+            scope_key, tag_name = tag
+            self.scope_tags[scope_key] = tag_name
+            if cluster_id is not None:
+                self.cluster_tags.setdefault(cluster_id, tag_name)
+        self.lines.append(line)
+        self.tokens += line_tokens
+        self.records += 1
+        return finished
+
+    def _format(self, project_number, scope, cluster_id=None):
+        scope_key = _scope_key(scope)
+        existing = self.scope_tags.get(scope_key)
+        if existing is not None:
+            return f"Project: {project_number}, Scope: [same as {existing}]", None
+        if self.collapse_clusters and cluster_id is not None:
+            existing = self.cluster_tags.get(cluster_id)
+            if existing is not None:
+                return f"Project: {project_number}, Scope: [similar to {existing}]", None
+        tag_name = f"S{len(self.scope_tags) + 1}"
+        return f"Project: {project_number}, Scope [{tag_name}]: {scope}", (scope_key, tag_name)
+
+    def close(self):
+        if not self.records:
+            return None
+        self.index += 1
+        finished = (self.group, self.index, self.lines,
+                    {'records': self.records, 'unique_scopes': len(self.scope_tags), 'tokens': self.tokens})
+        self._reset()
+        return finished
+
+
+def _write_chunk(path, lines):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines))
+        f.write('\n')
+    return path
+
+
+def build_corpus(records, output_prefix, group_by=GROUP_BY, token_budget=TOKEN_BUDGET, workers=WRITE_WORKERS,
+                 collapse_clusters=COLLAPSE_CLUSTERS):
+    """Stream records into token-budgeted, de-duplicated chunk files.
+
+    Chunks are grouped by `group_by` and written as `{output_prefix}_{group}_{n:03d}.txt` by a
+    thread pool while later records are still being read. A `{output_prefix}_manifest.json`
+    lists every chunk. Returns the manifest entries.
+    """
+    builders = {}
+    seen_projects = set()
+    manifest = []
+    futures = []
+
+    def submit(finished):
+        group, index, lines, stats = finished
+        path = f"{output_prefix}_{_safe_name(group)}_{index:03d}.txt"
+        manifest.append(dict(stats, group=group, path=path))
+        futures.append(pool.submit(_write_chunk, path, lines))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for record in records:
+            project_number = record.project_number or 'N/A'
+            if record.project_number:
+                if project_number in seen_projects:
+                    continue
+                seen_projects.add(project_number)
+            scope = record.scope_of_work if record.scope_of_work is not None else 'N/A'
+
+            group = _group_key(record, group_by)
+            builder = builders.get(group)
+            if builder is None:
+                header = f"# Projects for {group_by}: {group}" if group_by else "# Projects"
+                builder = builders[group] = _ChunkBuilder(group, header, collapse_clusters)
+            finished = builder.add(project_number, scope, token_budget, record.cluster_id)
+            if finished:
+                submit(finished)
+
+        for builder in builders.values():
+            finished = builder.close()
+            if finished:
+                submit(finished)
+
+        for future in futures:
+            future.result()
+
+    with open(f"{output_prefix}_manifest.json", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
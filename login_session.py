@@ -2,6 +2,7 @@ import os
 import requests
 from http.cookiejar import MozillaCookieJar
 from dotenv import load_dotenv
+from profiling import enable_profiling, stage
 
 # Load credentials from .env
 load_dotenv()
@@ -51,8 +52,11 @@ def login_if_needed():
     else:
         print("[INFO] Already logged in using saved cookies.")
 
+enable_profiling('login_session')
+
 # Run login check
-login_if_needed()
+with stage('login'):
+    login_if_needed()
 
 # Now access a protected page
 response = session.get(DASHBOARD_URL)
@@ -0,0 +1,211 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- Settings ---
+METRICS_PORT = os.getenv('TX_PERMIT_METRICS_PORT')  # e.g. 9108; serves /metrics on localhost
+METRICS_FILE = os.getenv('TX_PERMIT_METRICS_FILE')  # e.g. output_data/metrics.prom
+METRICS_FILE_INTERVAL = 15  # Seconds between metrics file writes
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_registry = []
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, '')) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, key)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels"""
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        for key, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class Gauge(Counter):
+    """Value that can go up and down (queue depth, in-flight requests)"""
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with _lock:
+            self.values[key] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram:
+    """Latency histogram with cumulative buckets, count and sum"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.values = {}  # label key -> [bucket counts..., count, sum]
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with _lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [0] * len(self.buckets) + [0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        for key, state in self.values.items():
+            for bound, count in zip(self.buckets, state):
+                labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                yield f"{self.name}_bucket{labels} {count}"
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            yield f"{self.name}_bucket{labels} {state[-2]}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-2]}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {state[-1]}"
+
+
+# --- Crawler metrics ---
+HTTP_REQUESTS = Counter('tabs_http_requests_total', 'HTTP requests to TDLR by endpoint and status',
+                        ('endpoint', 'status'))
+HTTP_RESPONSE_BYTES = Counter('tabs_http_response_bytes_total', 'Response body bytes received', ('endpoint',))
+HTTP_LATENCY = Histogram('tabs_http_request_seconds', 'HTTP request latency', ('endpoint',))
+HTTP_IN_FLIGHT = Gauge('tabs_http_in_flight', 'HTTP requests currently in flight', ('endpoint',))
+CONCURRENCY_WAIT = Histogram('tabs_concurrency_wait_seconds', 'Time spent waiting for a concurrency slot',
+                             ('endpoint',))
+PARSE_SECONDS = Histogram('tabs_parse_seconds', 'Time spent parsing responses', ('stage',))
+CHECKPOINT_SECONDS = Histogram('tabs_checkpoint_seconds', 'Time spent writing checkpoints')
+QUEUE_DEPTH = Gauge('tabs_queue_depth', 'Projects waiting to be processed', ('queue',))
+LISTING_CACHE = Counter('tabs_listing_cache_total', 'Listing requests answered from the shared cache (hit) '
+                        'or sent to TDLR (miss)', ('result',))
+SINGLE_FLIGHT = Counter('tabs_single_flight_total', 'Coalesced calls: leaders ran the work, followers shared it',
+                        ('flight', 'role'))
+
+
+def record_response(endpoint, status, size):
+    """Count one completed HTTP exchange"""
+    HTTP_REQUESTS.inc(endpoint=endpoint, status=status)
+    if size:
+        HTTP_RESPONSE_BYTES.inc(size, endpoint=endpoint)
+
+
+def render_prometheus():
+    """All registered metrics in the Prometheus text exposition format"""
+    lines = []
+    with _lock:
+        for metric in _registry:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host='127.0.0.1'):
+    """Serve /metrics from a daemon thread; returns the server"""
+    server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"[INFO] Metrics available at http://{host}:{port}/metrics")
+    return server
+
+
+def write_metrics_file(path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
+
+
+def start_metrics_file_writer(path, interval=METRICS_FILE_INTERVAL):
+    """Rewrite `path` every `interval` seconds from a daemon thread"""
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                write_metrics_file(path)
+            except OSError as e:
+                print(f"[WARNING] Could not write metrics file {path}: {e}")
+
+    threading.Thread(target=loop, daemon=True).start()
+    print(f"[INFO] Metrics will be written to {path} every {interval}s")
+
+
+def start_metrics():
+    """Start whichever exporters are configured via TX_PERMIT_METRICS_PORT / TX_PERMIT_METRICS_FILE"""
+    if METRICS_PORT:
+        try:
+            start_metrics_server(METRICS_PORT)
+        except OSError as e:
+            print(f"[WARNING] Could not start metrics server on port {METRICS_PORT}: {e}")
+    if METRICS_FILE:
+        start_metrics_file_writer(METRICS_FILE)
+
+
+def flush_metrics():
+    """Write the metrics file one last time (call at the end of a run)"""
+    if METRICS_FILE:
+        try:
+            write_metrics_file(METRICS_FILE)
+        except OSError as e:
+            print(f"[WARNING] Could not write metrics file {METRICS_FILE}: {e}")
@@ -0,0 +1,188 @@
+import json
+import textwrap
+from itertools import islice
+
+# --- Settings ---
+TABLE_BLOCK_ROWS = 50  # Rows rendered per output piece; column widths are fixed from the first block
+# Widest a table column may get; longer cells wrap onto more lines
+TABLE_MAX_WIDTHS = {'Project Name': 40, 'Facility': 40, 'City': 20, 'County': 20, 'Scope': 60}
+FLUSH_EVERY = 100  # Rows written between flushes of the output streams
+DEFAULT_PAGE_SIZE = 100
+
+OUTPUT_FORMATS = ('table', 'json', 'jsonl', 'simple', 'detailed')
+
+
+def select_rows(records, limit=None, page=None, page_size=DEFAULT_PAGE_SIZE):
+    """Apply paging (1-based `page` of `page_size` rows) and an overall row limit to an iterable.
+
+    Yields (row_number, record) pairs, where row_number is the 1-based position in the
+    full result so page 3 keeps numbering from where page 2 stopped.
+    """
+    start = (page - 1) * page_size if page else 0
+    stop = start + page_size if page else None
+    if limit is not None:
+        stop = min(stop, limit) if stop is not None else limit
+    return enumerate(islice(records, start, stop), start + 1)
+
+
+def iter_simple(rows):
+    for i, item in rows:
+        yield f"{i}. {item.project_number or 'N/A'} - {item.project_name or 'N/A'}\n"
+
+
+def iter_detailed(rows):
+    for i, item in rows:
+        record = item.to_dict()
+        yield (f"\n{'=' * 80}\n"
+               f"PROJECT {i}\n"
+               f"{'=' * 80}\n"
+               f"Project Number: {record['ProjectNumber']}\n"
+               f"Project Name: {record['ProjectName']}\n"
+               f"Date: {record['Date']}\n"
+               f"Facility Name: {record['FacilityName']}\n"
+               f"City: {record['City']}\n"
+               f"County: {record['County']}\n"
+               f"Scope of Work: {record['ScopeOfWork']}\n")
+
+
+def iter_json_lines(rows):
+    """One JSON object per line (JSON Lines)"""
+    for _, item in rows:
+        yield json.dumps(item.to_dict(), ensure_ascii=False) + "\n"
+
+
+def iter_json_array(rows):
+    """A single indented JSON array, emitted one element at a time"""
+    yield "["
+    first = True
+    for _, item in rows:
+        element = json.dumps(item.to_dict(), indent=2, ensure_ascii=False).replace("\n", "\n  ")
+        yield ("\n  " if first else ",\n  ") + element
+        first = False
+    yield "]\n" if first else "\n]\n"
+
+
+TABLE_HEADERS = ('No.', 'Project #', 'Project Name', 'Date', 'Facility', 'City', 'County', 'Scope')
+
+
+def _table_cells(i, item):
+    return (str(i), item.project_number or 'N/A', str(item.project_name or 'N/A'), item.date_str,
+            str(item.facility_name or 'N/A'), item.city_name, item.county_name,
+            str(item.scope_of_work if item.scope_of_work is not None else 'N/A'))
+
+
+def _table_widths(block):
+    widths = []
+    for column, header in enumerate(TABLE_HEADERS):
+        width = max([len(header)] + [len(line) for cells in block for line in cells[column].splitlines() or ['']])
+        widths.append(min(width, TABLE_MAX_WIDTHS.get(header, width)))
+    return widths
+
+
+def _grid_border(widths, fill='-'):
+    return '+' + '+'.join(fill * (width + 2) for width in widths) + '+\n'
+
+
+def _grid_row(cells, widths, right_align=()):
+    columns = []
+    for column, (cell, width) in enumerate(zip(cells, widths)):
+        lines = []
+        for line in cell.splitlines() or ['']:
+            lines.extend(textwrap.wrap(line, width, break_long_words=True) or [''])
+        columns.append(lines)
+    height = max(len(lines) for lines in columns)
+    text = ''
+    for row in range(height):
+        parts = []
+        for column, (lines, width) in enumerate(zip(columns, widths)):
+            line = lines[row] if row < len(lines) else ''
+            parts.append(line.rjust(width) if column in right_align else line.ljust(width))
+        text += '| ' + ' | '.join(parts) + ' |\n'
+    return text
+
+
+def _render_block(block, widths, header):
+    text = ''
+    if header:
+        text = _grid_border(widths) + _grid_row(TABLE_HEADERS, widths) + _grid_border(widths, '=')
+    for cells in block:
+        text += _grid_row(cells, widths, right_align=(0,)) + _grid_border(widths)
+    return text
+
+
+def iter_table(rows, block_rows=TABLE_BLOCK_ROWS):
+    """One grid table, yielded in blocks of `block_rows` rows.
+
+    Column widths are taken from the first block (capped by TABLE_MAX_WIDTHS) and kept for
+    the rest, so the header is rendered once and every block lines up with it; a longer
+    cell in a later block wraps instead of widening its column.
+    """
+    widths = None
+    block = []
+    for i, item in rows:
+        block.append(_table_cells(i, item))
+        if len(block) >= block_rows:
+            first = widths is None
+            if first:
+                widths = _table_widths(block)
+            yield _render_block(block, widths, header=first)
+            block = []
+    if block or widths is None:
+        first = widths is None
+        yield _render_block(block, widths or _table_widths(block), header=first)
+
+
+_FORMAT_WRITERS = {
+    'table': iter_table,
+    'json': iter_json_array,
+    'jsonl': iter_json_lines,
+    'simple': iter_simple,
+    'detailed': iter_detailed,
+}
+
+
+class CountedRows:
+    """Iterator over (row_number, record) pairs that counts how many have been consumed"""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = next(self._rows)
+        self.count += 1
+        return row
+
+
+def iter_output(records, format_type, limit=None, page=None, page_size=DEFAULT_PAGE_SIZE, rows=None):
+    """Yield the formatted output piece by piece; unknown formats fall back to 'table'.
+
+    `rows` replaces the selected rows, e.g. a CountedRows wrapped around select_rows().
+    """
+    writer = _FORMAT_WRITERS.get(format_type, iter_table)
+    if rows is None:
+        rows = select_rows(records, limit=limit, page=page, page_size=page_size)
+    return writer(rows)
+
+
+def write_output(records, format_type, streams, limit=None, page=None, page_size=DEFAULT_PAGE_SIZE,
+                 flush_every=FLUSH_EVERY):
+    """Stream formatted records to every stream in `streams` (e.g. stdout and a file) in one pass.
+
+    Returns the number of records written.
+    """
+    rows = CountedRows(select_rows(records, limit=limit, page=page, page_size=page_size))
+    pieces = 0
+    for piece in iter_output(records, format_type, rows=rows):
+        for stream in streams:
+            stream.write(piece)
+        pieces += 1
+        if pieces == 1 or pieces % flush_every == 0:
+            for stream in streams:
+                stream.flush()
+    for stream in streams:
+        stream.flush()
+    return rows.count
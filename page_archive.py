@@ -0,0 +1,313 @@
+import asyncio
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from compression import MIN_TRAINING_SAMPLES, DictionaryRegistry
+from detail_extractor import PARSER_VERSION, extract_details
+from profiling import enable_profiling, stage
+from record_store import glob_records, load_records, write_records
+
+# --- Settings ---
+PAGE_ARCHIVE_DB = os.getenv('TX_PERMIT_PAGE_ARCHIVE', os.path.join('output_data', 'page_archive.db'))
+ARCHIVE_PAGES = os.getenv('TX_PERMIT_ARCHIVE_PAGES', '1') != '0'  # Set to 0 to stop the fetchers archiving pages
+PAGE_DICTIONARY = 'pages'
+TRAIN_AFTER_PAGES = 200  # Pages stored with plain zlib before the first dictionary is trained
+RETRAIN_CHECK_EVERY = 500  # Pages between compression-ratio checks against the current dictionary
+REEXTRACT_WORKERS = os.cpu_count() or 4
+REEXTRACT_BATCH = 100  # Pages per task handed to a worker process
+BUSY_TIMEOUT = 30  # Seconds to wait for another process's write lock
+RECORD_FILES = ['project_scopes.records', os.path.join('output_data', 'project_report_data_*.records')]
+
+PLAIN_ZLIB = 0  # dictionary_version of pages compressed without a dictionary
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    project_number TEXT PRIMARY KEY,
+    fetched REAL,
+    dictionary_version INTEGER NOT NULL,
+    body BLOB NOT NULL,
+    raw_size INTEGER,
+    parser_version INTEGER,
+    details BLOB,
+    extracted REAL
+);
+CREATE INDEX IF NOT EXISTS pages_parser ON pages (parser_version);
+"""
+
+_registry = None
+
+
+def _page_registry():
+    global _registry
+    if _registry is None:
+        _registry = DictionaryRegistry(PAGE_DICTIONARY)
+    return _registry
+
+
+def decode_page(dictionary_version, body):
+    """HTML of an archived page"""
+    if dictionary_version == PLAIN_ZLIB:
+        raw = zlib.decompress(body)
+    else:
+        raw = _page_registry().get(dictionary_version).decompress(body)
+    return raw.decode('utf-8')
+
+
+class PageArchive:
+    """Raw detail pages, kept next to the parsed records so parsers can be re-run offline.
+
+    Each page is stored compressed (with the 'pages' dictionary once enough pages exist to
+    train one) together with the parser version and the details extracted from it. When
+    detail_extractor.PARSER_VERSION is bumped, reextract() re-parses only the pages whose
+    stored version differs.
+    """
+
+    def __init__(self, path=PAGE_ARCHIVE_DB):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        # The fetcher hook may write from the archive writer thread (see archive_page_async)
+        self.conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        self.conn.executescript(_SCHEMA)
+        self.registry = _page_registry()
+        self._dictionary = self.registry.current()
+        self._recent = deque(maxlen=MIN_TRAINING_SAMPLES * 4)  # Raw pages for ratio checks and retraining
+        self._since_check = 0
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+
+    def _encode(self, raw):
+        if self._dictionary is None:
+            return PLAIN_ZLIB, zlib.compress(raw, 6)
+        return self._dictionary.version, self._dictionary.compress(raw)
+
+    def _maybe_train(self):
+        """Train the first dictionary from archived pages, or retrain if the ratio dropped"""
+        if self._dictionary is None:
+            if self.conn.execute('SELECT COUNT(*) FROM pages').fetchone()[0] < TRAIN_AFTER_PAGES:
+                return
+            rows = self.conn.execute(
+                'SELECT dictionary_version, body FROM pages ORDER BY RANDOM() LIMIT ?', (TRAIN_AFTER_PAGES,))
+            samples = [decode_page(version, body).encode('utf-8') for version, body in rows]
+            self._dictionary = self.registry.current_or_train(samples)
+        elif len(self._recent) >= MIN_TRAINING_SAMPLES:
+            samples = list(self._recent)
+            self._dictionary = self.registry.observe(self._dictionary, self._dictionary.measure(samples), samples)
+
+    def store(self, project_number, html, details=None, parser_version=PARSER_VERSION):
+        """Archive a page (replacing an older copy) with the details parsed from it"""
+        raw = html.encode('utf-8')
+        dictionary_version, body = self._encode(raw)
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO pages (project_number, fetched, dictionary_version, body, raw_size, '
+                'parser_version, details, extracted) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (project_number, now, dictionary_version, body, len(raw),
+                 parser_version if details is not None else None,
+                 pickle.dumps(details, pickle.HIGHEST_PROTOCOL) if details is not None else None,
+                 now if details is not None else None))
+        self._recent.append(raw)
+        self._since_check += 1
+        if (self._dictionary is None and self._since_check >= TRAIN_AFTER_PAGES // 4) \
+                or self._since_check >= RETRAIN_CHECK_EVERY:
+            self._since_check = 0
+            self._maybe_train()
+
+    def page(self, project_number):
+        """HTML of an archived page, or None"""
+        row = self.conn.execute('SELECT dictionary_version, body FROM pages WHERE project_number = ?',
+                                (project_number,)).fetchone()
+        return decode_page(*row) if row else None
+
+    def details(self, project_numbers=None):
+        """{project_number: details} for archived pages that have been parsed"""
+        rows = self.conn.execute('SELECT project_number, details FROM pages WHERE details IS NOT NULL')
+        wanted = set(project_numbers) if project_numbers is not None else None
+        return {number: pickle.loads(blob) for number, blob in rows if wanted is None or number in wanted}
+
+    def stale(self, parser_version=PARSER_VERSION):
+        """Project numbers whose pages were not parsed with `parser_version`"""
+        rows = self.conn.execute(
+            'SELECT project_number FROM pages WHERE parser_version IS NULL OR parser_version != ?',
+            (parser_version,))
+        return [number for number, in rows]
+
+    def summary(self):
+        """(pages, raw bytes, stored bytes, {parser_version: pages})"""
+        pages, raw, stored = self.conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(LENGTH(body)), 0) FROM pages').fetchone()
+        versions = dict(self.conn.execute('SELECT parser_version, COUNT(*) FROM pages GROUP BY parser_version'))
+        return pages, raw, stored, versions
+
+    def _save_extracted(self, results, parser_version):
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                'UPDATE pages SET details = ?, parser_version = ?, extracted = ? WHERE project_number = ?',
+                [(blob, parser_version, now, number) for number, blob in results])
+
+    def reextract(self, workers=REEXTRACT_WORKERS, batch_size=REEXTRACT_BATCH):
+        """Re-parse every stale page with the current extractor in a process pool; returns the count.
+
+        Runs incrementally: a page is marked with PARSER_VERSION as soon as its batch is
+        done, so an interrupted run resumes where it stopped.
+        """
+        numbers = self.stale()
+        if not numbers:
+            return 0
+        batches = [numbers[i:i + batch_size] for i in range(0, len(numbers), batch_size)]
+        print(f"[INFO] Re-extracting {len(numbers)} pages with parser v{PARSER_VERSION} "
+              f"({len(batches)} batches, {workers} workers)")
+        done = 0
+        failed = 0
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            batches = iter(batches)
+            while True:
+                # Keep a bounded number of batches in flight so only those pages are held in memory
+                while len(pending) < workers * 2:
+                    batch = next(batches, None)
+                    if batch is None:
+                        break
+                    placeholders = ','.join('?' * len(batch))
+                    rows = self.conn.execute(
+                        f'SELECT project_number, dictionary_version, body FROM pages '
+                        f'WHERE project_number IN ({placeholders})', batch).fetchall()
+                    pending.add(executor.submit(_extract_batch, rows))
+                if not pending:
+                    break
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    results, errors = future.result()
+                    with stage('checkpoint'):
+                        self._save_extracted(results, PARSER_VERSION)
+                    done += len(results)
+                    failed += len(errors)
+                    for number, error in errors:
+                        print(f"[WARNING] Could not re-extract {number}: {error}")
+                print(f"[INFO] Re-extracted {done}/{len(numbers)} pages")
+        if failed:
+            print(f"[WARNING] {failed} pages failed; they stay stale and are retried on the next run")
+        return done
+
+
+def _extract_batch(rows):
+    """Worker: parse a batch of archived pages; returns ([(project_number, details blob)], errors)"""
+    results = []
+    errors = []
+    for number, dictionary_version, body in rows:
+        try:
+            details = extract_details(decode_page(dictionary_version, body))
+        except Exception as e:
+            errors.append((number, str(e)))
+            continue
+        results.append((number, pickle.dumps(details, pickle.HIGHEST_PROTOCOL)))
+    return results, errors
+
+
+def apply_details(archive, paths):
+    """Copy archived details (and the scope of work in them) onto the records in `paths`.
+
+    Only files with changed records are rewritten. Returns the number of records updated.
+    """
+    details_by_number = archive.details()
+    updated = 0
+    for path in paths:
+        records = load_records(path)
+        changed = 0
+        for record in records:
+            details = details_by_number.get(record.project_number)
+            if details is None or details == record.details:
+                continue
+            record.details = details
+            if details.get('scope_of_work'):
+                record.scope_of_work = details['scope_of_work']
+            changed += 1
+        if changed:
+            with stage('output'):
+                write_records(path, records)
+            print(f"[SUCCESS] Updated {changed} records in {path}")
+        updated += changed
+    return updated
+
+
+# --- Fetcher hook ---
+_default_archive = None
+_archive_lock = threading.Lock()
+_writer = None
+
+
+def archive_page(project_number, html, details=None):
+    """Archive a fetched detail page in this process's default archive (a no-op when disabled).
+
+    Never raises: a page that cannot be archived is logged, and the fetch still counts as done.
+    """
+    global _default_archive
+    if not ARCHIVE_PAGES or not project_number or not html:
+        return
+    try:
+        with _archive_lock:
+            if _default_archive is None:
+                _default_archive = PageArchive()
+            with stage('archive'):
+                _default_archive.store(project_number, html, details)
+    except Exception as e:
+        print(f"[WARNING] Could not archive page for {project_number}: {e}")
+
+
+def archive_page_async(project_number, html, details=None):
+    """archive_page() on a single writer thread, so an event loop is not blocked by SQLite writes; awaitable"""
+    global _writer
+    if _writer is None:
+        _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='page_archive')
+    return asyncio.get_running_loop().run_in_executor(_writer, archive_page, project_number, html, details)
+
+
+def record_files(patterns=RECORD_FILES):
+    paths = []
+    for pattern in patterns:
+        paths.extend(glob_records(pattern))
+    return paths
+
+
+def print_summary(archive):
+    pages, raw, stored, versions = archive.summary()
+    ratio = raw / stored if stored else 0.0
+    print(f"[INFO] {pages} archived pages, {raw / 1e6:.1f} MB raw, {stored / 1e6:.1f} MB stored (ratio {ratio:.2f})")
+    for version, count in sorted(versions.items(), key=lambda item: (item[0] is None, item[0] or 0)):
+        label = f"v{version}" if version is not None else 'not parsed'
+        marker = ' (current)' if version == PARSER_VERSION else ''
+        print(f"  parser {label}{marker}: {count} pages")
+
+
+if __name__ == "__main__":
+    # Usage: python page_archive.py [status | reextract [record files...]]
+    # reextract re-parses stale pages, then updates project_scopes.records and the by_date.py
+    # snapshots (or the given record files) with the new details.
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+    enable_profiling(f'page_archive_{command}')
+    archive = PageArchive()
+    if command == 'status':
+        print_summary(archive)
+    elif command == 'reextract':
+        with stage('parse'):
+            count = archive.reextract()
+        print(f"[SUCCESS] Re-extracted {count} pages" if count else "[INFO] Every archived page is up to date")
+        paths = sys.argv[2:] or record_files()
+        apply_details(archive, paths)
+    else:
+        print(f"[ERROR] Unknown command '{command}'; expected status or reextract.")
+        sys.exit(1)
@@ -1,181 +1,199 @@
-import pickle
 import os
-from tabulate import tabulate
+import sys
 from datetime import datetime
-import json
+from record_store import RecordStore, is_record_store, load_records, migrate_legacy
+from output_writers import DEFAULT_PAGE_SIZE, iter_output, write_output
+from record_stats import RecordStats, compute_stats
+from bitmap_index import BitmapIndex, iter_positions
+from profiling import enable_profiling, stage
 
 
 def print_pickle_search_data(filename,
                              filter_counties=None,
                              filter_terms=None,
+                             filter_cities=None,
+                             filter_types=None,
+                             filter_statuses=None,
+                             exclude=None,
                              output_format='table',
                              save_to_file=None,
-                             show_stats=True):
+                             show_stats=True,
+                             limit=None,
+                             page=None,
+                             page_size=DEFAULT_PAGE_SIZE):
     """
     Print the entire search data from a pickle file with optional filtering and formatting.
 
+    The record file is read one chunk at a time: a first pass filters each chunk and gathers
+    the counts and statistics, a second pass streams the matches to the output, so memory
+    stays bounded by one chunk however large the file or the result is.
+
     Args:
-        filename (str): Path to the pickle file
+        filename (str): Path to the record file
         filter_counties (list, optional): List of county names to filter by
         filter_terms (list, optional): List of terms to search in project names, facility names, and scope
-        output_format (str): Output format - 'table', 'json', 'simple', or 'detailed'
+        filter_cities (list, optional): List of city names to filter by
+        filter_types (list, optional): List of TypeOfWork values to filter by
+        filter_statuses (list, optional): List of ProjectStatus values to filter by
+        exclude (dict, optional): Values to leave out, e.g. {'status': ['Project Closed']}
+        output_format (str): Output format - 'table', 'json', 'jsonl', 'simple', or 'detailed'
         save_to_file (str, optional): If provided, save output to this file
         show_stats (bool): Whether to show statistics summary
+        limit (int, optional): Maximum number of rows to output
+        page (int, optional): 1-based page of `page_size` rows to output
+        page_size (int): Rows per page when `page` is given
     """
 
-    # Check if file exists
-    if not os.path.exists(filename):
+    # Check if file exists (converting a legacy .pkl file of the same name first)
+    if not os.path.exists(migrate_legacy(filename)):
         print(f"[ERROR] File {filename} not found.")
         return
 
     try:
-        # Load the pickle data
-        with open(filename, 'rb') as f:
-            data = pickle.load(f)
-
-        print(f"[INFO] Successfully loaded {len(data)} records from {filename}")
-
-        # Apply filters if specified
-        filtered_data = data
-
-        if filter_counties:
-            filtered_data = [item for item in filtered_data
-                             if item.get('County') in filter_counties]
-            print(f"[INFO] Filtered by counties {filter_counties}: {len(filtered_data)} records")
-
+        # Field filters are resolved per chunk with bitmap indexes (OR within a field, AND across fields)
+        include = {'county': filter_counties, 'city': filter_cities,
+                   'type_of_work': filter_types, 'status': filter_statuses}
+        total = field_matches = 0
+        stats = RecordStats()
+        with stage('filter'):
+            for chunk in iter_chunks(filename):
+                total += len(chunk)
+                chunk = filter_fields(chunk, include, exclude)
+                field_matches += len(chunk)
+                if filter_terms:
+                    chunk = [item for item in chunk if matches_terms(item, filter_terms)]
+                stats.merge(compute_stats(chunk))
+
+        print(f"[INFO] Successfully loaded {total} records from {filename}")
+        if any(include.values()) or exclude:
+            described = {field: values for field, values in include.items() if values}
+            if exclude:
+                described['exclude'] = exclude
+            print(f"[INFO] Filtered by {described}: {field_matches} records")
         if filter_terms:
-            def matches_terms(item):
-                search_text = f"{item.get('ProjectName', '')} {item.get('FacilityName', '')} {item.get('ScopeOfWork', '')}".lower()
-                return any(term.lower() in search_text for term in filter_terms)
-
-            filtered_data = [item for item in filtered_data if matches_terms(item)]
-            print(f"[INFO] Filtered by terms {filter_terms}: {len(filtered_data)} records")
+            print(f"[INFO] Filtered by terms {filter_terms}: {stats.total} records")
 
         # Show statistics if requested
         if show_stats:
-            print_statistics(filtered_data)
+            with stage('stats'):
+                print_statistics(stats)
 
-        # Format and display output
-        output_text = format_output(filtered_data, output_format)
-        print(output_text)
+        # Stream output to the console (and the file, if requested) in a single pass
+        if not stats.total:
+            print("[INFO] No data to display")
+            return
 
-        # Save to file if requested
+        filtered_data = iter_matches(filename, include, exclude, filter_terms)
+        output_kwargs = {'limit': limit, 'page': page, 'page_size': page_size}
         if save_to_file:
             try:
                 with open(save_to_file, 'w', encoding='utf-8') as f:
                     f.write(f"Search Data from: {filename}\n")
                     f.write(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                    f.write(f"Total records: {len(data)}\n")
-                    f.write(f"Filtered records: {len(filtered_data)}\n")
+                    f.write(f"Total records: {total}\n")
+                    f.write(f"Filtered records: {stats.total}\n")
                     if filter_counties:
                         f.write(f"County filter: {filter_counties}\n")
+                    if filter_cities:
+                        f.write(f"City filter: {filter_cities}\n")
+                    if filter_types:
+                        f.write(f"Type of work filter: {filter_types}\n")
+                    if filter_statuses:
+                        f.write(f"Status filter: {filter_statuses}\n")
+                    if exclude:
+                        f.write(f"Excluded: {exclude}\n")
                     if filter_terms:
                         f.write(f"Search terms: {filter_terms}\n")
                     f.write("\n" + "=" * 80 + "\n\n")
-                    f.write(output_text)
+                    with stage('output'):
+                        write_output(filtered_data, output_format, [sys.stdout, f], **output_kwargs)
                 print(f"[SUCCESS] Output saved to {save_to_file}")
             except Exception as e:
                 print(f"[ERROR] Failed to save to file: {e}")
+        else:
+            with stage('output'):
+                write_output(filtered_data, output_format, [sys.stdout], **output_kwargs)
 
     except Exception as e:
         print(f"[ERROR] Failed to load pickle file: {e}")
 
 
+def iter_chunks(filename):
+    """Record lists one chunk at a time (a legacy pickle comes back as a single chunk)"""
+    if is_record_store(filename):
+        yield from RecordStore(filename).iter_chunks()
+    else:
+        yield load_records(filename)
+
+
+def filter_fields(chunk, include, exclude=None):
+    """Records of one chunk matching the field filters, via a bitmap index over just that chunk"""
+    if not any(include.values()) and not exclude:
+        return chunk
+    rows = BitmapIndex(chunk).query(include, exclude)
+    return [chunk[row_id] for row_id in iter_positions(rows)]
+
+
+def iter_matches(filename, include, exclude=None, terms=None):
+    """Stream the records matching the field filters and search terms, chunk by chunk"""
+    for chunk in iter_chunks(filename):
+        for item in filter_fields(chunk, include, exclude):
+            if not terms or matches_terms(item, terms):
+                yield item
+
+
+def matches_terms(item, terms):
+    """True if any term occurs in the record's project name, facility name or scope (case-insensitive)"""
+    search_text = f"{item.project_name or ''} {item.facility_name or ''} {item.scope_of_work or ''}".lower()
+    return any(term.lower() in search_text for term in terms)
+
+
 def print_statistics(data):
-    """Print statistical summary of the data"""
-    if not data:
+    """Print statistical summary of the data (a list of records or a precomputed RecordStats)
+
+    Returns the RecordStats so callers can reuse the numbers.
+    """
+    stats = data if isinstance(data, RecordStats) else compute_stats(data)
+    if not stats.total:
         print("[INFO] No data to analyze")
-        return
+        return None
 
     print(f"\n{'=' * 50}")
     print(f"STATISTICS SUMMARY")
     print(f"{'=' * 50}")
-    print(f"Total records: {len(data)}")
+    print(f"Total records: {stats.total}")
 
     # County distribution
-    counties = {}
-    for item in data:
-        county = item.get('County', 'N/A')
-        counties[county] = counties.get(county, 0) + 1
-
-    if counties:
+    if stats.county_counts:
         print(f"\nCounty distribution:")
-        for county, count in sorted(counties.items(), key=lambda x: x[1], reverse=True):
+        for county, count in stats.county_counts.most_common():
             print(f"  {county}: {count}")
 
     # Date range
-    dates = []
-    for item in data:
-        date_str = item.get('Date')
-        if date_str and date_str != 'N/A':
-            dates.append(date_str)
-
-    if dates:
-        dates.sort()
-        print(f"\nDate range: {dates[0]} to {dates[-1]}")
+    if stats.min_date:
+        print(f"\nDate range: {stats.min_date.isoformat()} to {stats.max_date.isoformat()}")
 
     # Projects with scope vs without
-    with_scope = sum(1 for item in data if item.get('ScopeOfWork') and item.get('ScopeOfWork') != 'N/A')
-    print(f"\nProjects with scope of work: {with_scope} / {len(data)}")
+    print(f"\nProjects with scope of work: {stats.with_scope} / {stats.total}")
 
     print(f"{'=' * 50}\n")
+    return stats
+
 
+def format_output(data, format_type, limit=None, page=None, page_size=DEFAULT_PAGE_SIZE):
+    """Format the data according to the specified format as a single string.
 
-def format_output(data, format_type):
-    """Format the data according to the specified format"""
+    Prefer output_writers.write_output for large results; this builds the whole text in memory.
+    """
     if not data:
         return "[INFO] No data to display"
 
-    if format_type == 'json':
-        return json.dumps(data, indent=2, ensure_ascii=False)
-
-    elif format_type == 'simple':
-        output = []
-        for i, item in enumerate(data, 1):
-            output.append(f"{i}. {item.get('ProjectNumber', 'N/A')} - {item.get('ProjectName', 'N/A')}")
-        return '\n'.join(output)
-
-    elif format_type == 'detailed':
-        output = []
-        for i, item in enumerate(data, 1):
-            output.append(f"\n{'=' * 80}")
-            output.append(f"PROJECT {i}")
-            output.append(f"{'=' * 80}")
-            output.append(f"Project Number: {item.get('ProjectNumber', 'N/A')}")
-            output.append(f"Project Name: {item.get('ProjectName', 'N/A')}")
-            output.append(f"Date: {item.get('Date', 'N/A')}")
-            output.append(f"Facility Name: {item.get('FacilityName', 'N/A')}")
-            output.append(f"City: {item.get('City', 'N/A')}")
-            output.append(f"County: {item.get('County', 'N/A')}")
-            output.append(f"Scope of Work: {item.get('ScopeOfWork', 'N/A')}")
-        return '\n'.join(output)
-
-    else:  # table format (default)
-        table_data = []
-        for i, item in enumerate(data, 1):
-            # Truncate long text for table display
-            project_name = str(item.get('ProjectName', 'N/A'))
-
-            facility_name = str(item.get('FacilityName', 'N/A'))
-
-            scope = str(item.get('ScopeOfWork', 'N/A'))
-            table_data.append({
-                'No.': i,
-                'Project #': item.get('ProjectNumber', 'N/A'),
-                'Project Name': project_name,
-                'Date': item.get('Date', 'N/A'),
-                'Facility': facility_name,
-                'City': item.get('City', 'N/A'),
-                'County': item.get('County', 'N/A'),
-                'Scope': scope
-            })
-
-        return tabulate(table_data, headers='keys', tablefmt='grid')
+    return ''.join(iter_output(data, format_type, limit=limit, page=page, page_size=page_size))
 
 
 # Convenience functions for common use cases
 def print_all_projects(filename):
-    """Print all projects from pickle file in table format"""
+    """Print all projects from a record file in table format"""
     print_pickle_search_data(filename)
 
 
@@ -197,8 +215,10 @@ def search_projects(filename, search_terms):
 
 # Example usage
 if __name__ == "__main__":
-    # Example calls - replace with your actual pickle file path
-    pickle_file = "output_data/project_report_data_2025-11-25_cutoff_2025_11_17.pkl"
+    enable_profiling('print_out')
+
+    # Example calls - replace with your actual record file path
+    pickle_file = "output_data/project_report_data_2025-11-25_cutoff_2025_11_17.records"
 
     # Print all data
     # print_all_projects(pickle_file)
@@ -0,0 +1,197 @@
+import atexit
+import cProfile
+import contextvars
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# --- Settings ---
+PROFILE_MODE = os.getenv('TX_PERMIT_PROFILE')  # None (off), 'stages', 'cprofile' or 'sample'
+PROFILE_OUTPUT_FOLDER = os.getenv('TX_PERMIT_PROFILE_OUTPUT', os.path.join('output_data', 'profiles'))
+SAMPLE_INTERVAL = 0.005  # Seconds between stack samples in 'sample' mode
+TOP_FUNCTIONS = 25  # Functions listed from cProfile
+
+_current_path = contextvars.ContextVar('profiling_stage_path', default=())
+_stats_lock = threading.Lock()
+_stage_stats = {}  # stage path tuple -> [calls, wall, cpu, child_wall]
+
+
+@contextmanager
+def _noop_stage():
+    yield
+
+
+@contextmanager
+def _timed_stage(name):
+    parent = _current_path.get()
+    path = parent + (name,)
+    token = _current_path.set(path)
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.thread_time() - cpu_start
+        _current_path.reset(token)
+        with _stats_lock:
+            entry = _stage_stats.get(path)
+            if entry is None:
+                entry = _stage_stats[path] = [0, 0.0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += wall
+            entry[2] += cpu
+            if parent:
+                parent_entry = _stage_stats.get(parent)
+                if parent_entry is None:
+                    parent_entry = _stage_stats[parent] = [0, 0.0, 0.0, 0.0]
+                parent_entry[3] += wall
+
+
+def stage(name):
+    """Time a pipeline stage (listing, fetch, parse, lookup, checkpoint, output, ...).
+
+    Stages nest, and each asyncio task keeps its own stack. CPU time is per thread, so for
+    stages that await, it also includes other tasks interleaved on the same thread.
+    When profiling is off this is a no-op.
+    """
+    if PROFILE_MODE:
+        return _timed_stage(name)
+    return _noop_stage()
+
+
+def stage_summary():
+    """Rows of (stage path, calls, wall total, wall self, cpu total), slowest first"""
+    with _stats_lock:
+        rows = [(' > '.join(path), calls, wall, wall - child_wall, cpu)
+                for path, (calls, wall, cpu, child_wall) in _stage_stats.items()]
+    return sorted(rows, key=lambda row: row[2], reverse=True)
+
+
+def print_stage_summary():
+    rows = stage_summary()
+    if not rows:
+        print("[PROFILE] No stages recorded.")
+        return
+    width = max(len(row[0]) for row in rows)
+    print(f"\n{'=' * (width + 56)}")
+    print(f"{'Stage':<{width}}  {'Calls':>8}  {'Wall (s)':>10}  {'Self (s)':>10}  {'CPU (s)':>10}")
+    print(f"{'-' * width}  {'-' * 8}  {'-' * 10}  {'-' * 10}  {'-' * 10}")
+    for path, calls, wall, self_wall, cpu in rows:
+        print(f"{path:<{width}}  {calls:>8}  {wall:>10.3f}  {self_wall:>10.3f}  {cpu:>10.3f}")
+    print(f"{'=' * (width + 56)}\n")
+
+
+def write_stage_collapsed(path):
+    """Write stage self-times (in microseconds) as flamegraph collapsed stacks"""
+    with _stats_lock:
+        lines = [f"{';'.join(stage_path)} {max(int((wall - child_wall) * 1e6), 0)}"
+                 for stage_path, (_, wall, _, child_wall) in _stage_stats.items()]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+class StackSampler:
+    """Samples the target thread's Python stack on an interval and counts collapsed stacks"""
+
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_collapsed(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class _Session:
+    def __init__(self, name, mode):
+        self.name = name
+        self.mode = mode
+        self.started = time.strftime('%Y%m%d_%H%M%S')
+        self.profiler = None
+        self.sampler = None
+        self.finished = False
+
+    def start(self):
+        if self.mode == 'cprofile':
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        elif self.mode == 'sample':
+            self.sampler = StackSampler().start()
+        print(f"[PROFILE] Profiling '{self.name}' in {self.mode} mode")
+        return self
+
+    def _output_path(self, suffix):
+        os.makedirs(PROFILE_OUTPUT_FOLDER, exist_ok=True)
+        return os.path.join(PROFILE_OUTPUT_FOLDER, f"{self.name}_{self.started}{suffix}")
+
+    def finish(self):
+        if self.finished:
+            return
+        self.finished = True
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self.sampler is not None:
+            self.sampler.stop()
+
+        print_stage_summary()
+        stages_path = self._output_path('_stages.collapsed')
+        write_stage_collapsed(stages_path)
+        print(f"[PROFILE] Stage collapsed stacks written to {stages_path}")
+
+        if self.profiler is not None:
+            stats_path = self._output_path('.pstats')
+            self.profiler.dump_stats(stats_path)
+            pstats.Stats(self.profiler).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+            print(f"[PROFILE] cProfile stats written to {stats_path}")
+        if self.sampler is not None:
+            samples_path = self._output_path('_samples.collapsed')
+            self.sampler.write_collapsed(samples_path)
+            print(f"[PROFILE] {sum(self.sampler.samples.values())} stack samples written to {samples_path}")
+
+
+def enable_profiling(name, mode=None):
+    """Start profiling the current script if TX_PERMIT_PROFILE (or `mode`) is set.
+
+    Call once at the start of an entry point. The report (stage table, collapsed stacks and,
+    depending on the mode, cProfile stats or stack samples) is written when the process exits.
+    """
+    global PROFILE_MODE
+    mode = mode or PROFILE_MODE
+    if not mode:
+        return None
+    if mode not in ('stages', 'cprofile', 'sample'):
+        print(f"[WARNING] Unknown profiling mode '{mode}'; expected stages, cprofile or sample.")
+        return None
+    PROFILE_MODE = mode
+    session = _Session(name, mode).start()
+    atexit.register(session.finish)
+    return session
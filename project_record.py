@@ -0,0 +1,216 @@
+import sys
+from constants import LOOKUP
+from tdlr_dates import decode_tdlr_dates, parse_tdlr_date_str
+
+# Reverse lookups (name -> numeric ID), built once at import
+CITY_IDS = {name: int(id_str) for id_str, name in LOOKUP.get("CITIES", {}).items()}
+COUNTY_IDS = {name: int(id_str) for id_str, name in LOOKUP.get("COUNTIES", {}).items()}
+_CITY_NAMES = {int(id_str): sys.intern(name) for id_str, name in LOOKUP.get("CITIES", {}).items()}
+_COUNTY_NAMES = {int(id_str): sys.intern(name) for id_str, name in LOOKUP.get("COUNTIES", {}).items()}
+
+
+def _lookup_id(value, ids_by_name):
+    """Normalize a city/county reference (ID, numeric string or name) to its integer ID"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, int):
+        return value
+    value = str(value).strip()
+    if value.isdigit():
+        return int(value)
+    return ids_by_name.get(value)
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _jsonable(value):
+    # Detail columns may hold dates; render them like the Date column
+    if isinstance(value, dict):
+        return {key: _jsonable(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_jsonable(item) for item in value]
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def parse_estimated_cost(value):
+    """Parse EstimatedCost from the listing (number or a string like '$1,250,000.00')"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace('$', '').replace(',', '').strip())
+    except ValueError:
+        return None
+
+
+class ProjectRecord:
+    """One TABS project as it moves through listing, detail fetch, storage and output.
+
+    City and county are kept as integer LOOKUP IDs and repeated strings are interned,
+    so large archives stay compact. Names are resolved on access via LOOKUP.
+    """
+
+    __slots__ = ('project_number', 'project_id', 'project_name', 'created_on', 'facility_name',
+                 'city_id', 'county_id', 'project_status', 'type_of_work', 'estimated_cost',
+                 'scope_of_work', 'cluster_id', 'details')
+
+    def __init__(self, project_number=None, project_id=None, project_name=None, created_on=None,
+                 facility_name=None, city_id=None, county_id=None, project_status=None,
+                 type_of_work=None, estimated_cost=None, scope_of_work=None, cluster_id=None, details=None):
+        self.project_number = project_number
+        self.project_id = project_id
+        self.project_name = project_name
+        self.created_on = created_on
+        self.facility_name = facility_name
+        self.city_id = city_id
+        self.county_id = county_id
+        self.project_status = _intern(project_status)
+        self.type_of_work = _intern(type_of_work)
+        self.estimated_cost = estimated_cost
+        self.scope_of_work = scope_of_work
+        self.cluster_id = cluster_id  # Near-duplicate scope cluster (see scope_clusters.py)
+        self.details = details  # Every field from the detail page (see detail_extractor.py)
+
+    # --- Converters ---
+    @classmethod
+    def from_listing_row(cls, row, created_on=None):
+        """Build a record from one raw SearchProjects (DataTables) row"""
+        get = row.get
+        if created_on is None:
+            created_on = parse_tdlr_date_str(get('ProjectCreatedOn'))
+        return cls(
+            project_number=get('ProjectNumber'),
+            project_id=get('ProjectId'),
+            project_name=get('ProjectName'),
+            created_on=created_on,
+            facility_name=get('FacilityName'),
+            city_id=_lookup_id(get('City'), CITY_IDS),
+            county_id=_lookup_id(get('County'), COUNTY_IDS),
+            project_status=get('ProjectStatus'),
+            type_of_work=get('TypeOfWork'),
+            estimated_cost=parse_estimated_cost(get('EstimatedCost')),
+        )
+
+    @classmethod
+    def from_dict(cls, item):
+        """Build a record from a legacy dict (by_date or fetch_project_details key conventions)"""
+        get = item.get
+        created_on = get('Date')
+        if isinstance(created_on, str):
+            created_on = parse_tdlr_date_str(created_on) if created_on != 'N/A' else None
+        if created_on is None:
+            created_on = parse_tdlr_date_str(get('ProjectCreatedOn'))
+
+        # by_date stored the county ID under 'CountyName' and names under 'City'/'County'
+        county = get('CountyName') if get('CountyName') is not None else get('County')
+        project_number = get('ProjectNumber', get('project_number'))
+        return cls(
+            project_number=project_number if project_number != 'N/A' else None,
+            project_id=get('ProjectId'),
+            project_name=get('ProjectName'),
+            created_on=created_on,
+            facility_name=get('FacilityName'),
+            city_id=_lookup_id(get('City'), CITY_IDS),
+            county_id=_lookup_id(county, COUNTY_IDS),
+            project_status=get('ProjectStatus'),
+            type_of_work=get('TypeOfWork'),
+            estimated_cost=parse_estimated_cost(get('EstimatedCost')),
+            scope_of_work=get('ScopeOfWork', get('scope_of_work')),
+            details=get('Details'),
+        )
+
+    def to_dict(self):
+        """Flat, display-friendly dict (names resolved, date as ISO string)"""
+        return {
+            'ProjectNumber': self.project_number or 'N/A',
+            'ProjectName': self.project_name or 'N/A',
+            'Date': self.date_str,
+            'FacilityName': self.facility_name or 'N/A',
+            'City': self.city_name,
+            'County': self.county_name,
+            'ProjectStatus': self.project_status,
+            'TypeOfWork': self.type_of_work,
+            'EstimatedCost': self.estimated_cost,
+            'ScopeOfWork': self.scope_of_work if self.scope_of_work is not None else 'N/A',
+            'ClusterId': self.cluster_id,
+            'Details': _jsonable(self.details),
+        }
+
+    # --- Derived fields ---
+    @property
+    def city_name(self):
+        return _CITY_NAMES.get(self.city_id, 'N/A')
+
+    @property
+    def county_name(self):
+        return _COUNTY_NAMES.get(self.county_id, 'N/A')
+
+    @property
+    def date_str(self):
+        return self.created_on.isoformat() if self.created_on else 'N/A'
+
+    @property
+    def month(self):
+        return self.created_on.strftime('%Y-%m') if self.created_on else None
+
+    @property
+    def has_scope(self):
+        return bool(self.scope_of_work) and self.scope_of_work not in ('N/A', 'Not found')
+
+    # --- Compact pickling ---
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+        # Older pickles may carry fewer fields than the current layout
+        for name in self.__slots__[len(state):]:
+            setattr(self, name, None)
+        self.project_status = _intern(self.project_status)
+        self.type_of_work = _intern(self.type_of_work)
+
+    def __eq__(self, other):
+        if not isinstance(other, ProjectRecord):
+            return NotImplemented
+        return self.__getstate__() == other.__getstate__()
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"ProjectRecord({self.project_number!r}, {self.project_name!r}, {self.date_str})"
+
+
+def records_from_listing_page(rows):
+    """Convert one page of listing rows, decoding all of the page's dates in a single batch"""
+    dates = decode_tdlr_dates([row.get('ProjectCreatedOn') for row in rows])
+    return [ProjectRecord.from_listing_row(row, created_on) for row, created_on in zip(rows, dates)]
+
+
+def _coerce_batch(items):
+    # Prime the date cache for the whole batch so per-item conversion is a lookup
+    decode_tdlr_dates([item.get('ProjectCreatedOn') for item in items if isinstance(item, dict)])
+    for item in items:
+        if isinstance(item, ProjectRecord):
+            yield item
+        elif 'ProjectCreatedOn' in item and 'ScopeOfWork' not in item and 'scope_of_work' not in item:
+            yield ProjectRecord.from_listing_row(item)
+        else:
+            yield ProjectRecord.from_dict(item)
+
+
+def coerce_records(items, batch_size=1000):
+    """Yield ProjectRecords from a mix of records, legacy dicts and raw listing rows"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield from _coerce_batch(batch)
+            batch = []
+    if batch:
+        yield from _coerce_batch(batch)
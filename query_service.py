@@ -0,0 +1,307 @@
+import json
+import os
+import pickle
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from bitmap_index import BitmapIndex, iter_positions
+from output_writers import DEFAULT_PAGE_SIZE
+from record_store import StoreError, glob_records, load_records
+from record_stats import compute_stats
+
+# --- Settings ---
+QUERY_HOST = '127.0.0.1'
+QUERY_PORT = int(os.getenv('TX_PERMIT_QUERY_PORT', '8765'))
+QUERY_DATA_FILE = os.getenv('TX_PERMIT_QUERY_DATA')  # Defaults to the newest by_date.py snapshot
+CACHE_SIZE = 256  # Cached query results
+RELOAD_CHECK_INTERVAL = 5  # Seconds between checks for a rewritten data file
+MAX_PAGE_SIZE = 1000
+
+GROUP_KEYS = {
+    'county': lambda record: record.county_name,
+    'city': lambda record: record.city_name,
+    'month': lambda record: record.month or 'unknown',
+    'type_of_work': lambda record: record.type_of_work or 'unknown',
+    'status': lambda record: record.project_status or 'unknown',
+}
+
+
+def newest_snapshot(folder='output_data'):
+    candidates = glob_records(os.path.join(folder, 'project_report_data_*.records'))
+    return max(candidates, key=os.path.getmtime) if candidates else None
+
+
+class LRUCache:
+    """Small thread-safe LRU map"""
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+
+class PermitIndex:
+    """In-memory records plus per-field position indexes, sorted by creation date.
+
+    Equality filters (county, city, type of work, status) are bitmap algebra, the date range
+    is two bisections turned into a row range, and only the survivors are checked against
+    search terms.
+    Indexes are immutable once built; with_records() returns a new one with a higher
+    `generation`, which invalidates cached results.
+    """
+
+    def __init__(self, records=(), generation=1):
+        self.generation = generation
+        by_number = {}
+        unnumbered = []
+        for record in records:
+            if record.project_number:
+                by_number[record.project_number] = record
+            else:
+                unnumbered.append(record)
+        # Every dated record (numbered or not) comes first in date order, so positions line up with self.dates
+        candidates = list(by_number.values()) + unnumbered
+        ordered = sorted((record for record in candidates if record.created_on), key=lambda record: record.created_on)
+        ordered += [record for record in candidates if not record.created_on]
+
+        search_text = [f"{record.project_name or ''} {record.facility_name or ''} {record.scope_of_work or ''}".lower()
+                       for record in ordered]
+
+        self.records = ordered
+        self.dates = [record.created_on for record in ordered if record.created_on]
+        self.bitmaps = BitmapIndex(ordered)
+        self.search_text = search_text
+        self.by_number = by_number
+
+    def with_records(self, records):
+        """New index with records added or replaced (by project number)"""
+        merged = dict(self.by_number)
+        for record in records:
+            if record.project_number:
+                merged[record.project_number] = record
+        unnumbered = [record for record in self.records if not record.project_number]
+        return PermitIndex(list(merged.values()) + unnumbered, self.generation + 1)
+
+    def newest_first(self, positions):
+        """Positions ordered newest first, undated records last"""
+        split = bisect_left(positions, len(self.dates))
+        return list(reversed(positions[:split])) + list(positions[split:])
+
+    def positions(self, counties=(), cities=(), types_of_work=(), statuses=(), date_from=None, date_to=None,
+                  terms=(), exclude=None):
+        """Sorted record positions matching every given filter (values within a filter are OR-ed)"""
+        include = {'county': counties, 'city': cities, 'type_of_work': types_of_work, 'status': statuses}
+        base = None
+        if date_from or date_to:
+            low = bisect_left(self.dates, date_from) if date_from else 0
+            high = bisect_right(self.dates, date_to) if date_to else len(self.dates)
+            base = self.bitmaps.range_bitmap(low, high)
+
+        if base is None and not any(include.values()) and not exclude:
+            result = range(len(self.records))
+        else:
+            result = list(iter_positions(self.bitmaps.query(include, exclude, base)))
+        if terms:
+            lowered = [term.lower() for term in terms]
+            result = [p for p in result if any(term in self.search_text[p] for term in lowered)]
+        return result
+
+
+def _parse_date(value):
+    return date.fromisoformat(value) if value else None
+
+
+def parse_filters(params):
+    """Query-string parameters -> PermitIndex.positions() keyword arguments"""
+    return {
+        'counties': params.get('county', []),
+        'cities': params.get('city', []),
+        'types_of_work': params.get('type', []),
+        'statuses': params.get('status', []),
+        'date_from': _parse_date(params.get('from', [None])[0]),
+        'date_to': _parse_date(params.get('to', [None])[0]),
+        'terms': params.get('q', []),
+        'exclude': {field: params[f'not_{name}'] for name, field in
+                    (('county', 'county'), ('city', 'city'), ('type', 'type_of_work'), ('status', 'status'))
+                    if f'not_{name}' in params},
+    }
+
+
+# What a failed reload of the data file raises (missing, unreadable or damaged file)
+RELOAD_ERRORS = (OSError, StoreError, pickle.UnpicklingError, EOFError)
+
+
+class QueryService:
+    """Answers /projects, /aggregate and /stats queries from a warm PermitIndex with an LRU result cache"""
+
+    def __init__(self, path, cache_size=CACHE_SIZE):
+        self.path = path
+        self.cache = LRUCache(cache_size)
+        self.index = PermitIndex(generation=0)
+        self.loaded_mtime = None
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        """Re-read the data file into a fresh index; returns the record count"""
+        mtime = os.path.getmtime(self.path)
+        records = load_records(self.path)
+        with self._lock:
+            self.index = PermitIndex(records, self.index.generation + 1)
+            self.loaded_mtime = mtime
+            self.cache.clear()
+        print(f"[INFO] Loaded {len(records)} records from {self.path}")
+        return len(records)
+
+    def ingest(self, records):
+        """Add records to the live index (e.g. from a crawler in the same process)"""
+        with self._lock:
+            self.index = self.index.with_records(records)
+            self.cache.clear()
+
+    def reload_if_changed(self):
+        try:
+            if os.path.getmtime(self.path) != self.loaded_mtime:
+                self.reload()
+        except RELOAD_ERRORS as e:
+            print(f"[WARNING] Could not reload {self.path}: {e}")
+
+    def query(self, route, params):
+        """JSON body for a request; results are cached per index generation"""
+        key = (route, tuple(sorted((name, tuple(values)) for name, values in params.items())))
+        index = self.index
+        cached = self.cache.get((index.generation, key))
+        if cached is not None:
+            return cached
+
+        positions = index.positions(**parse_filters(params))
+        if route == '/projects':
+            page = max(int(params.get('page', ['1'])[0]), 1)
+            page_size = min(max(int(params.get('page_size', [str(DEFAULT_PAGE_SIZE)])[0]), 1), MAX_PAGE_SIZE)
+            # Newest first, like the TABS listing
+            start = (page - 1) * page_size
+            selected = [index.records[p] for p in index.newest_first(positions)[start:start + page_size]]
+            body = {'total': len(positions), 'page': page, 'page_size': page_size,
+                    'results': [record.to_dict() for record in selected]}
+        elif route == '/aggregate':
+            by = params.get('by', ['county'])[0]
+            if by not in GROUP_KEYS:
+                raise ValueError(f"by must be one of {', '.join(GROUP_KEYS)}")
+            key_of = GROUP_KEYS[by]
+            groups = defaultdict(lambda: {'count': 0, 'estimated_cost': 0.0})
+            for position in positions:
+                record = index.records[position]
+                group = groups[key_of(record)]
+                group['count'] += 1
+                group['estimated_cost'] += record.estimated_cost or 0.0
+            body = {'total': len(positions), 'by': by,
+                    'groups': dict(sorted(groups.items(), key=lambda item: -item[1]['count']))}
+        elif route == '/stats':
+            body = compute_stats(index.records[position] for position in positions).to_dict()
+        else:
+            return None
+
+        encoded = json.dumps(body).encode('utf-8')
+        self.cache.put((index.generation, key), encoded)
+        return encoded
+
+
+def _make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body):
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path == '/health':
+                body = {'records': len(service.index.records), 'generation': service.index.generation,
+                        'cache_hits': service.cache.hits, 'cache_misses': service.cache.misses}
+                self._send(200, json.dumps(body).encode('utf-8'))
+                return
+            try:
+                body = service.query(url.path, parse_qs(url.query))
+            except ValueError as e:
+                self._send(400, json.dumps({'error': str(e)}).encode('utf-8'))
+                return
+            if body is None:
+                self._send(404, b'{"error": "not found"}')
+            else:
+                self._send(200, body)
+
+        def do_POST(self):
+            if urlsplit(self.path).path != '/reload':
+                self._send(404, b'{"error": "not found"}')
+                return
+            try:
+                count = service.reload()
+            except RELOAD_ERRORS as e:
+                # The previous index keeps serving queries
+                print(f"[ERROR] Could not reload {service.path}: {e}")
+                self._send(500, json.dumps({'error': f"reload failed: {e}"}).encode('utf-8'))
+                return
+            self._send(200, json.dumps({'records': count}).encode('utf-8'))
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(path, host=QUERY_HOST, port=QUERY_PORT):
+    """Serve queries until interrupted, reloading the data file whenever it is rewritten"""
+    service = QueryService(path)
+
+    def watch_file():
+        while True:
+            time.sleep(RELOAD_CHECK_INTERVAL)
+            service.reload_if_changed()
+
+    threading.Thread(target=watch_file, daemon=True).start()
+    server = ThreadingHTTPServer((host, port), _make_handler(service))
+    print(f"[INFO] Query service on http://{host}:{port} (/projects, /aggregate, /stats, /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[INFO] Query service stopped.")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    data_file = QUERY_DATA_FILE or newest_snapshot()
+    if not data_file or not os.path.exists(data_file):
+        print("[ERROR] No data file found; set TX_PERMIT_QUERY_DATA or run by_date.py first.")
+    else:
+        serve(data_file)
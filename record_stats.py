@@ -0,0 +1,97 @@
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+
+class RecordStats:
+    """Single-pass, mergeable summary statistics over ProjectRecords.
+
+    Feed records with add()/update(); combine partial results computed per shard or per
+    process with merge(). All state is counters and min/max values, so merging is exact.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.with_scope = 0
+        self.min_date = None
+        self.max_date = None
+        self.county_counts = Counter()
+        self.month_counts = Counter()
+        self.county_with_scope = Counter()
+        self.cost_count = 0
+        self.cost_sum = 0.0
+
+    def add(self, record):
+        self.total += 1
+        county = record.county_name
+        self.county_counts[county] += 1
+
+        created_on = record.created_on
+        if created_on:
+            if self.min_date is None or created_on < self.min_date:
+                self.min_date = created_on
+            if self.max_date is None or created_on > self.max_date:
+                self.max_date = created_on
+            self.month_counts[record.month] += 1
+
+        scope = record.scope_of_work
+        if scope and scope != 'N/A':
+            self.with_scope += 1
+            self.county_with_scope[county] += 1
+
+        if record.estimated_cost is not None:
+            self.cost_count += 1
+            self.cost_sum += record.estimated_cost
+
+    def update(self, records):
+        for record in records:
+            self.add(record)
+        return self
+
+    def merge(self, other):
+        """Fold another RecordStats into this one"""
+        self.total += other.total
+        self.with_scope += other.with_scope
+        if other.min_date is not None and (self.min_date is None or other.min_date < self.min_date):
+            self.min_date = other.min_date
+        if other.max_date is not None and (self.max_date is None or other.max_date > self.max_date):
+            self.max_date = other.max_date
+        self.county_counts.update(other.county_counts)
+        self.month_counts.update(other.month_counts)
+        self.county_with_scope.update(other.county_with_scope)
+        self.cost_count += other.cost_count
+        self.cost_sum += other.cost_sum
+        return self
+
+    @property
+    def scope_coverage(self):
+        return self.with_scope / self.total if self.total else 0.0
+
+    def to_dict(self):
+        """Plain-dict view of the statistics (JSON-serializable)"""
+        return {
+            'total': self.total,
+            'with_scope': self.with_scope,
+            'scope_coverage': self.scope_coverage,
+            'min_date': self.min_date.isoformat() if self.min_date else None,
+            'max_date': self.max_date.isoformat() if self.max_date else None,
+            'counties': dict(self.county_counts.most_common()),
+            'months': dict(sorted(self.month_counts.items())),
+            'county_scope_coverage': {county: self.county_with_scope[county] / count
+                                      for county, count in self.county_counts.items()},
+            'estimated_cost_total': self.cost_sum,
+            'estimated_cost_count': self.cost_count,
+        }
+
+
+def compute_stats(records):
+    """Compute RecordStats over an iterable of ProjectRecords in one linear scan"""
+    return RecordStats().update(records)
+
+
+def compute_stats_parallel(shards, workers=None):
+    """Compute RecordStats per shard (a list of record lists) in a process pool and merge them"""
+    result = RecordStats()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for partial in pool.map(compute_stats, shards):
+            result.merge(partial)
+    return result
@@ -0,0 +1,454 @@
+import glob
+import itertools
+import os
+import pickle
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from compression import CODEC_ZLIB, MIN_TRAINING_SAMPLES, Dictionary, DictionaryRegistry
+from project_record import ProjectRecord, coerce_records
+
+# --- Settings ---
+CHUNK_SIZE = 2000  # Records per chunk; scanning memory is bounded by one chunk
+# 'zlib' compresses each chunk as a whole and is the default: scans decode whole chunks, and a whole
+# chunk compresses better than its records do one by one. 'dictionary' compresses each record on its
+# own (for random access via read_record) with the 'records' registry dictionary, embedded in the
+# file; 'none' stores raw chunks
+RECORD_COMPRESSION = os.getenv('TX_PERMIT_RECORD_COMPRESSION', 'zlib')
+ZLIB_LEVEL = 6
+RECORD_DICTIONARY = 'records'  # Registry name of the record dictionaries (compression.DictionaryRegistry)
+RECORD_EXTENSION = '.records'
+LEGACY_EXTENSION = '.pkl'  # Record files were pickles under this name before the record store
+CHECKPOINT_SUFFIXES = ('_processed', '_remaining_ids')  # by_date.py checkpoints that sit next to its snapshots
+
+# Layout: MAGIC, then chunk frames, then an index frame and a trailer pointing at it.
+#   frame   = FRAME header (kind, payload length, record count, crc32) + payload
+#   chunk   = pickled list of ProjectRecord states (CHNK), the same zlib-compressed (CHZL), or
+#             (CHKD) the offset of a dictionary frame, per-record lengths and each record's state
+#             compressed independently with that dictionary
+#   dict    = DICT header (codec, registry version, baseline ratio) + dictionary bytes, written before
+#             the first chunk that uses it; appends add a new one when the dictionary is retrained
+#             (version 3 files hold a bare zlib dictionary)
+#   index   = (offset, record count) per chunk
+#   trailer = index frame offset + END_MAGIC
+# Appending truncates the index and trailer, writes new chunks and a new index, so existing
+# chunks are never rewritten. If the tail is damaged, chunks are recovered by scanning frames.
+# Everything needed to read a file is in the file; only version 2 files (CHKZ chunks) refer to
+# dictionaries under compression.DICTIONARY_FOLDER.
+MAGIC = b'TXPRSTORE\x04'
+READABLE_MAGICS = (b'TXPRSTORE\x01', b'TXPRSTORE\x02', b'TXPRSTORE\x03', MAGIC)
+BARE_DICTIONARY_MAGIC = b'TXPRSTORE\x03'  # DICT frames without a header
+END_MAGIC = b'TXPE'
+CHUNK_KIND = b'CHNK'
+ZLIB_KIND = b'CHZL'
+DICTIONARY_CHUNK_KIND = b'CHKD'
+LEGACY_COMPRESSED_KIND = b'CHKZ'  # Version 2: per-record compression with an external dictionary
+DICTIONARY_KIND = b'DICT'
+INDEX_KIND = b'INDX'
+DATA_KINDS = (CHUNK_KIND, ZLIB_KIND, DICTIONARY_CHUNK_KIND, LEGACY_COMPRESSED_KIND)
+FRAME_KINDS = DATA_KINDS + (DICTIONARY_KIND, INDEX_KIND)
+_FRAME = struct.Struct('<4sIII')
+_INDEX_ENTRY = struct.Struct('<QI')
+_TRAILER = struct.Struct('<Q4s')
+_DICT_HEADER = struct.Struct('<BId')
+
+_registry = None
+
+
+class StoreError(Exception):
+    pass
+
+
+def _record_registry():
+    global _registry
+    if _registry is None:
+        _registry = DictionaryRegistry(RECORD_DICTIONARY)
+    return _registry
+
+
+def is_record_store(path):
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) in READABLE_MAGICS
+
+
+def _record_from_state(state):
+    record = ProjectRecord.__new__(ProjectRecord)
+    record.__setstate__(state)
+    return record
+
+
+def _encode_chunk(records):
+    states = [record.__getstate__() for record in records]
+    return pickle.dumps(states, pickle.HIGHEST_PROTOCOL)
+
+
+def _encode_dictionary_chunk(pickled_states, dictionary, dictionary_offset):
+    """Payload of a CHKD chunk; returns (payload, compressed record bytes)"""
+    blobs = [dictionary.compress(state) for state in pickled_states]
+    header = struct.pack(f'<QI{len(blobs)}I', dictionary_offset, len(blobs), *(len(blob) for blob in blobs))
+    body = b''.join(blobs)
+    return header + body, len(body)
+
+
+def _compressed_layout(kind, payload):
+    """(dictionary reference, per-record lengths, offset of the first record) of a CHKD or CHKZ chunk"""
+    head = '<QI' if kind == DICTIONARY_CHUNK_KIND else '<II'
+    reference, count = struct.unpack_from(head, payload)
+    position = struct.calcsize(head)
+    lengths = struct.unpack_from(f'<{count}I', payload, position)
+    return reference, lengths, position + 4 * count
+
+
+def _write_frame(f, kind, payload, count):
+    f.write(_FRAME.pack(kind, len(payload), count, zlib.crc32(payload)))
+    f.write(payload)
+
+
+def _read_frame(f, offset, file_size):
+    """(kind, count, payload, next offset) of the frame at `offset`, or None if it is incomplete or corrupt"""
+    if offset + _FRAME.size > file_size:
+        return None
+    f.seek(offset)
+    kind, length, count, crc = _FRAME.unpack(f.read(_FRAME.size))
+    if kind not in FRAME_KINDS or offset + _FRAME.size + length > file_size:
+        return None
+    payload = f.read(length)
+    if zlib.crc32(payload) != crc:
+        return None
+    return kind, count, payload, offset + _FRAME.size + length
+
+
+def _chunk_batches(records, chunk_size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= chunk_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class RecordStore:
+    """Reader for a chunked record file.
+
+    Opening reads only the index; records are decoded one chunk at a time, so a scan holds
+    at most one chunk in memory. A missing or damaged index (e.g. a crash mid-write) is
+    rebuilt by scanning frames, stopping at the first corrupt one.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.magic = f.read(len(MAGIC))
+            if self.magic not in READABLE_MAGICS:
+                raise StoreError(f"{path} is not a record store")
+            self._dictionaries = {}
+            self.file_size = os.fstat(f.fileno()).st_size
+            self.recovered = False
+            self.chunks, self.data_end = self._read_index(f)
+            if self.chunks is None:
+                self.recovered = True
+                self.chunks, self.data_end = self._scan(f)
+
+    def _read_index(self, f):
+        if self.file_size < len(MAGIC) + _TRAILER.size:
+            return None, None
+        f.seek(self.file_size - _TRAILER.size)
+        index_offset, end_magic = _TRAILER.unpack(f.read(_TRAILER.size))
+        if end_magic != END_MAGIC:
+            return None, None
+        frame = _read_frame(f, index_offset, self.file_size - _TRAILER.size)
+        if frame is None or frame[0] != INDEX_KIND:
+            return None, None
+        payload = frame[2]
+        chunks = [_INDEX_ENTRY.unpack_from(payload, i) for i in range(0, len(payload), _INDEX_ENTRY.size)]
+        return chunks, index_offset
+
+    def _scan(self, f):
+        chunks = []
+        offset = len(MAGIC)
+        while True:
+            frame = _read_frame(f, offset, self.file_size)
+            if frame is None or frame[0] == INDEX_KIND:
+                break
+            if frame[0] != DICTIONARY_KIND:
+                chunks.append((offset, frame[1]))
+            offset = frame[3]
+        return chunks, offset
+
+    def _frame(self, f, offset):
+        frame = _read_frame(f, offset, self.file_size)
+        if frame is None:
+            raise StoreError(f"Frame at offset {offset} of {self.path} is corrupt")
+        return frame
+
+    def _dictionary(self, f, kind, reference):
+        """Dictionary for a CHKD (frame offset in this file) or legacy CHKZ (external version) chunk"""
+        dictionary = self._dictionaries.get((kind, reference))
+        if dictionary is None:
+            if kind == DICTIONARY_CHUNK_KIND:
+                frame = self._frame(f, reference)
+                if frame[0] != DICTIONARY_KIND:
+                    raise StoreError(f"No dictionary at offset {reference} of {self.path}")
+                dictionary = _read_dictionary(frame[2], bare=self.magic == BARE_DICTIONARY_MAGIC)
+            else:
+                dictionary = _record_registry().get(reference)
+            self._dictionaries[(kind, reference)] = dictionary
+        return dictionary
+
+    def _decode(self, f, kind, payload, only=None):
+        """Records of a chunk payload (just record `only`, if given, decompressing only that one)"""
+        if kind in (CHUNK_KIND, ZLIB_KIND):
+            states = pickle.loads(zlib.decompress(payload) if kind == ZLIB_KIND else payload)
+            if only is not None:
+                return _record_from_state(states[only])
+            return [_record_from_state(state) for state in states]
+        reference, lengths, position = _compressed_layout(kind, payload)
+        dictionary = self._dictionary(f, kind, reference)
+        if only is not None:
+            position += sum(lengths[:only])
+            return _record_from_state(pickle.loads(dictionary.decompress(payload[position:position + lengths[only]])))
+        records = []
+        for length in lengths:
+            records.append(_record_from_state(pickle.loads(dictionary.decompress(payload[position:position + length]))))
+            position += length
+        return records
+
+    def chunk_dictionary(self, index):
+        """(frame offset, Dictionary) embedded for chunk `index`, or None if it does not use one"""
+        with open(self.path, 'rb') as f:
+            kind, _, payload, _ = self._frame(f, self.chunks[index][0])
+            if kind != DICTIONARY_CHUNK_KIND:
+                return None
+            reference = _compressed_layout(kind, payload)[0]
+            return reference, self._dictionary(f, kind, reference)
+
+    def __len__(self):
+        return sum(count for _, count in self.chunks)
+
+    @property
+    def chunk_count(self):
+        return len(self.chunks)
+
+    def read_chunk(self, index):
+        """Decode chunk `index` (0-based) into a list of ProjectRecords"""
+        offset, _ = self.chunks[index]
+        with open(self.path, 'rb') as f:
+            kind, _, payload, _ = self._frame(f, offset)
+            return self._decode(f, kind, payload)
+
+    def iter_chunks(self, start=0, stop=None):
+        """Yield chunks start..stop-1 as record lists"""
+        with open(self.path, 'rb') as f:
+            for offset, _ in self.chunks[start:stop]:
+                kind, _, payload, _ = self._frame(f, offset)
+                yield self._decode(f, kind, payload)
+
+    def iter_records(self, start_chunk=0):
+        for chunk in self.iter_chunks(start_chunk):
+            yield from chunk
+
+    def seek_record(self, position):
+        """(chunk index, offset within the chunk) of the record at `position`"""
+        for index, (_, count) in enumerate(self.chunks):
+            if position < count:
+                return index, position
+            position -= count
+        raise IndexError(position)
+
+    def read_record(self, position):
+        """Record at `position`; in a dictionary-compressed chunk only that record is decompressed"""
+        index, within = self.seek_record(position)
+        offset, _ = self.chunks[index]
+        with open(self.path, 'rb') as f:
+            kind, _, payload, _ = self._frame(f, offset)
+            return self._decode(f, kind, payload, only=within)
+
+
+def _map_chunk(path, index, fn):
+    return fn(RecordStore(path).read_chunk(index))
+
+
+def map_chunks(path, fn, workers=None):
+    """Apply `fn` to every chunk's record list in a process pool; returns the results in chunk order.
+
+    `fn` must be a module-level function. Use it with mergeable aggregators, e.g.
+    map_chunks(path, compute_stats) and RecordStats.merge.
+    """
+    store = RecordStore(path)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_map_chunk, path, index, fn) for index in range(store.chunk_count)]
+        return [future.result() for future in futures]
+
+
+def _write_index(f, chunks):
+    index_offset = f.tell()
+    payload = b''.join(_INDEX_ENTRY.pack(offset, count) for offset, count in chunks)
+    _write_frame(f, INDEX_KIND, payload, len(chunks))
+    f.write(_TRAILER.pack(index_offset, END_MAGIC))
+
+
+def _read_dictionary(payload, bare=False):
+    """Dictionary from a DICT frame payload"""
+    if bare:
+        return Dictionary(RECORD_DICTIONARY, 0, CODEC_ZLIB, payload)
+    codec, version, ratio = _DICT_HEADER.unpack_from(payload)
+    return Dictionary(RECORD_DICTIONARY, version, codec, payload[_DICT_HEADER.size:], ratio or None)
+
+
+def _write_dictionary(f, dictionary):
+    """Embed a registry dictionary as a DICT frame; returns (offset, Dictionary)"""
+    offset = f.tell()
+    header = _DICT_HEADER.pack(dictionary.codec, dictionary.version, dictionary.ratio or 0.0)
+    _write_frame(f, DICTIONARY_KIND, header + dictionary.data, 0)
+    return offset, dictionary
+
+
+def _write_chunks(f, records, chunk_size, chunks, compression, embedded=None):
+    """Write record chunks; `embedded` is an existing (offset, Dictionary) to keep using when appending.
+
+    In 'dictionary' mode every batch is checked against the dictionary's baseline ratio (the
+    batch was not trained on, so it is held-out data); when the registry retrains, the new
+    version is embedded as another DICT frame and used from that batch on.
+    """
+    registry = _record_registry()
+    written = raw_bytes = stored_bytes = 0
+    for batch in _chunk_batches(records, chunk_size):
+        written += len(batch)
+        if compression == 'zlib':
+            raw = _encode_chunk(batch)
+            payload = zlib.compress(raw, ZLIB_LEVEL)
+            raw_bytes += len(raw)
+            stored_bytes += len(payload)
+            chunks.append((f.tell(), len(batch)))
+            _write_frame(f, ZLIB_KIND, payload, len(batch))
+            continue
+        if compression != 'dictionary' or (embedded is None and len(batch) < MIN_TRAINING_SAMPLES):
+            chunks.append((f.tell(), len(batch)))
+            _write_frame(f, CHUNK_KIND, _encode_chunk(batch), len(batch))
+            continue
+
+        pickled = [pickle.dumps(record.__getstate__(), pickle.HIGHEST_PROTOCOL) for record in batch]
+        raw = sum(len(state) for state in pickled)
+        if embedded is None:
+            dictionary = registry.current_or_train(pickled)
+            if dictionary is None:  # A zstd registry without zstandard installed
+                chunks.append((f.tell(), len(batch)))
+                _write_frame(f, CHUNK_KIND, _encode_chunk(batch), len(batch))
+                continue
+            embedded = _write_dictionary(f, dictionary)
+        dictionary_offset, dictionary = embedded
+        payload, compressed = _encode_dictionary_chunk(pickled, dictionary, dictionary_offset)
+        retrained = registry.observe(dictionary, raw / compressed if compressed else 0.0, pickled)
+        if retrained is not dictionary:
+            dictionary_offset, dictionary = embedded = _write_dictionary(f, retrained)
+            payload, compressed = _encode_dictionary_chunk(pickled, dictionary, dictionary_offset)
+        chunks.append((f.tell(), len(batch)))
+        _write_frame(f, DICTIONARY_CHUNK_KIND, payload, len(batch))
+        raw_bytes += raw
+        stored_bytes += compressed
+    if stored_bytes:
+        print(f"[INFO] Compressed {written} records {raw_bytes / stored_bytes:.1f}x "
+              f"({raw_bytes} -> {stored_bytes} bytes, {compression})")
+    return written
+
+
+def write_records(path, records, chunk_size=CHUNK_SIZE, compression=RECORD_COMPRESSION):
+    """Write records (any iterable) to a new store, replacing `path` atomically; returns the count"""
+    tmp_path = f"{path}.tmp"
+    chunks = []
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        written = _write_chunks(f, records, chunk_size, chunks, compression)
+        _write_index(f, chunks)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return written
+
+
+def append_records(path, records, chunk_size=CHUNK_SIZE, compression=RECORD_COMPRESSION):
+    """Append records as new chunks without rewriting existing ones; returns the count appended.
+
+    Creates the store if needed. A damaged tail is dropped first, keeping every intact chunk.
+    A legacy pickle or an older store version is rewritten in the current format first.
+    In 'dictionary' mode the dictionary of the last chunk is reused until the registry retrains it.
+    """
+    if not os.path.exists(path):
+        return write_records(path, records, chunk_size, compression)
+    if not is_record_store(path) or RecordStore(path).magic != MAGIC:
+        existing = load_records(path)
+        write_records(path, itertools.chain(existing, records), chunk_size, compression)
+        return len(RecordStore(path)) - len(existing)
+    store = RecordStore(path)
+    if store.recovered:
+        print(f"[WARNING] {path} had a damaged tail; kept {len(store)} records in {store.chunk_count} chunks")
+    embedded = store.chunk_dictionary(store.chunk_count - 1) \
+        if compression == 'dictionary' and store.chunk_count else None
+    chunks = list(store.chunks)
+    with open(path, 'r+b') as f:
+        f.truncate(store.data_end)
+        f.seek(store.data_end)
+        written = _write_chunks(f, records, chunk_size, chunks, compression, embedded)
+        _write_index(f, chunks)
+        f.flush()
+        os.fsync(f.fileno())
+    return written
+
+
+def iter_records(path):
+    """Yield ProjectRecords from a record store or a legacy pickle (list of records, dicts or listing rows)"""
+    if is_record_store(path):
+        yield from RecordStore(path).iter_records()
+        return
+    with open(path, 'rb') as f:
+        data = pickle.load(f)
+    yield from coerce_records(data)
+
+
+def load_records(path):
+    """All records from a record store or a legacy pickle, as a list"""
+    return list(iter_records(path))
+
+
+def convert_pickle(pickle_path, store_path=None, chunk_size=CHUNK_SIZE):
+    """Rewrite a legacy `.pkl` file as a record store (next to it, with RECORD_EXTENSION, unless `store_path` is given)"""
+    store_path = store_path or os.path.splitext(pickle_path)[0] + RECORD_EXTENSION
+    records = load_records(pickle_path)
+    count = write_records(store_path, records, chunk_size)
+    print(f"[SUCCESS] Converted {count} records from {pickle_path} to {store_path}")
+    return count
+
+
+def migrate_legacy(path):
+    """Return `path`, first converting its legacy `.pkl` counterpart if only that exists.
+
+    The `.pkl` file is left in place; delete it once the `.records` file has been checked.
+    """
+    legacy = os.path.splitext(path)[0] + LEGACY_EXTENSION
+    if not os.path.exists(path) and os.path.exists(legacy):
+        convert_pickle(legacy, path)
+    return path
+
+
+def glob_records(pattern):
+    """Record files matching a `*.records` pattern (checkpoints excluded), migrating legacy `.pkl` matches first"""
+    for legacy in glob.glob(os.path.splitext(pattern)[0] + LEGACY_EXTENSION):
+        if not os.path.splitext(legacy)[0].endswith(CHECKPOINT_SUFFIXES):
+            migrate_legacy(os.path.splitext(legacy)[0] + RECORD_EXTENSION)
+    return sorted(path for path in glob.glob(pattern) if not os.path.splitext(path)[0].endswith(CHECKPOINT_SUFFIXES))
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Usage: python record_store.py <files...>  - checks record files, converts legacy pickles to .records
+    for path in sys.argv[1:]:
+        if path.endswith(RECORD_EXTENSION) and is_record_store(path):
+            store = RecordStore(path)
+            state = 'recovered from a damaged tail' if store.recovered else 'ok'
+            print(f"[INFO] {path}: {len(store)} records in {store.chunk_count} chunks ({state})")
+        else:
+            convert_pickle(path)
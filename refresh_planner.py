@@ -0,0 +1,241 @@
+import hashlib
+import os
+import sqlite3
+import time
+from collections import Counter
+
+# --- Settings ---
+REFRESH_DB = os.path.join('output_data', 'refresh_state.db')
+DAY = 86400
+# (status keyword, first interval in days, longest interval in days), first match wins.
+# Unchanged projects back off from the first interval towards the longest one.
+STATUS_INTERVALS = [
+    ('cancel', 60, 730),
+    ('withdrawn', 60, 730),
+    ('closed', 60, 730),
+    ('inspection complete', 14, 365),
+    ('inspection', 3, 45),
+    ('review', 3, 45),
+    ('registered', 2, 30),
+]
+DEFAULT_INTERVAL = (7, 120)
+BACKOFF = 1.6  # Interval multiplier after a check that found no change
+JITTER = 0.2  # +/- share of the interval, so projects listed together do not all come due together
+REFRESH_BATCH = 200  # Projects re-fetched per refresh run
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    project_number TEXT PRIMARY KEY,
+    status TEXT,
+    listing_hash TEXT,
+    first_seen REAL,
+    last_checked REAL,
+    last_changed REAL,
+    interval REAL,
+    next_due REAL,
+    checks INTEGER NOT NULL DEFAULT 0,
+    changes INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS projects_next_due ON projects (next_due);
+CREATE TABLE IF NOT EXISTS status_history (
+    project_number TEXT,
+    changed_at REAL,
+    old_status TEXT,
+    new_status TEXT
+);
+CREATE INDEX IF NOT EXISTS status_history_project ON status_history (project_number);
+"""
+
+
+def status_intervals(status):
+    """(first, longest) refresh interval in seconds for a ProjectStatus"""
+    lowered = (status or '').lower()
+    for keyword, first, longest in STATUS_INTERVALS:
+        if keyword in lowered:
+            return first * DAY, longest * DAY
+    return DEFAULT_INTERVAL[0] * DAY, DEFAULT_INTERVAL[1] * DAY
+
+
+def listing_hash(record):
+    """Hash of the listing fields a refresh can observe (the scope is not re-fetched)"""
+    fields = (record.project_status, record.project_name, record.facility_name, record.city_id,
+              record.county_id, record.type_of_work, record.estimated_cost)
+    text = '\x1f'.join(' '.join(str(value).split()) if value is not None else '' for value in fields)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def _jittered(project_number, interval):
+    # Deterministic per project, so repeated observations do not drift
+    digest = hashlib.blake2b(project_number.encode('utf-8'), digest_size=2).digest()
+    share = int.from_bytes(digest, 'big') / 0xFFFF - 0.5
+    return interval * (1 + 2 * JITTER * share)
+
+
+class RefreshPlanner:
+    """Tracks each project's last-seen status and change history and decides when to re-check it.
+
+    Every observation (from a listing crawl or a targeted refresh) either resets the
+    project's interval to its status's first interval (something changed) or backs it off
+    towards the status's longest interval (nothing changed). Active statuses are therefore
+    re-checked every few days, closed ones every few months or less.
+    """
+
+    def __init__(self, path=REFRESH_DB):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def observe(self, records, now=None, fresh=None):
+        """Record a sighting of each project; returns (new, changed, unchanged) counts.
+
+        The numbers of new and changed projects are added to the `fresh` set when one is given.
+        """
+        now = now or time.time()
+        new = changed = unchanged = 0
+        with self.conn:
+            for record in records:
+                number = record.project_number
+                if not number:
+                    continue
+                status = record.project_status
+                current_hash = listing_hash(record)
+                first, longest = status_intervals(status)
+                row = self.conn.execute(
+                    'SELECT status, listing_hash, interval FROM projects WHERE project_number = ?',
+                    (number,)).fetchone()
+
+                if row is None:
+                    new += 1
+                    if fresh is not None:
+                        fresh.add(number)
+                    interval = first
+                    self.conn.execute(
+                        'INSERT INTO projects (project_number, status, listing_hash, first_seen, last_checked, '
+                        'last_changed, interval, next_due, checks) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1)',
+                        (number, status, current_hash, now, now, now, interval, now + _jittered(number, interval)))
+                    continue
+
+                old_status, old_hash, old_interval = row
+                if old_hash != current_hash:
+                    changed += 1
+                    if fresh is not None:
+                        fresh.add(number)
+                    interval = first
+                    if old_status != status:
+                        self.conn.execute(
+                            'INSERT INTO status_history (project_number, changed_at, old_status, new_status) '
+                            'VALUES (?, ?, ?, ?)', (number, now, old_status, status))
+                    self.conn.execute(
+                        'UPDATE projects SET status = ?, listing_hash = ?, last_checked = ?, last_changed = ?, '
+                        'interval = ?, next_due = ?, checks = checks + 1, changes = changes + 1 '
+                        'WHERE project_number = ?',
+                        (status, current_hash, now, now, interval, now + _jittered(number, interval), number))
+                else:
+                    unchanged += 1
+                    interval = min(max(old_interval * BACKOFF, first), longest)
+                    self.conn.execute(
+                        'UPDATE projects SET last_checked = ?, interval = ?, next_due = ?, checks = checks + 1 '
+                        'WHERE project_number = ?',
+                        (now, interval, now + _jittered(number, interval), number))
+        return new, changed, unchanged
+
+    def due(self, limit=REFRESH_BATCH, now=None):
+        """Project numbers whose re-check is due, most overdue first"""
+        rows = self.conn.execute(
+            'SELECT project_number FROM projects WHERE next_due <= ? ORDER BY next_due LIMIT ?',
+            (now or time.time(), limit)).fetchall()
+        return [number for number, in rows]
+
+    def history(self, project_number):
+        """(changed_at, old_status, new_status) tuples for one project, oldest first"""
+        return self.conn.execute(
+            'SELECT changed_at, old_status, new_status FROM status_history WHERE project_number = ? '
+            'ORDER BY changed_at', (project_number,)).fetchall()
+
+    def forecast(self, days=30, now=None):
+        """Number of projects coming due on each of the next `days` days (day 0 includes overdue ones)"""
+        now = now or time.time()
+        counts = Counter()
+        rows = self.conn.execute('SELECT next_due FROM projects WHERE next_due < ?', (now + days * DAY,))
+        for next_due, in rows:
+            counts[max(int((next_due - now) // DAY), 0)] += 1
+        return [counts.get(day, 0) for day in range(days)]
+
+    def summary(self):
+        """Tracked projects per status"""
+        return dict(self.conn.execute('SELECT status, COUNT(*) FROM projects GROUP BY status').fetchall())
+
+
+def observe_records(records, path=REFRESH_DB, fresh=None):
+    """Record a listing crawl's sightings in the refresh planner (see RefreshPlanner.observe for `fresh`)"""
+    planner = RefreshPlanner(path)
+    try:
+        new, changed, unchanged = planner.observe(records, fresh=fresh)
+    finally:
+        planner.close()
+    print(f"[INFO] Refresh planner: {new} new, {changed} changed, {unchanged} unchanged projects")
+    return new, changed, unchanged
+
+
+def refresh_due(http_session, limit=REFRESH_BATCH, path=REFRESH_DB):
+    """Re-list the projects that are due and feed the results back into the planner.
+
+    Each project costs one SearchProjects request filtered by its number. Returns the
+    refreshed ProjectRecords.
+    """
+    from by_date import REQUEST_HEADERS, SEARCH_URL, build_form_data
+    from project_record import records_from_listing_page
+
+    planner = RefreshPlanner(path)
+    refreshed = []
+    try:
+        due = planner.due(limit)
+        print(f"[INFO] {len(due)} projects due for a refresh")
+        for project_number in due:
+            form_data = build_form_data(0)
+            form_data['search[value]'] = project_number
+            form_data['columns[8][search][value]'] = ''
+            try:
+                response = http_session.post(SEARCH_URL, data=form_data, headers=REQUEST_HEADERS, timeout=30)
+                response.raise_for_status()
+                rows = response.json().get('data', [])
+            except Exception as e:
+                print(f"[WARNING] Could not refresh project {project_number}: {e}")
+                continue
+            matches = [record for record in records_from_listing_page(rows) if record.project_number == project_number]
+            if matches:
+                refreshed.append(matches[0])
+            else:
+                print(f"[WARNING] Project {project_number} no longer appears in the listing")
+        new, changed, unchanged = planner.observe(refreshed)
+        print(f"[SUCCESS] Refreshed {len(refreshed)} projects: {changed} changed, {unchanged} unchanged")
+    finally:
+        planner.close()
+    return refreshed
+
+
+if __name__ == "__main__":
+    import requests
+    from http.cookiejar import MozillaCookieJar
+    from rollups import ingest_records
+    from http_fixtures import install_fixtures
+
+    COOKIE_FILE = 'cookies.txt'
+    session = install_fixtures(requests.Session())
+    session.cookies = MozillaCookieJar(COOKIE_FILE)
+    if os.path.exists(COOKIE_FILE):
+        session.cookies.load(ignore_discard=True, ignore_expires=True)
+
+    refreshed = refresh_due(session)
+    if refreshed:
+        ingest_records(refreshed)
+
+    planner = RefreshPlanner()
+    print(f"[INFO] Projects due per day over the next 14 days: {planner.forecast(14)}")
+    planner.close()
@@ -0,0 +1,166 @@
+import contextlib
+import os
+import pickle
+from collections import defaultdict
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; concurrent ingests are then not serialized
+    fcntl = None
+
+# --- Settings ---
+OUTPUT_DATA_FOLDER = 'output_data'
+ROLLUP_FILE = os.path.join(OUTPUT_DATA_FOLDER, 'rollups.pkl')
+
+DIMENSIONS = ('county', 'month', 'type_of_work')
+
+
+class RollupCube:
+    """Pre-aggregated counts and EstimatedCost sums by county x month x TypeOfWork.
+
+    Records are ingested as they are listed; each project is remembered by number so a
+    re-listed project is counted once (and moved if its county, month, type or cost changed).
+    Records without a project number cannot be recognized again and are skipped.
+    Queries only touch the aggregated cells, never raw rows.
+    """
+
+    def __init__(self):
+        self.cells = defaultdict(lambda: [0, 0.0])  # (county_id, month, type_of_work) -> [count, cost_sum]
+        self.projects = {}  # project_number -> ((county_id, month, type_of_work), cost)
+
+    def __getstate__(self):
+        return {'cells': dict(self.cells), 'projects': self.projects}
+
+    def __setstate__(self, state):
+        self.cells = defaultdict(lambda: [0, 0.0], state['cells'])
+        self.projects = state['projects']
+
+    # --- Ingest ---
+    def ingest(self, record):
+        """Add one ProjectRecord; returns True if the cube changed"""
+        if not record.project_number:
+            return False
+        key = (record.county_id, record.month, record.type_of_work)
+        cost = record.estimated_cost or 0.0
+        previous = self.projects.get(record.project_number)
+        if previous == (key, cost):
+            return False
+        if previous is not None:
+            old_key, old_cost = previous
+            cell = self.cells[old_key]
+            cell[0] -= 1
+            cell[1] -= old_cost
+            if cell[0] <= 0:
+                del self.cells[old_key]
+        cell = self.cells[key]
+        cell[0] += 1
+        cell[1] += cost
+        self.projects[record.project_number] = (key, cost)
+        return True
+
+    def ingest_many(self, records):
+        """Add many records; returns how many changed the cube"""
+        return sum(1 for record in records if self.ingest(record))
+
+    # --- Queries ---
+    def _matching_cells(self, counties=None, month_from=None, month_to=None, types_of_work=None):
+        for (county_id, month, type_of_work), (count, cost) in self.cells.items():
+            if counties is not None and county_id not in counties:
+                continue
+            if month_from is not None and (month is None or month < month_from):
+                continue
+            if month_to is not None and (month is None or month > month_to):
+                continue
+            if types_of_work is not None and type_of_work not in types_of_work:
+                continue
+            yield (county_id, month, type_of_work), count, cost
+
+    def slice(self, counties=None, month_from=None, month_to=None, types_of_work=None):
+        """Total (count, cost_sum) for the cells matching the filters.
+
+        `counties` are LOOKUP county IDs; months are 'YYYY-MM' strings (inclusive bounds).
+        """
+        total_count, total_cost = 0, 0.0
+        for _, count, cost in self._matching_cells(counties, month_from, month_to, types_of_work):
+            total_count += count
+            total_cost += cost
+        return total_count, total_cost
+
+    def rollup(self, by=('county',), **filters):
+        """Group matching cells by a subset of DIMENSIONS; returns {group_key: (count, cost_sum)}"""
+        positions = [DIMENSIONS.index(dimension) for dimension in by]
+        groups = defaultdict(lambda: [0, 0.0])
+        for key, count, cost in self._matching_cells(**filters):
+            group = groups[tuple(key[i] for i in positions)]
+            group[0] += count
+            group[1] += cost
+        return {group_key: (count, cost) for group_key, (count, cost) in groups.items()}
+
+    def trend(self, **filters):
+        """Monthly (count, cost_sum) series for the matching cells, oldest month first"""
+        series = self.rollup(by=('month',), **filters)
+        return [(month, totals) for (month,), totals in sorted(series.items(), key=lambda x: x[0][0] or '')]
+
+
+def load_rollups(path=ROLLUP_FILE):
+    """Load the persisted cube, or start an empty one"""
+    if os.path.exists(path):
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except Exception as e:
+            print(f"[WARNING] Could not load rollups from {path}: {e}. Starting empty.")
+    return RollupCube()
+
+
+def save_rollups(cube, path=ROLLUP_FILE):
+    """Persist the cube atomically"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(cube, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+@contextlib.contextmanager
+def rollups_lock(path=ROLLUP_FILE):
+    """Exclusive lock on the cube file across processes (a no-op without fcntl)"""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(f"{path}.lock", 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def ingest_records(records, path=ROLLUP_FILE):
+    """Load the cube, ingest records and save it back; returns the number of changed projects.
+
+    The load-ingest-save runs under rollups_lock(), so scripts ingesting at the same time
+    do not overwrite each other's updates.
+    """
+    with rollups_lock(path):
+        cube = load_rollups(path)
+        changed = cube.ingest_many(records)
+        if changed:
+            save_rollups(cube, path)
+    print(f"[INFO] Rollups updated: {changed} projects changed, {len(cube.cells)} cells")
+    return changed
+
+
+if __name__ == "__main__":
+    from project_record import COUNTY_IDS
+
+    cube = load_rollups()
+    print(f"[INFO] Loaded rollups: {len(cube.projects)} projects in {len(cube.cells)} cells")
+
+    # Example: monthly trend for a few counties
+    counties = {COUNTY_IDS[name] for name in ['Martin', 'Midland', 'Ector'] if name in COUNTY_IDS}
+    for month, (count, cost) in cube.trend(counties=counties):
+        print(f"  {month}: {count} projects, ${cost:,.0f} estimated")
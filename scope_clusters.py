@@ -0,0 +1,167 @@
+import random
+import re
+import zlib
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; signatures fall back to pure Python
+    np = None
+
+# --- Settings ---
+NUM_PERM = 64  # MinHash signature length
+BANDS = 16  # LSH bands (NUM_PERM must be divisible by BANDS)
+SHINGLE_SIZE = 3  # Words per shingle
+SIMILARITY_THRESHOLD = 0.6  # Minimum estimated Jaccard similarity to join a cluster
+SEED = 1
+
+_PRIME = (1 << 31) - 1
+_WORD_RE = re.compile(r'[a-z0-9]+')
+_DIGITS_RE = re.compile(r'\d+')
+
+
+def _permutations(num_perm=NUM_PERM, seed=SEED):
+    rng = random.Random(seed)
+    return [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Hashed word shingles of a scope (the whole text if it is shorter than one shingle).
+
+    Numbers are masked, so templates that differ only in square footage or counts match.
+    """
+    words = _WORD_RE.findall(_DIGITS_RE.sub('0', text.lower()))
+    if len(words) <= size:
+        return {zlib.crc32(' '.join(words).encode('utf-8')) % _PRIME}
+    return {zlib.crc32(' '.join(words[i:i + size]).encode('utf-8')) % _PRIME
+            for i in range(len(words) - size + 1)}
+
+
+class ScopeClusterer:
+    """Streaming near-duplicate clustering of scopes with MinHash signatures and LSH banding.
+
+    Each added scope is hashed into BANDS buckets; it joins the cluster of the first
+    earlier scope it shares a bucket with, provided their estimated similarity clears
+    SIMILARITY_THRESHOLD. Work per scope is constant, so the whole run is linear rather
+    than pairwise.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, bands=BANDS, threshold=SIMILARITY_THRESHOLD, seed=SEED):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.perms = _permutations(num_perm, seed)
+        if np is not None:
+            self._a = np.array([a for a, _ in self.perms], dtype=np.uint64)[:, None]
+            self._b = np.array([b for _, b in self.perms], dtype=np.uint64)[:, None]
+        self.signatures = []  # array('I') per added scope
+        self.buckets = {}  # (band, band signature) -> first item index
+        self.parent = []  # union-find over item indexes
+
+    def signature(self, text):
+        hashes = shingles(text)
+        if np is not None:
+            values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))[None, :]
+            return array('I', ((self._a * values + self._b) % _PRIME).min(axis=1).tolist())
+        return array('I', (min((a * h + b) % _PRIME for h in hashes) for a, b in self.perms))
+
+    def _find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def _similarity(self, i, j):
+        sig_i, sig_j = self.signatures[i], self.signatures[j]
+        return sum(1 for x, y in zip(sig_i, sig_j) if x == y) / self.num_perm
+
+    def add(self, text):
+        """Add one scope; returns its item index"""
+        index = len(self.signatures)
+        sig = self.signature(text or '')
+        self.signatures.append(sig)
+        self.parent.append(index)
+
+        rows = self.rows
+        for band in range(self.bands):
+            key = (band, tuple(sig[band * rows:(band + 1) * rows]))
+            other = self.buckets.get(key)
+            if other is None:
+                self.buckets[key] = index
+            elif self._find(other) != self._find(index) and self._similarity(index, other) >= self.threshold:
+                # Merge into the earlier item's cluster
+                self.parent[self._find(index)] = self._find(other)
+        return index
+
+    def cluster_ids(self, keys):
+        """Cluster ID per item: the smallest of its members' `keys`.
+
+        The ID does not depend on the order items were added or on how many clusters there
+        are, so a cluster keeps its ID from one snapshot to the next.
+        """
+        smallest = {}
+        roots = [self._find(i) for i in range(len(self.parent))]
+        for root, key in zip(roots, keys):
+            if root not in smallest or _key_order(key) < _key_order(smallest[root]):
+                smallest[root] = key
+        return [smallest[root] for root in roots]
+
+
+def _key_order(key):
+    # Numeric order for same-prefix project numbers (TABS9 < TABS11); scope hashes last
+    return key.startswith('~'), len(key), key
+
+
+def cluster_key(record):
+    """Stable key of a clustered record: its project number, else a hash of its scope (sorts after numbers)"""
+    if record.project_number:
+        return record.project_number
+    return f"~{zlib.crc32(' '.join(record.scope_of_work.split()).lower().encode('utf-8')):08x}"
+
+
+def assign_clusters(records, **clusterer_options):
+    """Cluster the scopes of `records` and store the result in each record's cluster_id.
+
+    A cluster's ID is the smallest project number among its members (see cluster_key), so
+    IDs match across snapshots. Records without a scope get cluster_id None. Returns the
+    number of clusters.
+    """
+    clusterer = ScopeClusterer(**clusterer_options)
+    with_scope = []
+    for record in records:
+        if record.has_scope:
+            clusterer.add(record.scope_of_work)
+            with_scope.append(record)
+        else:
+            record.cluster_id = None
+    ids = clusterer.cluster_ids([cluster_key(record) for record in with_scope])
+    for record, cluster_id in zip(with_scope, ids):
+        record.cluster_id = cluster_id
+    cluster_count = len(set(ids))
+    print(f"[INFO] Clustered {len(with_scope)} scopes into {cluster_count} near-duplicate groups")
+    return cluster_count
+
+
+def cluster_representatives(records):
+    """Map cluster_id -> (representative record, cluster size).
+
+    The representative is the record the ID was taken from (the same one in every snapshot),
+    or the first record of the cluster if that one is not in `records`.
+    """
+    representatives = {}
+    for record in records:
+        cluster_id = getattr(record, 'cluster_id', None)
+        if cluster_id is None:
+            continue
+        entry = representatives.get(cluster_id)
+        if entry is None:
+            representatives[cluster_id] = [record, 1]
+        else:
+            entry[1] += 1
+            if record.project_number == cluster_id:
+                entry[0] = record
+    return {cluster_id: (record, size) for cluster_id, (record, size) in representatives.items()}
@@ -1,13 +1,18 @@
 import os
 import requests
 from http.cookiejar import MozillaCookieJar
+from profiling import enable_profiling, stage
+from http_fixtures import install_fixtures
+from listing_cache import install_listing_cache
 
 # Constants
 COOKIE_FILE = 'cookies.txt'
 SEARCH_URL = 'https://www.tdlr.texas.gov/TABS/Search/SearchProjects'
 
+enable_profiling('search')
+
 # Setup session
-session = requests.Session()
+session = install_listing_cache(install_fixtures(requests.Session()), SEARCH_URL)
 session.cookies = MozillaCookieJar(COOKIE_FILE)
 if os.path.exists(COOKIE_FILE):
     session.cookies.load(ignore_discard=True, ignore_expires=True)
@@ -95,7 +100,8 @@ headers = {
     'Content-Type': 'application/x-www-form-urlencoded'
 }
 
-response = session.post(SEARCH_URL, data=form_data, headers=headers)
+with stage('listing'):
+    response = session.post(SEARCH_URL, data=form_data, headers=headers)
 
 # Handle response
 if response.ok:
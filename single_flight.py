@@ -0,0 +1,89 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+import metrics
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one in-flight call.
+
+    The first caller for a key (the leader) runs the function; callers arriving while it
+    runs (followers) wait for the leader's result or exception instead of repeating the
+    work. Once the call finishes the key is released, so later calls run again; this
+    removes duplicate work, it is not a cache.
+
+    In-flight calls are tracked as concurrent.futures.Future objects, so threads (do) and
+    asyncio tasks (do_async) share one registry: a coroutine can follow a thread's fetch
+    and the other way round. A follower that is cancelled stops waiting without affecting
+    the leader or the other followers.
+
+    Coalescing only covers callers in the same process. Overlapping jobs in separate
+    processes (e.g. by_date.py and fetch_project_details.py running at the same time)
+    each make their own request; listing_cache.py and work_queue.py are the cross-process
+    mechanisms.
+    """
+
+    def __init__(self, name='single_flight'):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def _join(self, key):
+        """(future, is_leader) for `key`"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                metrics.SINGLE_FLIGHT.inc(flight=self.name, role='follower')
+                return future, False
+            future = self._calls[key] = Future()
+            future.set_running_or_notify_cancel()  # A running future cannot be cancelled by a follower
+        metrics.SINGLE_FLIGHT.inc(flight=self.name, role='leader')
+        return future, True
+
+    def _finish(self, key, future, result=None, error=None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def do(self, key, fn, *args, **kwargs):
+        """Call fn(*args, **kwargs) unless a call for `key` is already running; either way return its result"""
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def do_async(self, key, fn, *args, **kwargs):
+        """Await fn(*args, **kwargs) unless a call for `key` is already running; either way return its result"""
+        future, leader = self._join(key)
+        if not leader:
+            # Shielded, so cancelling this follower does not cancel the shared future
+            return await asyncio.shield(asyncio.wrap_future(future))
+        try:
+            result = await fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+
+# Detail page fetches keyed by project number. The thread (by_date.py, watch.py) and coroutine
+# (fetch_project_details.py) fetchers both return a (details, error) tuple, so within one process
+# any of them can follow another's call for the same project
+DETAIL_FLIGHTS = SingleFlight('detail')
@@ -0,0 +1,225 @@
+import glob
+import hashlib
+import json
+import os
+from datetime import datetime
+
+# --- Settings ---
+FINGERPRINT_SUFFIX = '_fingerprints.tsv'
+CHANGE_LOG_SUFFIX = '_changes.jsonl'
+WINDOW_KEYS = ('cutoff', 'type_of_work')  # Listing parameters two snapshots must share to be diffed
+
+_FIELD_SEP = '\x1f'
+_NO_DATE = ('', 'N/A')
+
+
+def _hash(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def _normalize(value):
+    if value is None:
+        return ''
+    return ' '.join(str(value).split()).lower()
+
+
+def fingerprint(record):
+    """Return (record_hash, status, scope_hash) for a ProjectRecord.
+
+    The record hash covers every normalized listing field plus the scope, so any change
+    shows up; status and scope hash are kept separately to say what changed.
+    """
+    scope_hash = _hash(_normalize(record.scope_of_work))
+    fields = (
+        _normalize(record.project_name), record.date_str, _normalize(record.facility_name),
+        str(record.city_id), str(record.county_id), _normalize(record.project_status),
+        _normalize(record.type_of_work), str(record.estimated_cost), scope_hash,
+    )
+    status = ' '.join(str(record.project_status or '').split())
+    return _hash(_FIELD_SEP.join(fields)), status, scope_hash
+
+
+def fingerprint_path(snapshot_path):
+    """Fingerprint index file that sits next to a snapshot record file"""
+    return os.path.splitext(snapshot_path)[0] + FINGERPRINT_SUFFIX
+
+
+def change_log_path(snapshot_path):
+    return os.path.splitext(snapshot_path)[0] + CHANGE_LOG_SUFFIX
+
+
+def write_fingerprint_index(records, path, header=None):
+    """Write a fingerprint index sorted by project number.
+
+    Lines are `project_number, record_hash, status, scope_hash, date` (tab-separated), after
+    `#key=value` header lines: the earliest date covered, so a later diff knows the snapshot's
+    window, plus `header` (e.g. the listing parameters and the run timestamp).
+    """
+    rows = []
+    min_date = None
+    for record in records:
+        if not record.project_number:
+            continue
+        record_hash, status, scope_hash = fingerprint(record)
+        rows.append((record.project_number, record_hash, status, scope_hash, record.date_str))
+        if record.created_on and (min_date is None or record.date_str < min_date):
+            min_date = record.date_str
+    rows.sort()
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(f"#min_date={min_date or ''}\n")
+        for key, value in sorted((header or {}).items()):
+            f.write(f"#{key}={value}\n")
+        for row in rows:
+            f.write('\t'.join(field.replace('\t', ' ') for field in row) + '\n')
+    os.replace(tmp_path, path)
+    return len(rows)
+
+
+def read_header(path):
+    """The `#key=value` header fields of a fingerprint index as a dict"""
+    header = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.startswith('#'):
+                break
+            key, _, value = line[1:].rstrip('\n').partition('=')
+            header[key] = value
+    return header
+
+
+def iter_fingerprints(path):
+    """Stream (project_number, record_hash, status, scope_hash, date) tuples from an index"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('#'):
+                continue
+            yield tuple(line.rstrip('\n').split('\t'))
+
+
+def _in_window(date_str, min_date):
+    """True if an ISO date falls inside a snapshot window starting at `min_date` (no window: always).
+
+    Undated projects cannot be placed in the window, so they count as outside it.
+    """
+    if not min_date:
+        return True
+    return date_str not in _NO_DATE and date_str >= min_date
+
+
+def diff_fingerprints(old_path, new_path):
+    """Merge-join two sorted fingerprint indexes and yield change entries.
+
+    Only one line of each file is held in memory at a time. Projects missing from the new
+    snapshot are reported as removed only if they fall inside the new snapshot's date window
+    (undated projects never do).
+    """
+    new_min_date = read_header(new_path).get('min_date', '')
+    old_iter = iter_fingerprints(old_path)
+    new_iter = iter_fingerprints(new_path)
+    old = next(old_iter, None)
+    new = next(new_iter, None)
+
+    while old is not None or new is not None:
+        if new is None or (old is not None and old[0] < new[0]):
+            if _in_window(old[4], new_min_date):
+                yield {'op': 'removed', 'project_number': old[0], 'old_status': old[2]}
+            old = next(old_iter, None)
+        elif old is None or new[0] < old[0]:
+            yield {'op': 'added', 'project_number': new[0], 'new_status': new[2]}
+            new = next(new_iter, None)
+        else:
+            if old[1] != new[1]:
+                changed = []
+                if old[2] != new[2]:
+                    changed.append('status')
+                if old[3] != new[3]:
+                    changed.append('scope')
+                if not changed:
+                    changed.append('fields')
+                yield {'op': 'changed', 'project_number': new[0], 'changed': changed,
+                       'old_status': old[2], 'new_status': new[2]}
+            old = next(old_iter, None)
+            new = next(new_iter, None)
+
+
+def write_change_log(changes, path):
+    """Write change entries as JSON Lines; returns counts per operation"""
+    counts = {'added': 0, 'changed': 0, 'removed': 0}
+    with open(path, 'w', encoding='utf-8') as f:
+        for change in changes:
+            counts[change['op']] += 1
+            f.write(json.dumps(change) + '\n')
+    return counts
+
+
+def find_previous_index(current_index_path):
+    """Latest earlier run's fingerprint index in the same folder with the same window, or None.
+
+    Runs are ordered by the `run` timestamp in their headers, not by file mtime. Only indexes
+    with the same WINDOW_KEYS values are candidates, so a snapshot listed with another cutoff
+    or type of work is never used as the baseline (nor is an index without a run timestamp).
+    """
+    current = read_header(current_index_path)
+    folder = os.path.dirname(current_index_path) or '.'
+    best_run = best_path = None
+    for path in glob.glob(os.path.join(folder, f'*{FINGERPRINT_SUFFIX}')):
+        if os.path.abspath(path) == os.path.abspath(current_index_path):
+            continue
+        header = read_header(path)
+        run = header.get('run')
+        if not run or run >= current.get('run', '') or \
+                any(header.get(key) != current.get(key) for key in WINDOW_KEYS):
+            continue
+        if best_run is None or run > best_run:
+            best_run, best_path = run, path
+    return best_path
+
+
+def diff_snapshot(records, snapshot_path, window=None):
+    """Fingerprint a new snapshot, diff it against the previous one and write the change log.
+
+    `window` holds the listing parameters of the snapshot (WINDOW_KEYS, e.g. {'cutoff':
+    '2025-11-17', 'type_of_work': ''}); only an earlier snapshot with the same ones is
+    diffed against. Returns the change log path, or None when there is no such snapshot.
+    """
+    index_path = fingerprint_path(snapshot_path)
+    # Re-fingerprinting a snapshot keeps the time of the run that produced it
+    run = read_header(index_path).get('run') if os.path.exists(index_path) else None
+    header = {key: str((window or {}).get(key, '')) for key in WINDOW_KEYS}
+    header['run'] = run or datetime.now().isoformat(timespec='microseconds')
+    write_fingerprint_index(records, index_path, header)
+
+    previous = find_previous_index(index_path)
+    if previous is None:
+        print("[INFO] No previous snapshot with the same window found; every project is new.")
+        return None
+
+    log_path = change_log_path(snapshot_path)
+    counts = write_change_log(diff_fingerprints(previous, index_path), log_path)
+    print(f"[INFO] Changes since {os.path.basename(previous)}: "
+          f"{counts['added']} added, {counts['changed']} changed, {counts['removed']} removed -> {log_path}")
+    return log_path
+
+
+def load_changed_numbers(log_path, ops=('added', 'changed')):
+    """Project numbers from a change log whose operation is in `ops`"""
+    numbers = set()
+    with open(log_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            change = json.loads(line)
+            if change['op'] in ops:
+                numbers.add(change['project_number'])
+    return numbers
+
+
+def filter_delta(records, log_path):
+    """Yield only the records that were added or changed according to a change log"""
+    if log_path is None:
+        yield from records
+        return
+    changed = load_changed_numbers(log_path)
+    for record in records:
+        if record.project_number in changed:
+            yield record
@@ -0,0 +1,127 @@
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; fall back to the standard library
+    np = None
+
+# --- Settings ---
+MAX_CACHE_ENTRIES = 200000  # Decoded values kept in memory; the least recently used are evicted first
+
+_DATE_RE = re.compile(r'/Date\((-?\d+)(?:[-+]\d{4})?\)/')
+_MS_PER_HOUR = 3600 * 1000
+_EPOCH = datetime(1970, 1, 1)
+
+_MISSING = object()
+
+_date_cache = OrderedDict()
+_offset_cache = {}
+
+
+def _local_offset_ms(timestamp_ms):
+    """Local UTC offset (in ms) at the given instant, cached per hour so DST is respected"""
+    hour = timestamp_ms // _MS_PER_HOUR
+    offset = _offset_cache.get(hour)
+    if offset is None:
+        offset = _offset_cache[hour] = time.localtime(hour * 3600).tm_gmtoff * 1000
+    return offset
+
+
+def _parse_fallback(date_str):
+    try:
+        return datetime.strptime(date_str.split('T')[0], '%Y-%m-%d').date()
+    except ValueError:
+        print(f"[WARNING] Could not parse date string: {date_str} with common formats.")
+        return None
+
+
+def _convert_ms(timestamps_ms):
+    """Convert epoch milliseconds to local calendar dates.
+
+    With NumPy the UTC offset is looked up once per distinct hour and the shift and day
+    truncation run as array operations; without it each value is converted in Python.
+    """
+    if np is not None:
+        ms = np.array(timestamps_ms, dtype='int64')
+        hours, positions = np.unique(ms // _MS_PER_HOUR, return_inverse=True)
+        offsets = np.array([_local_offset_ms(int(hour) * _MS_PER_HOUR) for hour in hours], dtype='int64')
+        days = (ms + offsets[positions]).astype('datetime64[ms]').astype('datetime64[D]')
+        return days.tolist()
+    return [(_EPOCH + timedelta(milliseconds=ms + _local_offset_ms(ms))).date() for ms in timestamps_ms]
+
+
+def _cached(date_str):
+    """Memoized value for `date_str` (marked as recently used), or _MISSING"""
+    value = _date_cache.get(date_str, _MISSING)
+    if value is not _MISSING:
+        _date_cache.move_to_end(date_str)
+    return value
+
+
+def decode_tdlr_dates(date_strs):
+    """Decode a batch (e.g. one listing page) of TDLR date strings into datetime.date objects.
+
+    Handles the `/Date(ms)/` values returned by SearchProjects as well as plain ISO dates.
+    Each string is matched once; the uncached timestamps of the batch are then converted
+    together (see _convert_ms). Results are kept in an LRU cache of MAX_CACHE_ENTRIES raw
+    strings, so repeated lookups of the same record are free.
+    Returns a list aligned with `date_strs`, with None for empty or unparseable values.
+    """
+    results = [None] * len(date_strs)
+    pending_positions = []
+    pending_values = []
+    pending_ms = []
+
+    for i, date_str in enumerate(date_strs):
+        if not date_str:
+            continue
+        cached = _cached(date_str)
+        if cached is not _MISSING:
+            results[i] = cached
+            continue
+        match = _DATE_RE.match(date_str)
+        if match:
+            pending_positions.append(i)
+            pending_values.append(date_str)
+            pending_ms.append(int(match.group(1)))
+        else:
+            results[i] = _remember(date_str, _parse_fallback(date_str))
+
+    if pending_ms:
+        try:
+            converted = _convert_ms(pending_ms)
+        except (ValueError, OverflowError, OSError):
+            converted = [_convert_one(ms) for ms in pending_ms]
+        for i, date_str, value in zip(pending_positions, pending_values, converted):
+            results[i] = _remember(date_str, value)
+
+    return results
+
+
+def _convert_one(timestamp_ms):
+    try:
+        return datetime.fromtimestamp(timestamp_ms / 1000).date()
+    except (ValueError, OverflowError, OSError):
+        print(f"[WARNING] Could not convert timestamp: {timestamp_ms}")
+        return None
+
+
+def _remember(date_str, value):
+    _date_cache[date_str] = value
+    _date_cache.move_to_end(date_str)
+    while len(_date_cache) > MAX_CACHE_ENTRIES:
+        _date_cache.popitem(last=False)
+    return value
+
+
+def parse_tdlr_date_str(date_str_from_json):
+    """Decode a single TDLR date string (see decode_tdlr_dates)"""
+    if not date_str_from_json:
+        return None
+    cached = _cached(date_str_from_json)
+    if cached is not _MISSING:
+        return cached
+    return decode_tdlr_dates([date_str_from_json])[0]
@@ -0,0 +1,38 @@
+from datetime import date
+
+import pytest
+
+pytest.importorskip('bs4')
+pytest.importorskip('lxml')
+
+from detail_extractor import extract_details  # noqa: E402
+
+PAGE = """<html><body>
+<h2>Project Information</h2>
+<dl><dt>Address:</dt><dd>1 Main St</dd><dt>Scope of Work:</dt><dd>New roof</dd></dl>
+<h2>Owner Information</h2>
+<dl><dt>Name:</dt><dd><dl><dt>Name:</dt><dd>ACME</dd></dl></dd><dt>Address:</dt><dd>2 Oak St</dd></dl>
+<h2>Tenant</h2>
+<dl><dt>Name:</dt><dd>Shop LLC</dd></dl>
+<h3>Inspections</h3>
+<dl><dt>Inspection Date:</dt><dd>01/02/2025</dd><dt>Inspection Date:</dt><dd>03/04/2025</dd></dl>
+</body></html>"""
+
+
+def test_repeated_labels_are_qualified_by_section():
+    details = extract_details(PAGE)
+    assert details['location_address'] == '1 Main St'
+    assert details['owner_address'] == '2 Oak St'
+    assert details['tenant_name'] == 'Shop LLC'
+
+
+def test_nested_dl_stays_inside_its_value():
+    details = extract_details(PAGE)
+    assert details['owner_name'] == 'ACME'
+    assert 'name' not in details
+
+
+def test_repeats_in_one_section_are_kept_as_a_list():
+    details = extract_details(PAGE)
+    assert details['inspection_date'] == [date(2025, 1, 2), date(2025, 3, 4)]
+    assert details['scope_of_work'] == 'New roof'
@@ -0,0 +1,50 @@
+from fetch_scheduler import RETRY_DELAY, FetchScheduler
+from project_record import ProjectRecord
+
+
+def make_scheduler(records):
+    now = [0.0]
+    return FetchScheduler(records, clock=lambda: now[0]), now
+
+
+def numbers(scheduler):
+    popped = []
+    while True:
+        record = scheduler.pop()
+        if record is None:
+            return popped
+        popped.append(record.project_number)
+
+
+def test_records_without_a_number_are_passed_through_last():
+    records = [ProjectRecord(project_number=None), ProjectRecord(project_number='TABS2', estimated_cost=5e6),
+               ProjectRecord(project_number='TABS1', estimated_cost=1e3)]
+    scheduler, _ = make_scheduler(records)
+    assert len(scheduler) == 3
+    assert numbers(scheduler) == ['TABS2', 'TABS1', None]
+    assert len(scheduler) == 0
+
+
+def test_urgent_push_goes_first():
+    records = [ProjectRecord(project_number='TABS2', estimated_cost=5e6),
+               ProjectRecord(project_number='TABS1', estimated_cost=1e3)]
+    scheduler, _ = make_scheduler(records)
+    scheduler.push(records[1], urgent=True)
+    assert numbers(scheduler) == ['TABS1', 'TABS2']
+
+
+def test_retry_waits_before_it_is_eligible():
+    record = ProjectRecord(project_number='TABS1')
+    scheduler, now = make_scheduler([record])
+    assert scheduler.pop() is record
+    assert scheduler.retry(record)
+    assert len(scheduler) == 1
+    assert scheduler.pop() is None
+    assert scheduler.wait_time() == RETRY_DELAY
+    now[0] += RETRY_DELAY
+    assert scheduler.pop() is record
+    assert scheduler.retry(record)
+    assert scheduler.wait_time() == RETRY_DELAY * 2
+    now[0] += RETRY_DELAY * 2
+    assert scheduler.pop() is record
+    assert not scheduler.retry(record)  # MAX_FETCH_ATTEMPTS used up
@@ -0,0 +1,40 @@
+import io
+from datetime import date
+
+import output_writers
+from output_writers import CountedRows, iter_output, iter_table, select_rows, write_output
+from project_record import ProjectRecord
+
+
+def make_records(count):
+    return [ProjectRecord(project_number=f"TABS{i}", project_name="Name " * (i % 4 + 1), created_on=date(2025, 1, 1),
+                          scope_of_work="Scope text " * (i * 3)) for i in range(1, count + 1)]
+
+
+def test_table_blocks_form_one_grid():
+    records = make_records(7)
+    text = ''.join(iter_table(select_rows(records), block_rows=3))
+    lines = text.splitlines()
+    assert sum(1 for line in lines if line.startswith('| No.')) == 1
+    assert sum(1 for line in lines if line.startswith('+=')) == 1
+    assert len({len(line) for line in lines}) == 1
+    assert all(f"TABS{i} " in text for i in range(1, 8))
+
+
+def test_empty_table_has_only_the_header():
+    lines = ''.join(iter_output([], 'table')).splitlines()
+    assert len(lines) == 3
+    assert lines[1].startswith('| No.')
+
+
+def test_counted_rows_counts_consumed_rows():
+    rows = CountedRows(select_rows(make_records(5), limit=3))
+    assert [i for i, _ in rows] == [1, 2, 3]
+    assert rows.count == 3
+
+
+def test_write_output_returns_row_count():
+    stream = io.StringIO()
+    assert write_output(make_records(4), 'table', [stream], limit=2) == 2
+    assert 'TABS2' in stream.getvalue() and 'TABS3' not in stream.getvalue()
+    assert output_writers.TABLE_HEADERS[0] in stream.getvalue()
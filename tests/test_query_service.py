@@ -0,0 +1,108 @@
+import json
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from project_record import COUNTY_IDS, ProjectRecord
+from query_service import PermitIndex, QueryService
+from record_store import write_records
+
+COUNTIES = ['Anderson', 'Andrews', 'Angelina', 'Aransas']
+STATUSES = ['Project Registered', 'Review Complete', 'Project Closed']
+TYPES = ['New Construction', 'Renovation/Alteration']
+
+
+def make_records(count=300, seed=7):
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        created_on = date(2024, 1, 1) + timedelta(days=rng.randrange(120)) if i % 17 else None
+        records.append(ProjectRecord(
+            project_number=f"TABS{i:05d}" if i % 29 else None, project_name=f"Project {i}",
+            created_on=created_on, county_id=COUNTY_IDS[rng.choice(COUNTIES)],
+            project_status=rng.choice(STATUSES), type_of_work=rng.choice(TYPES),
+            scope_of_work=rng.choice(['EV charging stations', 'Interior finish-out', 'Roof replacement'])))
+    return records
+
+
+def brute_force(index, counties=(), statuses=(), date_from=None, date_to=None, terms=(), exclude=None):
+    exclude = exclude or {}
+    matches = []
+    for position, record in enumerate(index.records):
+        if counties and record.county_name not in counties:
+            continue
+        if statuses and record.project_status not in statuses:
+            continue
+        if (date_from or date_to) and record.created_on is None:
+            continue
+        if date_from and record.created_on < date_from:
+            continue
+        if date_to and record.created_on > date_to:
+            continue
+        if record.project_status in exclude.get('status', ()) or record.county_name in exclude.get('county', ()):
+            continue
+        text = f"{record.project_name} {record.scope_of_work}".lower()
+        if terms and not any(term.lower() in text for term in terms):
+            continue
+        matches.append(position)
+    return matches
+
+
+@pytest.mark.parametrize('filters', [
+    {},
+    {'counties': ['Anderson', 'Aransas']},
+    {'date_from': date(2024, 2, 1), 'date_to': date(2024, 2, 29)},
+    {'date_from': date(2024, 3, 15)},
+    {'date_to': date(2024, 1, 10), 'statuses': ['Project Registered']},
+    {'exclude': {'status': ['Project Closed']}},
+    {'counties': ['andrews'], 'exclude': {'county': ['Andrews']}},
+    {'date_from': date(2024, 2, 1), 'exclude': {'status': ['Project Closed', 'Review Complete']}, 'terms': ['EV']},
+])
+def test_positions_match_a_brute_force_scan(filters):
+    index = PermitIndex(make_records())
+    expected = brute_force(index, counties=[c.title() for c in filters.get('counties', ())],
+                           **{key: value for key, value in filters.items() if key != 'counties'})
+    assert list(index.positions(**filters)) == expected
+
+
+def test_index_is_date_sorted_with_undated_records_last():
+    index = PermitIndex(make_records())
+    dated = [record.created_on for record in index.records if record.created_on]
+    assert dated == sorted(dated)
+    assert index.dates == dated
+    assert all(record.created_on is None for record in index.records[len(dated):])
+    positions = index.positions()
+    newest = index.newest_first(list(positions))
+    assert index.records[newest[0]].created_on == dated[-1]
+    assert index.records[newest[-1]].created_on is None
+
+
+def test_with_records_replaces_by_number_and_bumps_the_generation():
+    index = PermitIndex(make_records(), generation=3)
+    replaced = ProjectRecord(project_number='TABS00001', project_status='Project Closed', created_on=date(2024, 6, 1),
+                             county_id=COUNTY_IDS['Anderson'])
+    updated = index.with_records([replaced])
+    assert updated.generation == 4
+    assert len(updated.records) == len(index.records)
+    assert updated.by_number['TABS00001'] is replaced
+    assert updated.records[updated.positions(date_from=date(2024, 6, 1))[0]] is replaced
+
+
+def test_service_caches_per_generation_and_rejects_bad_groups(tmp_path):
+    path = str(tmp_path / 'data.records')
+    write_records(path, make_records())
+    service = QueryService(path)
+    params = {'county': ['Anderson'], 'page_size': ['5']}
+    first = service.query('/projects', params)
+    assert service.query('/projects', params) is first
+    assert service.cache.hits == 1
+    assert len(json.loads(first)['results']) == 5
+
+    service.ingest([ProjectRecord(project_number='TABS99999', county_id=COUNTY_IDS['Anderson'])])
+    assert json.loads(service.query('/projects', params))['total'] == json.loads(first)['total'] + 1
+
+    groups = json.loads(service.query('/aggregate', {'by': ['status']}))['groups']
+    assert sum(group['count'] for group in groups.values()) == len(service.index.records)
+    with pytest.raises(ValueError):
+        service.query('/aggregate', {'by': ['nope']})
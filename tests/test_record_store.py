@@ -0,0 +1,246 @@
+import os
+import pickle
+import shutil
+from datetime import datetime
+
+import pytest
+
+import record_store
+import compression
+from compression import DictionaryRegistry, split_held_out
+from project_record import ProjectRecord
+from record_store import RecordStore, StoreError, append_records, load_records, migrate_legacy, write_records
+
+
+def make_records(count, start=0):
+    return [ProjectRecord(project_number=f"TABS{2024000000 + i}", project_id=str(i),
+                          project_name=f"Project {i} renovation", created_on=datetime(2024, 1, 1 + i % 28),
+                          facility_name=f"Facility {i % 7}", city_id=str(i % 13), county_id=str(i % 11),
+                          project_status='Project Registered', type_of_work='Renovation/Alteration',
+                          estimated_cost=1000.0 * i, scope_of_work=f"Interior finish-out of suite {i}")
+            for i in range(start, start + count)]
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    # The 'records' dictionary registry lives under output_data/dictionaries of the test's directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(record_store, '_registry', None)
+
+
+def frame_kinds(path):
+    store = RecordStore(path)
+    with open(path, 'rb') as f:
+        kinds = []
+        offset = len(record_store.MAGIC)
+        while True:
+            frame = record_store._read_frame(f, offset, store.file_size)
+            if frame is None:
+                return kinds
+            kinds.append(frame[0])
+            offset = frame[3]
+
+
+# --- Format ---
+def test_frames_index_and_trailer(tmp_path):
+    path = str(tmp_path / 'records.records')
+    write_records(path, make_records(250), chunk_size=100)
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert data.startswith(record_store.MAGIC)
+
+    index_offset, end_magic = record_store._TRAILER.unpack(data[-record_store._TRAILER.size:])
+    assert end_magic == record_store.END_MAGIC
+    kind, length, count, _ = record_store._FRAME.unpack_from(data, index_offset)
+    assert (kind, count) == (record_store.INDEX_KIND, 3)
+    entries = [record_store._INDEX_ENTRY.unpack_from(data, index_offset + record_store._FRAME.size + i)
+               for i in range(0, length, record_store._INDEX_ENTRY.size)]
+    assert [count for _, count in entries] == [100, 100, 50]
+
+    store = RecordStore(path)
+    assert not store.recovered
+    assert store.chunks == entries
+    assert store.data_end == index_offset
+    assert [len(chunk) for chunk in store.iter_chunks()] == [100, 100, 50]
+    assert store.read_chunk(2) == make_records(250)[200:]
+    assert store.seek_record(120) == (1, 20)
+
+
+def test_crc_mismatch_is_detected(tmp_path):
+    path = str(tmp_path / 'records.records')
+    write_records(path, make_records(30), chunk_size=10)
+    store = RecordStore(path)
+    offset = store.chunks[1][0]
+    with open(path, 'r+b') as f:
+        f.seek(offset + record_store._FRAME.size + 5)
+        byte = f.read(1)
+        f.seek(-1, os.SEEK_CUR)
+        f.write(bytes([byte[0] ^ 0xFF]))
+    store = RecordStore(path)
+    assert store.read_chunk(0) == make_records(10)
+    with pytest.raises(StoreError):
+        store.read_chunk(1)
+
+
+def test_truncated_file_is_recovered(tmp_path):
+    path = str(tmp_path / 'records.records')
+    records = make_records(250)
+    write_records(path, records, chunk_size=100)
+    third_chunk = RecordStore(path).chunks[2][0]
+    with open(path, 'r+b') as f:
+        f.truncate(third_chunk + 20)  # Cut through the last chunk; the index and trailer are gone
+
+    store = RecordStore(path)
+    assert store.recovered
+    assert len(store) == 200
+    assert load_records(path) == records[:200]
+
+    # Appending drops the damaged tail and writes a fresh index
+    append_records(path, records[200:], chunk_size=100)
+    store = RecordStore(path)
+    assert not store.recovered
+    assert load_records(path) == records
+
+
+def test_missing_trailer_is_recovered(tmp_path):
+    path = str(tmp_path / 'records.records')
+    write_records(path, make_records(50), chunk_size=20)
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 1)
+    store = RecordStore(path)
+    assert store.recovered
+    assert len(store) == 50
+
+
+def test_not_a_record_store(tmp_path):
+    path = str(tmp_path / 'other.records')
+    with open(path, 'wb') as f:
+        f.write(b'not a store at all')
+    with pytest.raises(StoreError):
+        RecordStore(path)
+
+
+# --- Legacy files ---
+def test_legacy_pickle_is_migrated_next_to_it(tmp_path):
+    records = make_records(20)
+    legacy = str(tmp_path / 'project_scopes.pkl')
+    with open(legacy, 'wb') as f:
+        pickle.dump(records, f)
+    path = migrate_legacy(str(tmp_path / 'project_scopes.records'))
+    assert path.endswith(record_store.RECORD_EXTENSION)
+    assert record_store.is_record_store(path)
+    assert load_records(path) == records
+    assert os.path.exists(legacy)
+
+
+def test_glob_records_migrates_snapshots_but_not_checkpoints(tmp_path):
+    for name in ('project_report_data_a.pkl', 'project_report_data_a_remaining_ids.pkl'):
+        with open(tmp_path / name, 'wb') as f:
+            pickle.dump(make_records(3), f)
+    write_records(str(tmp_path / 'project_report_data_a_processed.records'), make_records(2))
+    found = record_store.glob_records(str(tmp_path / 'project_report_data_*.records'))
+    assert found == [str(tmp_path / 'project_report_data_a.records')]
+    assert not os.path.exists(tmp_path / 'project_report_data_a_remaining_ids.records')
+
+
+def test_older_store_versions_are_readable(tmp_path):
+    path = str(tmp_path / 'v1.records')
+    payload = record_store._encode_chunk(make_records(5))
+    with open(path, 'wb') as f:
+        f.write(b'TXPRSTORE\x01')
+        record_store._write_frame(f, record_store.CHUNK_KIND, payload, 5)
+        record_store._write_index(f, [(len(record_store.MAGIC), 5)])
+    assert load_records(path) == make_records(5)
+
+    # Appending rewrites it in the current version
+    append_records(path, make_records(3, start=5))
+    assert RecordStore(path).magic == record_store.MAGIC
+    assert load_records(path) == make_records(8)
+
+
+# --- Compression ---
+@pytest.mark.parametrize('compression, kind', [('zlib', record_store.ZLIB_KIND),
+                                               ('none', record_store.CHUNK_KIND),
+                                               ('dictionary', record_store.DICTIONARY_CHUNK_KIND)])
+def test_compression_modes_round_trip(tmp_path, compression, kind):
+    records = make_records(450)
+    path = str(tmp_path / 'records.records')
+    assert write_records(path, records, chunk_size=200, compression=compression) == 450
+    assert load_records(path) == records
+    assert set(frame_kinds(path)) - {record_store.DICTIONARY_KIND, record_store.INDEX_KIND} == {kind}
+    assert RecordStore(path).read_record(321) == records[321]
+
+
+def test_default_compression_is_zlib():
+    assert record_store.RECORD_COMPRESSION == 'zlib'
+
+
+def test_dictionary_is_embedded_in_the_file(tmp_path):
+    path = str(tmp_path / 'records.records')
+    write_records(path, make_records(300), chunk_size=100, compression='dictionary')
+    assert frame_kinds(path).count(record_store.DICTIONARY_KIND) == 1
+    assert DictionaryRegistry(record_store.RECORD_DICTIONARY).versions() == [1]
+    embedded = RecordStore(path).chunk_dictionary(0)[1]
+    assert (embedded.version, embedded.codec) == (1, compression.DEFAULT_CODEC)
+    assert embedded.ratio
+
+    # Readable from anywhere, with no dictionary files around
+    shutil.rmtree(os.path.join('output_data', 'dictionaries'))
+    moved = str(tmp_path / 'elsewhere.records')
+    os.replace(path, moved)
+    os.chdir('/')
+    assert len(load_records(moved)) == 300
+
+
+def test_append_reuses_the_embedded_dictionary(tmp_path):
+    path = str(tmp_path / 'records.records')
+    write_records(path, make_records(200), chunk_size=100, compression='dictionary')
+    append_records(path, make_records(150, start=200), chunk_size=100, compression='dictionary')
+    assert frame_kinds(path).count(record_store.DICTIONARY_KIND) == 1
+    assert load_records(path) == make_records(350)
+
+
+def test_append_retrains_when_the_ratio_drops(tmp_path):
+    path = str(tmp_path / 'records.records')
+    write_records(path, make_records(200), chunk_size=100, compression='dictionary')
+    different = [ProjectRecord(project_number=f"X{i}", project_name=os.urandom(40).hex(),
+                               scope_of_work=os.urandom(120).hex()) for i in range(100)]
+    append_records(path, different, chunk_size=100, compression='dictionary')
+    assert frame_kinds(path).count(record_store.DICTIONARY_KIND) == 2
+    assert DictionaryRegistry(record_store.RECORD_DICTIONARY).versions() == [1, 2]
+    store = RecordStore(path)
+    assert [store.chunk_dictionary(i)[1].version for i in range(store.chunk_count)] == [1, 1, 2]
+    assert load_records(path) == make_records(200) + different
+
+
+def test_version_3_files_are_readable(tmp_path):
+    path = str(tmp_path / 'v3.records')
+    records = make_records(60)
+    pickled = [pickle.dumps(record.__getstate__(), pickle.HIGHEST_PROTOCOL) for record in records]
+    data = compression.train_dictionary(pickled, codec=compression.CODEC_ZLIB)
+    dictionary = compression.Dictionary('records', 0, compression.CODEC_ZLIB, data)
+    with open(path, 'wb') as f:
+        f.write(record_store.BARE_DICTIONARY_MAGIC)
+        dictionary_offset = f.tell()
+        record_store._write_frame(f, record_store.DICTIONARY_KIND, data, 0)
+        chunk_offset = f.tell()
+        payload, _ = record_store._encode_dictionary_chunk(pickled, dictionary, dictionary_offset)
+        record_store._write_frame(f, record_store.DICTIONARY_CHUNK_KIND, payload, len(records))
+        record_store._write_index(f, [(chunk_offset, len(records))])
+    assert load_records(path) == records
+    assert RecordStore(path).read_record(42) == records[42]
+
+
+def test_small_dictionary_batches_are_stored_raw(tmp_path):
+    path = str(tmp_path / 'records.records')
+    write_records(path, make_records(10), compression='dictionary')
+    assert record_store.DICTIONARY_KIND not in frame_kinds(path)
+    assert load_records(path) == make_records(10)
+
+
+def test_held_out_samples_are_not_trained_on():
+    samples = [bytes([i]) for i in range(20)]
+    training, held_out = split_held_out(samples)
+    assert held_out and training
+    assert not set(training) & set(held_out)
+    assert sorted(training + held_out) == samples
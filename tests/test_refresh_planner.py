@@ -0,0 +1,69 @@
+import pytest
+
+from project_record import ProjectRecord
+from refresh_planner import BACKOFF, DAY, JITTER, RefreshPlanner, status_intervals
+
+NOW = 1_700_000_000.0
+
+
+@pytest.fixture
+def planner(tmp_path):
+    planner = RefreshPlanner(str(tmp_path / 'refresh.db'))
+    yield planner
+    planner.close()
+
+
+def record(number, status='Project Registered', cost=1000.0):
+    return ProjectRecord(project_number=number, project_status=status, estimated_cost=cost)
+
+
+def interval(planner, number):
+    return planner.conn.execute('SELECT interval FROM projects WHERE project_number = ?', (number,)).fetchone()[0]
+
+
+def test_status_intervals_first_match_wins():
+    assert status_intervals('Project Registered') == (2 * DAY, 30 * DAY)
+    assert status_intervals('Inspection Complete') == (14 * DAY, 365 * DAY)
+    assert status_intervals('Inspection Scheduled') == (3 * DAY, 45 * DAY)
+    assert status_intervals('Project Closed') == (60 * DAY, 730 * DAY)
+    assert status_intervals(None) == (7 * DAY, 120 * DAY)
+
+
+def test_observe_counts_and_reports_fresh_projects(planner):
+    fresh = set()
+    assert planner.observe([record('A'), record('B'), record(None)], now=NOW, fresh=fresh) == (2, 0, 0)
+    assert fresh == {'A', 'B'}
+
+    fresh = set()
+    assert planner.observe([record('A'), record('B', cost=2000.0)], now=NOW + DAY, fresh=fresh) == (0, 1, 1)
+    assert fresh == {'B'}
+
+
+def test_unchanged_projects_back_off_to_the_longest_interval(planner):
+    planner.observe([record('A')], now=NOW)
+    assert interval(planner, 'A') == 2 * DAY
+    planner.observe([record('A')], now=NOW + DAY)
+    assert interval(planner, 'A') == pytest.approx(2 * DAY * BACKOFF)
+    for day in range(2, 30):
+        planner.observe([record('A')], now=NOW + day * DAY)
+    assert interval(planner, 'A') == 30 * DAY
+
+
+def test_a_change_resets_the_interval_and_logs_the_status(planner):
+    for day in range(5):
+        planner.observe([record('A')], now=NOW + day * DAY)
+    planner.observe([record('A', status='Project Closed')], now=NOW + 10 * DAY)
+    assert interval(planner, 'A') == 60 * DAY
+    assert planner.history('A') == [(NOW + 10 * DAY, 'Project Registered', 'Project Closed')]
+    assert planner.summary() == {'Project Closed': 1}
+
+
+def test_due_is_most_overdue_first_and_jittered(planner):
+    planner.observe([record('active')], now=NOW)
+    planner.observe([record('closed', status='Project Closed')], now=NOW)
+    assert planner.due(now=NOW + DAY) == []
+    assert planner.due(now=NOW + 3 * DAY) == ['active']
+    assert planner.due(now=NOW + 80 * DAY) == ['active', 'closed']
+    next_due = planner.conn.execute("SELECT next_due FROM projects WHERE project_number = 'active'").fetchone()[0]
+    assert abs(next_due - NOW - 2 * DAY) <= 2 * DAY * JITTER
+    assert sum(planner.forecast(days=3, now=NOW)) == 1
@@ -0,0 +1,71 @@
+import multiprocessing
+from datetime import date
+
+import pytest
+
+from project_record import ProjectRecord
+from rollups import RollupCube, ingest_records, load_rollups, save_rollups
+
+
+def record(number, county=1, created_on=date(2024, 1, 15), type_of_work='New Construction', cost=100.0):
+    return ProjectRecord(project_number=number, county_id=county, created_on=created_on,
+                         type_of_work=type_of_work, estimated_cost=cost)
+
+
+def test_slices_and_rollups():
+    cube = RollupCube()
+    cube.ingest_many([record('A', county=1, cost=100.0), record('B', county=1, cost=50.0),
+                      record('C', county=2, created_on=date(2024, 2, 1), type_of_work='Renovation/Alteration'),
+                      record('D', county=2, created_on=date(2024, 3, 1), cost=None)])
+    assert cube.slice() == (4, 250.0)
+    assert cube.slice(counties={1}) == (2, 150.0)
+    assert cube.slice(month_from='2024-02', month_to='2024-02') == (1, 100.0)
+    assert cube.slice(types_of_work={'Renovation/Alteration'}) == (1, 100.0)
+    assert cube.rollup(by=('county',)) == {(1,): (2, 150.0), (2,): (2, 100.0)}
+    assert cube.trend(counties={2}) == [('2024-02', (1, 100.0)), ('2024-03', (1, 0.0))]
+
+
+def test_reingest_is_counted_once_and_moves_between_cells():
+    cube = RollupCube()
+    assert cube.ingest(record('A', county=1, cost=100.0))
+    assert not cube.ingest(record('A', county=1, cost=100.0))
+    assert cube.slice() == (1, 100.0)
+
+    # The project was re-listed with another county and cost: it leaves its old cell
+    assert cube.ingest(record('A', county=2, cost=300.0))
+    assert cube.slice() == (1, 300.0)
+    assert cube.slice(counties={1}) == (0, 0.0)
+    assert len(cube.cells) == 1
+
+
+def test_records_without_a_number_are_skipped():
+    cube = RollupCube()
+    assert cube.ingest_many([record(None), record(''), record('A')]) == 1
+    assert cube.slice() == (1, 100.0)
+
+
+def test_cube_survives_save_and_load(tmp_path):
+    path = str(tmp_path / 'rollups.pkl')
+    cube = RollupCube()
+    cube.ingest_many([record('A'), record('B', county=3)])
+    save_rollups(cube, path)
+    loaded = load_rollups(path)
+    assert loaded.rollup(by=('county',)) == cube.rollup(by=('county',))
+    assert not loaded.ingest(record('A'))
+    assert loaded.ingest(record('C'))
+
+
+def _ingest_shard(path, start):
+    ingest_records([record(f"P{start + i}", county=start % 7) for i in range(25)], path)
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_concurrent_ingests_do_not_lose_updates(tmp_path):
+    path = str(tmp_path / 'rollups.pkl')
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=_ingest_shard, args=(path, shard * 25)) for shard in range(8)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert load_rollups(path).slice() == (200, 20000.0)
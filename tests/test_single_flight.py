@@ -0,0 +1,55 @@
+import asyncio
+import threading
+
+from single_flight import SingleFlight
+
+
+def test_threads_share_one_call():
+    flight = SingleFlight('test')
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'page'
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do('TABS1', fetch)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do('TABS1', fetch))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+    assert results == ['page'] * 4
+    assert len(calls) == 1
+    assert flight.in_flight() == 0
+
+
+def test_cancelled_follower_does_not_break_the_leader():
+    async def scenario():
+        flight = SingleFlight('test')
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return 'page'
+
+        leader = asyncio.ensure_future(flight.do_async('TABS1', fetch))
+        await asyncio.sleep(0)
+        cancelled = asyncio.ensure_future(flight.do_async('TABS1', fetch))
+        follower = asyncio.ensure_future(flight.do_async('TABS1', fetch))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await leader == 'page'
+        assert await follower == 'page'
+        assert cancelled.cancelled()
+
+    asyncio.run(scenario())
@@ -0,0 +1,83 @@
+import json
+from datetime import date
+
+import pytest
+
+import snapshot_diff
+from project_record import ProjectRecord
+from snapshot_diff import diff_snapshot, filter_delta, find_previous_index, fingerprint_path, read_header
+
+WINDOW = {'cutoff': '2024-01-01', 'type_of_work': ''}
+
+
+def record(number, status='Project Registered', scope='Interior finish-out', created_on=date(2024, 2, 1)):
+    return ProjectRecord(project_number=number, project_status=status, scope_of_work=scope, created_on=created_on)
+
+
+def read_changes(log_path):
+    with open(log_path, 'r', encoding='utf-8') as f:
+        return {change['project_number']: change for change in map(json.loads, f)}
+
+
+@pytest.fixture
+def runs(monkeypatch):
+    """Make run timestamps strictly increasing, whatever the clock resolution"""
+    real_datetime = snapshot_diff.datetime
+    clock = iter(range(1, 60))
+
+    class Clock:
+        @staticmethod
+        def now():
+            return real_datetime(2024, 3, 1, 0, 0, next(clock))
+
+    monkeypatch.setattr(snapshot_diff, 'datetime', Clock)
+
+
+def test_first_snapshot_has_no_baseline(tmp_path, runs):
+    assert diff_snapshot([record('A')], str(tmp_path / 'first.records'), WINDOW) is None
+    assert read_header(fingerprint_path(str(tmp_path / 'first.records')))['cutoff'] == '2024-01-01'
+
+
+def test_changes_against_the_previous_run(tmp_path, runs):
+    diff_snapshot([record('A'), record('B'), record('C', created_on=date(2024, 2, 5)), record('U', created_on=None)],
+                  str(tmp_path / 'first.records'), WINDOW)
+    log_path = diff_snapshot([record('A'), record('B', status='Project Closed'), record('D')],
+                             str(tmp_path / 'second.records'), WINDOW)
+    changes = read_changes(log_path)
+    assert changes['B']['op'] == 'changed' and changes['B']['changed'] == ['status']
+    assert changes['D']['op'] == 'added'
+    assert changes['C']['op'] == 'removed'  # Dated inside the new snapshot's window
+    assert 'A' not in changes
+    assert 'U' not in changes  # Undated projects are never reported as removed
+    assert [r.project_number for r in filter_delta([record('A'), record('B'), record('D')], log_path)] == ['B', 'D']
+
+
+def test_removed_only_inside_the_new_window(tmp_path, runs):
+    diff_snapshot([record('OLD', created_on=date(2023, 6, 1)), record('A')], str(tmp_path / 'first.records'), WINDOW)
+    log_path = diff_snapshot([record('A')], str(tmp_path / 'second.records'), WINDOW)
+    assert read_changes(log_path) == {}
+
+
+def test_snapshot_with_another_window_is_not_a_baseline(tmp_path, runs):
+    diff_snapshot([record('A')], str(tmp_path / 'other_cutoff.records'), dict(WINDOW, cutoff='2023-06-01'))
+    diff_snapshot([record('A')], str(tmp_path / 'other_type.records'), dict(WINDOW, type_of_work='Renovation'))
+    assert diff_snapshot([record('A'), record('B')], str(tmp_path / 'current.records'), WINDOW) is None
+
+
+def test_baseline_is_the_latest_earlier_run_not_the_newest_file(tmp_path, runs):
+    diff_snapshot([record('A')], str(tmp_path / 'first.records'), WINDOW)
+    diff_snapshot([record('A'), record('B')], str(tmp_path / 'second.records'), WINDOW)
+    diff_snapshot([record('A'), record('B'), record('C')], str(tmp_path / 'third.records'), WINDOW)
+
+    # Re-fingerprinting the second snapshot rewrites its index (newest mtime) but keeps its run time
+    log_path = diff_snapshot([record('A'), record('B')], str(tmp_path / 'second.records'), WINDOW)
+    assert set(read_changes(log_path)) == {'B'}
+    assert find_previous_index(fingerprint_path(str(tmp_path / 'third.records'))) == \
+        fingerprint_path(str(tmp_path / 'second.records'))
+
+
+def test_index_without_run_header_is_ignored(tmp_path, runs):
+    legacy = fingerprint_path(str(tmp_path / 'legacy.records'))
+    with open(legacy, 'w', encoding='utf-8') as f:
+        f.write('#min_date=2024-01-01\n')
+    assert diff_snapshot([record('A')], str(tmp_path / 'current.records'), WINDOW) is None
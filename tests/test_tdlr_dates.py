@@ -0,0 +1,70 @@
+import time
+from datetime import date, datetime, timezone
+
+import pytest
+
+import tdlr_dates
+from tdlr_dates import decode_tdlr_dates, parse_tdlr_date_str
+
+
+def tdlr(year, month, day, hour, minute=0):
+    """`/Date(ms)/` string for a UTC instant"""
+    ms = int(datetime(year, month, day, hour, minute, tzinfo=timezone.utc).timestamp() * 1000)
+    return f"/Date({ms})/"
+
+
+@pytest.fixture(autouse=True)
+def central_time(monkeypatch):
+    # TABS dates are local calendar days; Texas switches between CST (UTC-6) and CDT (UTC-5)
+    monkeypatch.setenv('TZ', 'America/Chicago')
+    time.tzset()
+    monkeypatch.setattr(tdlr_dates, '_date_cache', type(tdlr_dates._date_cache)())
+    monkeypatch.setattr(tdlr_dates, '_offset_cache', {})
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def converter(request, monkeypatch):
+    if request.param == 'numpy' and tdlr_dates.np is None:
+        pytest.skip("NumPy is not installed")
+    if request.param == 'python':
+        monkeypatch.setattr(tdlr_dates, 'np', None)
+
+
+def test_local_offset_follows_daylight_saving_time(converter):
+    values = [
+        tdlr(2024, 1, 1, 5, 30),   # 23:30 CST on Dec 31
+        tdlr(2024, 7, 1, 5, 30),   # 00:30 CDT on Jul 1 (a fixed CST offset would give Jun 30)
+        tdlr(2024, 3, 10, 7, 30),  # 01:30 CST, just before the spring change
+        tdlr(2024, 11, 3, 5, 30),  # 00:30 CDT, just before the fall change
+        tdlr(2024, 11, 4, 5, 30),  # 23:30 CST on Nov 3
+    ]
+    assert decode_tdlr_dates(values) == [date(2023, 12, 31), date(2024, 7, 1), date(2024, 3, 10),
+                                         date(2024, 11, 3), date(2024, 11, 3)]
+
+
+def test_mixed_batch_keeps_positions(converter):
+    values = ['', None, '2024-05-06T00:00:00', tdlr(2024, 7, 1, 17), 'not a date', tdlr(2024, 7, 1, 17)]
+    assert decode_tdlr_dates(values) == [None, None, date(2024, 5, 6), date(2024, 7, 1), None, date(2024, 7, 1)]
+
+
+def test_timezone_suffix_is_ignored():
+    value = tdlr(2024, 7, 1, 17)
+    assert parse_tdlr_date_str(value[:-2] + '-0500)/') == parse_tdlr_date_str(value) == date(2024, 7, 1)
+
+
+def test_cache_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(tdlr_dates, 'MAX_CACHE_ENTRIES', 3)
+    first, second, third, fourth = (tdlr(2024, 1, day, 12) for day in range(1, 5))
+    decode_tdlr_dates([first, second, third])
+    parse_tdlr_date_str(first)  # Now the most recently used
+    decode_tdlr_dates([fourth])
+    assert list(tdlr_dates._date_cache) == [third, first, fourth]
+
+
+def test_cached_none_is_not_decoded_again(monkeypatch):
+    assert parse_tdlr_date_str('garbage') is None
+    monkeypatch.setattr(tdlr_dates, '_parse_fallback', lambda value: pytest.fail("decoded twice"))
+    assert parse_tdlr_date_str('garbage') is None
@@ -0,0 +1,106 @@
+import pytest
+
+import work_queue
+from project_record import ProjectRecord
+from work_queue import WorkQueue
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(work_queue, 'time', fake)
+    return fake
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    queue = WorkQueue(str(tmp_path / 'queue.db'), lease_seconds=60, max_attempts=2)
+    yield queue
+    queue.close()
+
+
+def enqueue(queue, count):
+    return queue.enqueue([ProjectRecord(project_number=f"TABS{i}", project_name=f"Project {i}") for i in range(count)])
+
+
+def test_enqueue_ignores_duplicates_and_unnumbered(queue):
+    assert enqueue(queue, 3) == 3
+    assert enqueue(queue, 4) == 1
+    assert queue.enqueue([ProjectRecord(project_number=None)]) == 0
+    assert queue.counts()['pending'] == 4
+
+
+def test_lease_hands_out_each_project_once(queue):
+    enqueue(queue, 5)
+    first = queue.lease('a', batch_size=3)
+    second = queue.lease('b', batch_size=3)
+    assert len(first) == 3 and len(second) == 2
+    assert {r.project_number for r in first.records}.isdisjoint(r.project_number for r in second.records)
+    assert first.records[0].project_name.startswith('Project')  # Listing fields travel with the task
+    assert queue.lease('c') is None
+    assert queue.counts() == {'pending': 0, 'leased': 5, 'done': 0, 'failed': 0}
+
+
+def test_expired_lease_is_redelivered(queue, clock):
+    enqueue(queue, 2)
+    lost = queue.lease('crashed')
+    clock.now += 30
+    assert queue.lease('other') is None  # Still held
+
+    clock.now += 31
+    assert queue.counts()['pending'] == 2
+    again = queue.lease('other')
+    assert sorted(r.project_number for r in again.records) == sorted(r.project_number for r in lost.records)
+    assert queue.heartbeat(lost) == 0  # The old lease no longer holds anything
+
+
+def test_heartbeat_keeps_the_lease(queue, clock):
+    enqueue(queue, 2)
+    lease = queue.lease('a')
+    clock.now += 50
+    assert queue.heartbeat(lease) == 2
+    clock.now += 50
+    assert queue.lease('b') is None
+
+
+def test_commit_is_idempotent_across_a_redelivery(queue, clock):
+    enqueue(queue, 1)
+    slow = queue.lease('slow')
+    clock.now += 61
+    fast = queue.lease('fast')
+    fast_record = ProjectRecord(project_number='TABS0', scope_of_work='from fast')
+    assert queue.commit(fast, [fast_record]) == 1
+    assert queue.commit(slow, [ProjectRecord(project_number='TABS0', scope_of_work='from slow')]) == 0
+    assert [r.scope_of_work for r in queue.iter_results()] == ['from fast']
+    assert queue.is_drained()
+
+
+def test_failures_requeue_then_park(queue):
+    enqueue(queue, 1)
+    lease = queue.lease('a')
+    queue.fail(lease, 'TABS0', 'HTTP 500')
+    assert queue.counts()['pending'] == 1
+    lease = queue.lease('a')
+    queue.fail(lease, 'TABS0', 'HTTP 500')
+    assert queue.counts()['failed'] == 1
+    assert queue.lease('a') is None
+    assert queue.retry_failed() == 1
+    assert len(queue.lease('a')) == 1
+
+
+def test_fail_from_a_stale_lease_is_ignored(queue, clock):
+    enqueue(queue, 1)
+    stale = queue.lease('a')
+    clock.now += 61
+    current = queue.lease('b')
+    queue.fail(stale, 'TABS0', 'timeout')
+    assert queue.counts()['leased'] == 1
+    assert queue.commit(current, current.records) == 1
@@ -0,0 +1,235 @@
+import json
+import os
+import time
+from collections import deque
+from http.cookiejar import MozillaCookieJar
+
+import requests
+
+import metrics
+from by_date import REQUEST_HEADERS, SEARCH_URL, build_form_data, fetch_scope_of_work
+from http_fixtures import install_fixtures
+from profiling import enable_profiling, stage
+from project_record import records_from_listing_page
+from refresh_planner import observe_records
+from rollups import ingest_records
+
+# --- Settings ---
+COOKIE_FILE = 'cookies.txt'
+OUTPUT_DATA_FOLDER = 'output_data'
+WATCH_PAGE_SIZE = 25  # Rows per poll; a full page of unseen projects triggers a look at the next page
+MAX_CATCHUP_PAGES = 10  # Pages read in one poll when many projects arrive at once
+MIN_POLL_INTERVAL = 10  # Seconds between polls right after new projects appeared
+MAX_POLL_INTERVAL = 45  # Seconds between polls when nothing is happening (keeps detection under a minute)
+POLL_BACKOFF = 1.5  # Interval multiplier after a quiet poll
+ERROR_BACKOFF_MAX = 300  # Longest wait after repeated request failures
+SEEN_FILE = os.path.join(OUTPUT_DATA_FOLDER, 'watch_seen.json')
+SEEN_LIMIT = 5000  # ProjectIds remembered across restarts
+MAX_SCOPE_ATTEMPTS = 5  # Polls that retry a failed scope fetch before the project is emitted without it
+JSONL_SINK_FILE = os.path.join(OUTPUT_DATA_FOLDER, 'new_projects.jsonl')
+WEBHOOK_URL = os.getenv('TX_PERMIT_WEBHOOK_URL')  # POSTs each new project as JSON when set
+
+
+# --- Sinks ---
+class JsonlSink:
+    """Appends each new project as one JSON line"""
+
+    def __init__(self, path=JSONL_SINK_FILE):
+        self.path = path
+
+    def emit(self, records):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(dict(record.to_dict(), DetectedAt=time.strftime('%Y-%m-%dT%H:%M:%S'))) + '\n')
+
+
+class WebhookSink:
+    """POSTs each new project as JSON to a webhook URL"""
+
+    def __init__(self, url=WEBHOOK_URL, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def emit(self, records):
+        for record in records:
+            try:
+                requests.post(self.url, json=record.to_dict(), timeout=self.timeout).raise_for_status()
+            except requests.exceptions.RequestException as e:
+                print(f"[WARNING] Webhook delivery failed for {record.project_number}: {e}")
+
+
+class StoreSink:
+    """Adds new projects to the rollups and the refresh planner"""
+
+    def emit(self, records):
+        ingest_records(records)
+        observe_records(records)
+
+
+class PrintSink:
+    def emit(self, records):
+        for record in records:
+            print(f"[NEW] {record.project_number} | {record.date_str} | {record.county_name} | "
+                  f"{record.project_name} | {record.scope_of_work}")
+
+
+def default_sinks():
+    sinks = [PrintSink(), JsonlSink(), StoreSink()]
+    if WEBHOOK_URL:
+        sinks.append(WebhookSink())
+    return sinks
+
+
+# --- Seen ProjectIds ---
+def _seen_key(record):
+    return str(record.project_id or record.project_number)
+
+
+def load_seen(path=SEEN_FILE):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return deque(json.load(f), maxlen=SEEN_LIMIT)
+    except (OSError, ValueError):
+        return None
+
+
+def save_seen(seen, path=SEEN_FILE):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(list(seen), f)
+    os.replace(tmp_path, path)
+
+
+class Watcher:
+    """Polls the newest listing page and hands unseen projects, with their scope, to the sinks.
+
+    The listing is sorted newest first, so a poll only reads further pages while every row
+    on the current one is unseen. The poll interval shrinks to MIN_POLL_INTERVAL when new
+    projects appear and grows towards MAX_POLL_INTERVAL while the listing is quiet.
+    A project whose detail page could not be fetched is neither emitted nor marked seen;
+    it is kept on a retry list and fetched again on the next polls (up to MAX_SCOPE_ATTEMPTS).
+    """
+
+    def __init__(self, http_session, sinks=None, page_size=WATCH_PAGE_SIZE):
+        self.session = http_session
+        self.sinks = default_sinks() if sinks is None else sinks
+        self.page_size = page_size
+        self.interval = MIN_POLL_INTERVAL
+        self.errors = 0
+        stored = load_seen()
+        self.primed = stored is not None  # On a first run the current page is taken as already seen
+        self.seen = stored if stored is not None else deque(maxlen=SEEN_LIMIT)
+        self.seen_set = set(self.seen)
+        self.retry = {}  # Seen key -> (record, failed attempts) for scope fetches to try again
+
+    def _remember(self, key):
+        if len(self.seen) == self.seen.maxlen:
+            self.seen_set.discard(self.seen[0])
+        self.seen.append(key)
+        self.seen_set.add(key)
+
+    def _list_page(self, start):
+        form_data = build_form_data(start)
+        form_data['length'] = str(self.page_size)
+        with stage('listing'), metrics.HTTP_IN_FLIGHT.track_inprogress(endpoint='watch'), \
+                metrics.HTTP_LATENCY.time(endpoint='watch'):
+            response = self.session.post(SEARCH_URL, data=form_data, headers=REQUEST_HEADERS, timeout=30)
+        metrics.record_response('watch', response.status_code, len(response.content))
+        response.raise_for_status()
+        with stage('parse'):
+            rows = response.json().get('data', [])
+        with stage('lookup'):
+            return records_from_listing_page(rows)
+
+    def poll(self):
+        """Read the newest listing rows; returns the unseen records, newest first"""
+        unseen = []
+        for page in range(MAX_CATCHUP_PAGES):
+            records = self._list_page(page * self.page_size)
+            fresh = [record for record in records
+                     if _seen_key(record) not in self.seen_set and _seen_key(record) not in self.retry]
+            unseen.extend(fresh)
+            if len(fresh) < len(records) or len(records) < self.page_size:
+                break
+        return unseen
+
+    def handle(self, records):
+        """Fetch scopes for new projects (and earlier failures) and emit them, oldest first"""
+        retried = [record for record, _ in self.retry.values()]
+        records = retried + list(reversed(records))
+        fetched = []
+        for record in records:
+            key = _seen_key(record)
+            scope = fetch_scope_of_work(self.session, record.project_number, record)
+            attempts = self.retry.pop(key, (record, 0))[1] + 1
+            if scope == "Error fetching" and attempts < MAX_SCOPE_ATTEMPTS:
+                self.retry[key] = (record, attempts)
+                continue
+            record.scope_of_work = scope
+            fetched.append(record)
+        if self.retry:
+            print(f"[WARNING] {len(self.retry)} projects kept for a scope retry on the next poll")
+        records = fetched
+        if not records:
+            return
+        with stage('output'):
+            for sink in self.sinks:
+                try:
+                    sink.emit(records)
+                except Exception as e:
+                    print(f"[WARNING] Sink {type(sink).__name__} failed: {e}")
+        for record in records:
+            self._remember(_seen_key(record))
+        save_seen(self.seen)
+
+    def step(self):
+        """One poll; returns the number of seconds to sleep before the next one"""
+        try:
+            unseen = self.poll()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            self.errors += 1
+            delay = min(MAX_POLL_INTERVAL * 2 ** (self.errors - 1), ERROR_BACKOFF_MAX)
+            print(f"[ERROR] Poll failed ({e}); retrying in {delay:.0f}s")
+            return delay
+        self.errors = 0
+
+        if not self.primed:
+            for record in reversed(unseen):
+                self._remember(_seen_key(record))
+            save_seen(self.seen)
+            self.primed = True
+            print(f"[INFO] Watching from the {len(unseen)} newest projects; only later ones will be emitted")
+        elif unseen or self.retry:
+            if unseen:
+                print(f"[INFO] {len(unseen)} new projects")
+            self.handle(unseen)
+            self.interval = MIN_POLL_INTERVAL
+        else:
+            self.interval = min(self.interval * POLL_BACKOFF, MAX_POLL_INTERVAL)
+        return self.interval
+
+    def run(self):
+        print(f"[INFO] Watching {SEARCH_URL} (poll every {MIN_POLL_INTERVAL}-{MAX_POLL_INTERVAL}s)")
+        while True:
+            time.sleep(self.step())
+
+
+def main():
+    os.makedirs(OUTPUT_DATA_FOLDER, exist_ok=True)
+    metrics.start_metrics()
+    session = install_fixtures(requests.Session())
+    session.cookies = MozillaCookieJar(COOKIE_FILE)
+    if os.path.exists(COOKIE_FILE):
+        session.cookies.load(ignore_discard=True, ignore_expires=True)
+    try:
+        Watcher(session).run()
+    except KeyboardInterrupt:
+        print("\n[INFO] Watch stopped.")
+
+
+if __name__ == "__main__":
+    enable_profiling('watch')
+    try:
+        main()
+    finally:
+        metrics.flush_metrics()
@@ -0,0 +1,133 @@
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+# --- Settings ---
+MIN_WORD_LENGTH = 4  # Minimum length for words to count in frequency analysis
+STOPWORDS = frozenset({'and', 'the', 'to', 'of', 'in', 'for', 'with', 'on', 'at', 'from', 'by',
+                       'this', 'that', 'will', 'new', 'existing', 'area', 'building', 'include', 'includes'})
+SHARD_SIZE = 5000  # Number of scopes handed to each worker process
+
+# Same punctuation set the original analyzer stripped, matched as word separators
+_TOKEN_SPLIT_RE = re.compile(r'[\s.,;:!?\-\'\"()/]+')
+
+
+def split_words(text):
+    """Lowercased words of a single scope of work, before any filtering"""
+    if not text:
+        return []
+    return [word for word in _TOKEN_SPLIT_RE.split(text.lower()) if word]
+
+
+def tokenize_scope(text, min_length=MIN_WORD_LENGTH, stopwords=STOPWORDS):
+    """Yield the lowercased, filtered words of a single scope of work"""
+    for word in split_words(text):
+        if len(word) >= min_length and word not in stopwords:
+            yield word
+
+
+def iter_phrases(words, n, min_length=MIN_WORD_LENGTH, stopwords=STOPWORDS):
+    """Yield n-grams of words that are adjacent in the original text.
+
+    Built before stopwords are removed, so words a stopword separated are never paired. A
+    phrase is skipped if it contains a stopword or none of its words is min_length long.
+    """
+    for i in range(len(words) - n + 1):
+        gram = words[i:i + n]
+        if any(word in stopwords for word in gram) or all(len(word) < min_length for word in gram):
+            continue
+        yield ' '.join(gram)
+
+
+class WordFrequency:
+    """Streaming word/n-gram counter with optional per-county and per-month breakdowns.
+
+    Records are fed one at a time with add(), so memory is bounded by the vocabulary
+    rather than the corpus. Partial counters from separate shards combine with merge().
+    """
+
+    def __init__(self, ngram_sizes=(1,), by_county=False, by_month=False):
+        self.ngram_sizes = tuple(ngram_sizes)
+        self.by_county = by_county
+        self.by_month = by_month
+        self.totals = {n: Counter() for n in self.ngram_sizes}
+        self.county_counts = {}
+        self.month_counts = {}
+        self.documents = 0
+
+    def add(self, text, county=None, month=None):
+        """Count the tokens of one scope"""
+        words = split_words(text)
+        tokens = [word for word in words if len(word) >= MIN_WORD_LENGTH and word not in STOPWORDS]
+        if not tokens:
+            return
+        self.documents += 1
+        for n in self.ngram_sizes:
+            grams = Counter(tokens if n == 1 else iter_phrases(words, n))
+            self.totals[n].update(grams)
+            if self.by_county and county is not None:
+                self._group(self.county_counts, county, n).update(grams)
+            if self.by_month and month:
+                self._group(self.month_counts, month, n).update(grams)
+
+    def _group(self, groups, key, n):
+        per_key = groups.get(key)
+        if per_key is None:
+            per_key = groups[key] = {size: Counter() for size in self.ngram_sizes}
+        return per_key[n]
+
+    def merge(self, other):
+        """Fold another WordFrequency (e.g. from a different shard) into this one"""
+        self.documents += other.documents
+        for n, counter in other.totals.items():
+            self.totals.setdefault(n, Counter()).update(counter)
+        for mine, theirs in ((self.county_counts, other.county_counts), (self.month_counts, other.month_counts)):
+            for key, per_size in theirs.items():
+                for n, counter in per_size.items():
+                    self._group(mine, key, n).update(counter)
+        return self
+
+    def most_common(self, top=None, n=1):
+        return self.totals[n].most_common(top)
+
+    def most_common_by_county(self, county, top=None, n=1):
+        return self.county_counts.get(county, {}).get(n, Counter()).most_common(top)
+
+    def most_common_by_month(self, month, top=None, n=1):
+        return self.month_counts.get(month, {}).get(n, Counter()).most_common(top)
+
+
+def count_shard(items, ngram_sizes=(1,), by_county=False, by_month=False):
+    """Build a WordFrequency for one shard of (text, county, month) tuples"""
+    freq = WordFrequency(ngram_sizes, by_county=by_county, by_month=by_month)
+    for text, county, month in items:
+        freq.add(text, county, month)
+    return freq
+
+
+def _iter_shards(items, shard_size):
+    shard = []
+    for item in items:
+        shard.append(item)
+        if len(shard) >= shard_size:
+            yield shard
+            shard = []
+    if shard:
+        yield shard
+
+
+def count_parallel(items, ngram_sizes=(1,), by_county=False, by_month=False, workers=None, shard_size=SHARD_SIZE):
+    """Count (text, county, month) tuples across a process pool and merge the shard results"""
+    result = WordFrequency(ngram_sizes, by_county=by_county, by_month=by_month)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 2  # Keep only a few shards in memory at once
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for shard in _iter_shards(items, shard_size):
+            pending.append(pool.submit(count_shard, shard, ngram_sizes, by_county, by_month))
+            if len(pending) >= max_in_flight:
+                result.merge(pending.pop(0).result())
+        for future in pending:
+            result.merge(future.result())
+    return result
@@ -0,0 +1,242 @@
+import os
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from project_record import ProjectRecord
+
+# --- Settings ---
+WORK_QUEUE_DB = os.getenv('TX_PERMIT_WORK_QUEUE', os.path.join('output_data', 'work_queue.db'))
+LEASE_SECONDS = 120  # A lease not renewed within this many seconds is re-delivered
+HEARTBEAT_INTERVAL = 30  # Seconds between lease renewals while a batch is being fetched
+BATCH_SIZE = 50  # Project numbers per lease
+MAX_ATTEMPTS = 5  # Failed attempts before a project is parked as 'failed'
+BUSY_TIMEOUT = 30  # Seconds to wait for another node's write lock
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    project_number TEXT PRIMARY KEY,
+    ref BLOB,
+    state TEXT NOT NULL DEFAULT 'pending',
+    lease_id TEXT,
+    lease_owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, lease_expires);
+CREATE TABLE IF NOT EXISTS results (
+    project_number TEXT PRIMARY KEY,
+    record BLOB NOT NULL,
+    worker TEXT,
+    committed REAL
+);
+"""
+
+
+def default_worker_id():
+    """host:pid, unique enough to tell workers apart in the queue"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Lease:
+    """A batch of projects leased to one worker"""
+
+    def __init__(self, lease_id, worker_id, records, expires):
+        self.lease_id = lease_id
+        self.worker_id = worker_id
+        self.records = records
+        self.expires = expires
+
+    def __len__(self):
+        return len(self.records)
+
+
+class WorkQueue:
+    """Leased work queue for detail fetching, backed by a SQLite file.
+
+    Any number of processes (on any host that can see the file) can enqueue project numbers,
+    lease batches, renew their leases and commit results. A lease that is not renewed in time
+    is handed to the next worker, and results are keyed by project number, so a crashed or
+    slow worker never loses or duplicates a project.
+    """
+
+    def __init__(self, path=WORK_QUEUE_DB, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode; write transactions are opened explicitly with BEGIN IMMEDIATE.
+            # The default rollback journal is kept because WAL does not work on network volumes.
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def _write(self, fn):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = fn(conn)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return result
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def enqueue(self, records):
+        """Add projects (ProjectRecords with listing fields) that are not queued yet; returns the count added"""
+        now = time.time()
+        rows = [(record.project_number, pickle.dumps(record, pickle.HIGHEST_PROTOCOL), now)
+                for record in records if record.project_number]
+
+        def insert(conn):
+            before = conn.total_changes
+            conn.executemany('INSERT OR IGNORE INTO tasks (project_number, ref, updated) VALUES (?, ?, ?)', rows)
+            return conn.total_changes - before
+
+        return self._write(insert)
+
+    def lease(self, worker_id=None, batch_size=BATCH_SIZE):
+        """Lease up to `batch_size` pending projects; expired leases are re-delivered first.
+
+        Returns a Lease, or None when nothing is available right now.
+        """
+        worker_id = worker_id or default_worker_id()
+        lease_id = uuid.uuid4().hex
+
+        def take(conn):
+            now = time.time()
+            rows = conn.execute(
+                "SELECT project_number, ref FROM tasks "
+                "WHERE state = 'pending' OR (state = 'leased' AND lease_expires < ?) "
+                "ORDER BY state = 'pending', updated LIMIT ?",
+                (now, batch_size)).fetchall()
+            if not rows:
+                return None
+            expires = now + self.lease_seconds
+            conn.executemany(
+                "UPDATE tasks SET state = 'leased', lease_id = ?, lease_owner = ?, lease_expires = ?, updated = ? "
+                "WHERE project_number = ?",
+                [(lease_id, worker_id, expires, now, number) for number, _ in rows])
+            records = [pickle.loads(ref) if ref else ProjectRecord(project_number=number) for number, ref in rows]
+            return Lease(lease_id, worker_id, records, expires)
+
+        return self._write(take)
+
+    def heartbeat(self, lease):
+        """Extend a lease; returns how many of its projects are still held by it"""
+        expires = time.time() + self.lease_seconds
+
+        def renew(conn):
+            cursor = conn.execute(
+                "UPDATE tasks SET lease_expires = ? WHERE lease_id = ? AND state = 'leased'",
+                (expires, lease.lease_id))
+            return cursor.rowcount
+
+        held = self._write(renew)
+        lease.expires = expires
+        return held
+
+    def commit(self, lease, records):
+        """Store finished records and mark them done.
+
+        Idempotent: a project that was already committed (e.g. by a worker whose lease had
+        expired) keeps its first result. Returns the number of results newly stored.
+        """
+        now = time.time()
+        rows = [(record.project_number, pickle.dumps(record, pickle.HIGHEST_PROTOCOL), lease.worker_id, now)
+                for record in records]
+
+        def store(conn):
+            before = conn.total_changes
+            conn.executemany(
+                'INSERT OR IGNORE INTO results (project_number, record, worker, committed) VALUES (?, ?, ?, ?)', rows)
+            stored = conn.total_changes - before
+            conn.executemany(
+                "UPDATE tasks SET state = 'done', lease_id = NULL, lease_expires = NULL, last_error = NULL, updated = ? "
+                "WHERE project_number = ?",
+                [(now, row[0]) for row in rows])
+            return stored
+
+        return self._write(store)
+
+    def fail(self, lease, project_number, error):
+        """Release one project after a failed attempt; it is parked as 'failed' after max_attempts"""
+        now = time.time()
+
+        def release(conn):
+            conn.execute(
+                "UPDATE tasks SET attempts = attempts + 1, last_error = ?, lease_id = NULL, lease_expires = NULL, "
+                "updated = ?, state = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END "
+                "WHERE project_number = ? AND lease_id = ?",
+                (str(error), now, self.max_attempts, project_number, lease.lease_id))
+
+        self._write(release)
+
+    def retry_failed(self):
+        """Put parked projects back in the queue; returns how many"""
+        def reset(conn):
+            return conn.execute(
+                "UPDATE tasks SET state = 'pending', attempts = 0, updated = ? WHERE state = 'failed'",
+                (time.time(),)).rowcount
+
+        return self._write(reset)
+
+    def counts(self):
+        """Projects per state (pending, leased, done, failed); expired leases count as pending"""
+        now = time.time()
+        counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        rows = self._connection().execute(
+            "SELECT CASE WHEN state = 'leased' AND lease_expires < ? THEN 'pending' ELSE state END, COUNT(*) "
+            "FROM tasks GROUP BY 1", (now,)).fetchall()
+        for state, count in rows:
+            counts[state] = count
+        return counts
+
+    def is_drained(self):
+        counts = self.counts()
+        return counts['pending'] == 0 and counts['leased'] == 0
+
+    def iter_results(self, batch_size=1000):
+        """Stream committed ProjectRecords in project-number order"""
+        last = ''
+        conn = self._connection()
+        while True:
+            rows = conn.execute(
+                'SELECT project_number, record FROM results WHERE project_number > ? ORDER BY project_number LIMIT ?',
+                (last, batch_size)).fetchall()
+            if not rows:
+                return
+            for number, blob in rows:
+                yield pickle.loads(blob)
+            last = rows[-1][0]
+
+
+def print_queue_status(queue):
+    counts = queue.counts()
+    total = sum(counts.values())
+    print(f"[INFO] Work queue {queue.path}: {total} projects - {counts['pending']} pending, "
+          f"{counts['leased']} leased, {counts['done']} done, {counts['failed']} failed")
+    return counts
+
+
+if __name__ == "__main__":
+    print_queue_status(WorkQueue())